@@ -1,7 +1,16 @@
-from flask import Flask, request, render_template_string
+from flask import Flask, request, make_response
 from supabase import create_client
 from cryptography.fernet import Fernet
 import os
+import gzip
+import time
+import hashlib
+import threading
+
+try:
+    import brotli   # optional: gzip only when it is not installed
+except ImportError:
+    brotli = None
 
 app = Flask(__name__)
 
@@ -12,6 +21,70 @@ SUPABASE_URL = os.environ.get("SUPABASE_URL")
 SUPABASE_KEY = os.environ.get("SUPABASE_KEY")
 MASTER_KEY   = os.environ.get("MASTER_KEY")
 
+# ♻️ Clients are built once per (warm) serverless instance, not per POST
+_clients      = None
+_clients_lock = threading.Lock()
+
+
+def get_clients():
+    global _clients
+    if _clients is None:
+        with _clients_lock:
+            if _clients is None:
+                _clients = (create_client(SUPABASE_URL, SUPABASE_KEY), Fernet(MASTER_KEY.encode()))
+    return _clients
+
+
+# 🔕 False once users.notify_mode (sql/003) turns out not to exist on this instance
+_has_notify_mode = True
+# 📝 False once register_user() (sql/008) turns out not to be installed
+_has_register_rpc = True
+
+
+def _missing_function(error):
+    """PostgREST's / Postgres' "no such function" — not a network or constraint error."""
+    text = f"{getattr(error, 'code', '')} {error}"
+    return "PGRST202" in text or "42883" in text or "Could not find the function" in text
+
+
+def _upsert_user(supabase, data):
+    global _has_notify_mode
+    if not _has_notify_mode:
+        data = {k: v for k, v in data.items() if k != "notify_mode"}
+    try:
+        supabase.table("users").upsert(data, on_conflict="college_id").execute()
+    except Exception as e:
+        if "notify_mode" not in data or "notify_mode" not in str(e):
+            raise
+        # Column not migrated yet — register without the preference (everyone gets 'always')
+        print(f"⚠️ users.notify_mode missing ({e}), saving without it")
+        _has_notify_mode = False
+        _upsert_user(supabase, data)
+
+
+def save_user(supabase, data):
+    """
+    One atomic insert-or-update keyed on college_id. Returns True for a new
+    user, False for an update, None when register_user() (sql/008) is not
+    installed and the plain upsert cannot tell. Any other RPC error is raised.
+    """
+    global _has_register_rpc
+    if _has_register_rpc:
+        try:
+            return bool(supabase.rpc("register_user", {
+                "p_college_id":     data["college_id"],
+                "p_encrypted_pass": data["encrypted_pass"],
+                "p_target_email":   data["target_email"],
+                "p_notify_mode":    data["notify_mode"],
+            }).execute().data)
+        except Exception as e:
+            if not _missing_function(e):
+                raise
+            print(f"⚠️ register_user() unavailable ({e}), using upsert")
+            _has_register_rpc = False
+    _upsert_user(supabase, data)
+    return None
+
 # 🎨 V2.0 PREMIUM TAILWIND UI
 HTML_PAGE = """
 <!DOCTYPE html>
@@ -220,6 +293,19 @@ HTML_PAGE = """
 <input name="email" required class="w-full bg-black/30 border border-slate-700 rounded-lg py-3 pl-10 pr-4 text-white focus:ring-2 focus:ring-primary focus:border-transparent outline-none transition-all placeholder:text-slate-600 hover:border-slate-600" placeholder="student@gmail.com" type="email"/>
 </div>
 </div>
+<div>
+<label class="block text-sm font-medium mb-2 text-slate-300">Daily Email</label>
+<div class="relative">
+<div class="absolute inset-y-0 left-0 pl-3 flex items-center pointer-events-none text-slate-400">
+<span class="material-symbols-outlined text-[20px]">notifications</span>
+</div>
+<select name="notify_mode" class="w-full bg-black/30 border border-slate-700 rounded-lg py-3 pl-10 pr-4 text-white focus:ring-2 focus:ring-primary focus:border-transparent outline-none transition-all hover:border-slate-600">
+<option value="always" selected>Every day</option>
+<option value="summary">Every day, one line when nothing changed</option>
+<option value="changes">Only when something changed</option>
+</select>
+</div>
+</div>
 <button type="submit" class="relative w-full overflow-hidden bg-primary hover:bg-primary-light text-white font-bold py-3.5 rounded-lg neon-glow transition-all transform active:scale-[0.98] mt-4 flex items-center justify-center gap-2 group shadow-lg shadow-primary/30">
 <div class="absolute inset-0 -translate-x-full group-hover:animate-[shimmer_1.5s_infinite] bg-gradient-to-r from-transparent via-white/20 to-transparent z-10"></div>
 <span class="material-symbols-outlined relative z-20">rocket_launch</span>
@@ -406,53 +492,133 @@ HTML_PAGE = """
 </body></html>
 """
 
+# 🧊 Compiled once at import (render_template_string re-parsed ~400 lines on every request);
+#    the message-less GET page is rendered and compressed once as well
+PAGE_TEMPLATE = app.jinja_env.from_string(HTML_PAGE)
+
+ENCODINGS = ("br", "gzip") if brotli else ("gzip",)
+
+STATIC_CACHE_CONTROL  = "public, max-age=300, s-maxage=86400, stale-while-revalidate=604800"
+DYNAMIC_CACHE_CONTROL = "no-store"
+
+
+def _compress(body, encoding, best=False):
+    if encoding == "br":
+        return brotli.compress(body, quality=11 if best else 5)
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=9 if best else 6)
+    return body
+
+
+_STATIC_BODY = PAGE_TEMPLATE.render(message=None, status="").encode()
+_STATIC_ETAG = hashlib.sha256(_STATIC_BODY).hexdigest()[:20]
+_STATIC      = {enc: _compress(_STATIC_BODY, enc, best=True) for enc in ("identity",) + ENCODINGS}
+
+
+def _pick_encoding():
+    return request.accept_encodings.best_match(ENCODINGS) or "identity"
+
+
+def _server_timing(response, timings):
+    response.headers["Server-Timing"] = ", ".join(f"{name};dur={ms:.1f}" for name, ms in timings)
+
+
+def static_page():
+    # 🧊 Pre-rendered bytes + ETag: browsers revalidate with a 304, Vercel's edge caches it
+    started  = time.perf_counter()
+    encoding = _pick_encoding()
+    response = make_response(_STATIC[encoding])
+    response.content_type = "text/html; charset=utf-8"
+    if encoding != "identity":
+        response.headers["Content-Encoding"] = encoding
+    response.set_etag(_STATIC_ETAG if encoding == "identity" else f"{_STATIC_ETAG}-{encoding}")
+    response.headers["Cache-Control"] = STATIC_CACHE_CONTROL
+    response.headers["Vary"] = "Accept-Encoding"
+    response.make_conditional(request)
+    _server_timing(response, [("app", (time.perf_counter() - started) * 1000)])
+    return response
+
+
+def render_page(timings=None, **context):
+    # ⏱️ Per-phase latency (ms) goes out as a Server-Timing header and into the function log
+    timings  = list(timings or [])
+    mark     = time.perf_counter()
+    encoding = _pick_encoding()
+    body     = _compress(PAGE_TEMPLATE.render(**context).encode(), encoding)
+    timings.append(("render", (time.perf_counter() - mark) * 1000))
+
+    response = make_response(body)
+    response.content_type = "text/html; charset=utf-8"
+    if encoding != "identity":
+        response.headers["Content-Encoding"] = encoding
+    response.headers["Cache-Control"] = DYNAMIC_CACHE_CONTROL
+    response.headers["Vary"] = "Accept-Encoding"
+    _server_timing(response, timings)
+    print("⏱️ register " + " | ".join(f"{name} {ms:.1f}ms" for name, ms in timings))
+    return response
+
+
 @app.route('/', methods=['GET', 'POST'])
 def home():
+    if request.method != 'POST':
+        return static_page()   # GET / HEAD
+
     message = None
     status = ""
+    timings = []
 
     if request.method == 'POST':
+        started = time.perf_counter()
         try:
             # 1. Get Data & CLEAN IT
             college_id = request.form.get('college_id', '').strip().lower()
             password = request.form.get('password', '').strip()
             email = request.form.get('email', '').strip()
+            notify_mode = request.form.get('notify_mode', 'always').strip()
+            if notify_mode not in ("always", "changes", "summary"):
+                notify_mode = "always"
 
             # 🛡️ VALIDATION RULE 1: Must be an NIET Email
             if not college_id.endswith("@niet.co.in"):
-                 return render_template_string(HTML_PAGE, message="❌ Invalid ID! Please use your official college email (e.g., @niet.co.in)", status="error")
+                 return render_page(message="❌ Invalid ID! Please use your official college email (e.g., @niet.co.in)", status="error")
 
             # 🛡️ VALIDATION RULE 2: No empty passwords
             if not password:
-                 return render_template_string(HTML_PAGE, message="❌ Password cannot be empty.", status="error")
+                 return render_page(message="❌ Password cannot be empty.", status="error")
 
-            # 2. Setup Tools
+            # 2. Setup Tools (reused across requests on a warm instance)
             if not SUPABASE_URL or not MASTER_KEY:
-                return render_template_string(HTML_PAGE, message="❌ Server Config Error: Missing Secrets", status="error")
-            
-            supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
-            cipher = Fernet(MASTER_KEY.encode())
+                return render_page(message="❌ Server Config Error: Missing Secrets", status="error")
+
+            mark = time.perf_counter()
+            supabase, cipher = get_clients()
+            timings.append(("setup", (time.perf_counter() - mark) * 1000))
 
             # 3. Encrypt Password
+            mark = time.perf_counter()
             encrypted_pass = cipher.encrypt(password.encode()).decode()
+            timings.append(("encrypt", (time.perf_counter() - mark) * 1000))
 
-            # 4. Save to Database (Reset fail_count to 0 on new update)
-            check = supabase.table("users").select("*").eq("college_id", college_id).execute()
-            
+            # 4. Save to Database in one round trip (Reset fail_count to 0 on new update)
             data = {
                 "college_id": college_id,
                 "encrypted_pass": encrypted_pass,
                 "target_email": email,
                 "is_active": True,
-                "fail_count": 0  # Reset this if they are updating their password!
+                "fail_count": 0,  # Reset this if they are updating their password!
+                "notify_mode": notify_mode
             }
 
-            if check.data:
-                supabase.table("users").update(data).eq("college_id", college_id).execute()
-                message = "Welcome Back! Your details are updated."
-            else:
-                supabase.table("users").insert(data).execute()
+            mark = time.perf_counter()
+            inserted = save_user(supabase, data)
+            timings.append(("db", (time.perf_counter() - mark) * 1000))
+
+            if inserted is None:
+                message = "You're all set! Your details are saved."
+            elif inserted:
                 message = "You're in! Expect an email tomorrow morning."
+            else:
+                message = "Welcome Back! Your details are updated."
             
             status = "success"
 
@@ -460,4 +626,6 @@ def home():
             message = f"Error: {str(e)}"
             status = "error"
 
-    return render_template_string(HTML_PAGE, message=message, status=status)
+        timings.append(("total", (time.perf_counter() - started) * 1000))
+
+    return render_page(timings, message=message, status=status)
@@ -1,22 +1,34 @@
 import os
 import re
 import time
-import json
-import base64
 import argparse
+import itertools
 import traceback
 from datetime import datetime, timedelta
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-from selenium import webdriver
 from selenium.webdriver.common.by import By
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from supabase import create_client, Client
 from cryptography.fernet import Fernet
-from google.oauth2.credentials import Credentials
-from googleapiclient.discovery import build
+from driver_pool import DriverPool, ContextPool
+from pipeline import run_pipeline, run_bounded
+import waits
+from waits import RecordingWait, WaitLog, network_idle, row_count_stable, alert_or_url
+from table_extract import read_table, click_cell_link
+from portal_http import incremental_day_status
+import resource_block
+from session_cache import SessionCache, export_driver_cookies
+from watermarks import WatermarkStore
+from gmail_client import GmailClient
+from mail_transport import transport_from_env
+from outbox import Outbox, OutboxStore, SENDS_PER_SECOND, DAILY_SEND_LIMIT
+from renderer import render_report, render_unchanged, DEACTIVATION_SUBJECT, DEACTIVATION_HTML
+from notify import ChangeFilter, report_fingerprint
+from state_writes import StateBuffer
+from history import HistoryStore
+from leases import LeaseQueue
+from shards import UserStream, SHARD_BUCKETS
+from balance import CostPlan, cost_update
+from ledger import RunLedger
 
 # ====================================================
 # 🚀 BOT V10.0: PRODUCTION RELEASE (SHARDED)
@@ -33,6 +45,16 @@ TOKEN_JSON   = os.environ.get("GMAIL_TOKEN_JSON", "").strip()
 # 2. INIT CLIENTS
 supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
 cipher = Fernet(MASTER_KEY)
+session_cache = SessionCache(supabase, cipher)
+watermark_store = WatermarkStore(supabase)
+gmail = GmailClient(TOKEN_JSON)
+transport = transport_from_env(gmail)
+outbox = Outbox(transport, OutboxStore(supabase))
+change_filter = ChangeFilter()
+state_buffer = StateBuffer(supabase)
+history = HistoryStore(supabase)
+lease_queue = LeaseQueue(supabase)
+ledger = RunLedger(supabase)
 
 # 🛡️ SAFE CLICK WRAPPER
 def safe_click(driver, element):
@@ -41,68 +63,17 @@ def safe_click(driver, element):
     except:
         element.click()
 
-def get_personality(percentage):
-    p = float(percentage)
-    if p >= 90: return {"quote": "Absolute Legend! 🏆 Basically living at college.", "status": "Safe Zone", "color": "#3A7D68", "subject_icon": "🏆"}
-    elif p >= 75: return {"quote": "You are Safe! Keep maintaining this flow.", "status": "On Track", "color": "#3A7D68", "subject_icon": "✅"}
-    elif p >= 60: return {"quote": "You are on thin ice! Don't skip anymore classes.", "status": "Attendance is Low", "color": "#C27C2E", "subject_icon": "⚠️"}
-    else: return {"quote": "DANGER ZONE! Run to college immediately!", "status": "Critical Low", "color": "#B94A40", "subject_icon": "🚨"}
-
-def send_email_via_api(target_email, subject, html_content):
-    print(f"   📧 Sending to {target_email}...")
-    try:
-        creds_data = json.loads(TOKEN_JSON)
-        creds = Credentials.from_authorized_user_info(creds_data)
-        service = build('gmail', 'v1', credentials=creds)
-        msg = MIMEMultipart("alternative")
-        msg['Subject'] = subject
-        msg['From'] = "me"
-        msg['To'] = target_email
-        msg.attach(MIMEText(html_content, "html", "utf-8"))
-        raw_msg = base64.urlsafe_b64encode(msg.as_bytes()).decode()
-        service.users().messages().send(userId="me", body={'raw': raw_msg}).execute()
-        print("   ✅ Sent successfully!")
-        return True
-    except Exception as e:
-        print(f"   ❌ API Send Failed: {e}")
-        return False
-
-def check_attendance_for_user(user, is_final_attempt=True):
-    user_id = user['college_id']
-    target_email = user['target_email']
-    
-    # 🛡️ FAILURE TRACKING
-    current_fails = user.get('fail_count', 0)
-    
-    print(f"\n🔄 Processing: {user_id} (Current Fails: {current_fails})")
-    
-    try:
-        college_pass = cipher.decrypt(user['encrypted_pass'].encode()).decode()
-    except:
-        print("   ❌ Decryption Failed")
-        return
-
-    # 🛡️ DEFENSIVE CHROME OPTIONS
-    chrome_options = Options()
-    chrome_options.add_argument("--headless")
-    chrome_options.add_argument("--no-sandbox")
-    chrome_options.add_argument("--disable-dev-shm-usage")
-    chrome_options.add_argument('--ignore-certificate-errors')
-    chrome_options.add_argument("--window-size=1920,1080")
-    chrome_options.add_argument("user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36")
-    
-    chrome_options.add_argument("--disable-popup-blocking")
-    chrome_options.set_capability("unhandledPromptBehavior", "accept")
-
-    prefs = {
-        "profile.managed_default_content_settings.images": 2,
-        "profile.default_content_setting_values.notifications": 2,
-        "profile.managed_default_content_settings.stylesheets": 2,
-    }
-    chrome_options.add_experimental_option("prefs", prefs)
-
-    driver = webdriver.Chrome(options=chrome_options)
-    wait = WebDriverWait(driver, 30)
+# ==========================================
+# 🔄 USER STAGES (scrape → render → send → state)
+# ==========================================
+# One "job" dict carries a user through the stages, so they can run
+# back-to-back (process_user) or overlapped in the asyncio pipeline.
+
+def scrape_attendance(user_id, college_pass, pool):
+    # 🏊 WARM BROWSER FROM THE SHARD POOL (wiped between users)
+    driver = pool.acquire()
+    wait_log = WaitLog()
+    wait = RecordingWait(driver, 30, wait_log)
     
     final_percent = "N/A"
     parsed_subjects = [] 
@@ -111,38 +82,45 @@ def check_attendance_for_user(user, is_final_attempt=True):
     
     yesterday_obj = datetime.now() - timedelta(days=1)
     yesterday_str = yesterday_obj.strftime("%b %d,%Y")
+    marks = watermark_store.load(user_id)
 
     try:
-        # 1. LOGIN
-        print("   ⏳ Logging in...")
-        driver.get(LOGIN_URL)
-        
-        wait.until(EC.visibility_of_element_located((By.ID, "j_username"))).send_keys(user_id)
-        driver.find_element(By.ID, "password-1").send_keys(college_pass)
-        safe_click(driver, driver.find_element(By.CSS_SELECTOR, "button[type='submit']"))
-        
-        try:
-            WebDriverWait(driver, 5).until(EC.alert_is_present())
-            driver.switch_to.alert.accept()
-        except: pass
+        # 🚫 CUT FONTS / ANALYTICS / MEDIA AT THE NETWORK LAYER
+        resource_block.apply(driver)
+
+        # 1. LOGIN (🍪 skipped while a cached portal session is still valid)
+        login_started = time.time()
+        resumed = session_cache.resume_driver(driver, user_id)
+
+        if not resumed:
+            print("   ⏳ Logging in...")
+            driver.get(LOGIN_URL)
+            
+            wait.until(EC.visibility_of_element_located((By.ID, "j_username")), stage="login form").send_keys(user_id)
+            driver.find_element(By.ID, "password-1").send_keys(college_pass)
+            safe_click(driver, driver.find_element(By.CSS_SELECTOR, "button[type='submit']"))
+            
+            # ⚡ Alert OR dashboard, whichever shows up first (no blanket 5s alert wait)
+            if wait.until(alert_or_url("home.htm"), stage="login redirect") == "alert":
+                try: driver.switch_to.alert.accept()
+                except: pass
 
         # 🛡️ HARDEN DASHBOARD READINESS
         print("   ⏳ Waiting for Dashboard (home.htm)...")
-        wait.until(EC.url_contains("home.htm"))
-        wait.until(EC.presence_of_element_located((By.TAG_NAME, "body")))
+        wait.until(EC.url_contains("home.htm"), stage="dashboard url")
+        wait.until(EC.presence_of_element_located((By.TAG_NAME, "body")), stage="dashboard body")
+        if not resumed:
+            session_cache.record_login(time.time() - login_started, "selenium")
+        session_cache.save(user_id, export_driver_cookies(driver))   # 🍪 logged in: a retry can resume
         
-        # 🛡️ RESET FAILURE TRACKING ON SUCCESSFUL LOGIN
-        if current_fails > 0:
-            supabase.table("users").update({"fail_count": 0}).eq("college_id", user_id).execute()
-
         # 2. CLICK DASHBOARD WIDGET 
         print("   🧭 Scanning Dashboard for Attendance Block...")
-        time.sleep(2) 
+        wait.settle(network_idle(), stage="dashboard idle")   # best effort: a polling page never goes idle
         
         # 🎯 DETERMINISTIC SCOPING: Only look at the text inside the Attendance widget
         try:
             xpath_query = "//*[contains(translate(text(), 'ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz'), 'attendance')]/ancestor::*[contains(., '%')][1]"
-            attendance_widget = wait.until(EC.presence_of_element_located((By.XPATH, xpath_query)))
+            attendance_widget = wait.until(EC.presence_of_element_located((By.XPATH, xpath_query)), stage="dashboard widget")
             dash_text = attendance_widget.text
         except Exception:
             raise Exception("Could not locate the specific Attendance widget container on the dashboard.")
@@ -167,33 +145,27 @@ def check_attendance_for_user(user, is_final_attempt=True):
         # 3. WAIT FOR MAIN ATTENDANCE TABLE
         print("   ⏳ Waiting for Summary Table...")
         main_table_xpath = "//table[contains(., 'Course Name')]"
-        wait.until(EC.presence_of_element_located((By.XPATH, main_table_xpath)))
-        time.sleep(1)
+        wait.until(EC.presence_of_element_located((By.XPATH, main_table_xpath)), stage="summary table")
+        wait.until(row_count_stable(main_table_xpath + "//tr"), stage="summary rows stable")
         
-        # 4. START SCRAPING (AJAX Flow)
-        target_table = driver.find_element(By.XPATH, main_table_xpath)
-        initial_rows = target_table.find_elements(By.TAG_NAME, "tr")
-        row_count = len(initial_rows)
+        # 4. START SCRAPING (AJAX Flow) — one JSON snapshot instead of a call per cell
+        summary_rows = read_table(driver, main_table_xpath) or []
+        row_count = len(summary_rows)
         
         print(f"   📋 Scanning {row_count} subjects...")
 
-        for i in range(row_count):
+        for i, row in enumerate(summary_rows):
             try:
-                current_table = driver.find_element(By.XPATH, main_table_xpath)
-                current_rows = current_table.find_elements(By.TAG_NAME, "tr")
-                
-                if i >= len(current_rows): break
-                row = current_rows[i]
-                cols = row.find_elements(By.TAG_NAME, "td")
+                cols = row["cells"]
                 
                 if len(cols) < 4: continue
-                subj_name = cols[1].text.strip()
+                subj_name = cols[1]
                 if not subj_name: continue
                 
-                count_text = cols[-2].text.strip()
-                per = cols[-1].text.strip()
+                count_text = cols[-2]
+                per = cols[-1]
 
-                if "Total" in cols[0].text: continue 
+                if "Total" in cols[0]: continue 
 
                 try:
                     parts = count_text.split('/')
@@ -205,48 +177,26 @@ def check_attendance_for_user(user, is_final_attempt=True):
                 y_status = "No Class"
 
                 try:
-                    link_element = cols[-2].find_element(By.TAG_NAME, "a")
-                    safe_click(driver, link_element) 
+                    # Row i of the live table (AJAX re-renders it, so never hold element refs)
+                    if not click_cell_link(driver, main_table_xpath, i, -2):
+                        raise Exception("No detail link in count cell")
                     
                     clean_subj = subj_name.split()[0][:10] if subj_name else ""
                     detail_header_xpath = f"//*[contains(text(), 'Attendance Details') and contains(text(), '{clean_subj}')]"
                     
                     try:
-                        wait.until(EC.presence_of_element_located((By.XPATH, detail_header_xpath)))
+                        wait.until(EC.presence_of_element_located((By.XPATH, detail_header_xpath)), stage="detail header")
                     except:
                         detail_header_xpath = "//*[contains(text(), 'Attendance Details')]"
-                        wait.until(EC.presence_of_element_located((By.XPATH, detail_header_xpath)))
+                        wait.until(EC.presence_of_element_located((By.XPATH, detail_header_xpath)), stage="detail header")
                     
                     detail_table_xpath = f"({detail_header_xpath}/following::table)[1]"
-                    
-                    try:
-                        detail_table = driver.find_element(By.XPATH, detail_table_xpath)
-                    except:
-                        all_tables = driver.find_elements(By.TAG_NAME, "table")
-                        detail_table = all_tables[-1]
-                        
-                    detail_rows = detail_table.find_elements(By.TAG_NAME, "tr")
-                    daily_statuses = []
-                    
-                    for d_row in reversed(detail_rows):
-                        d_cols = d_row.find_elements(By.TAG_NAME, "td")
-                        if len(d_cols) < 5: continue
-                        
-                        d_date_str = d_cols[1].text.strip()
-                        d_stat = d_cols[4].text.strip() 
-                        
-                        if d_date_str == yesterday_str:
-                            if d_stat == "P": daily_statuses.append("P")
-                            else: daily_statuses.append("A")
-                        
-                        try:
-                            current_row_date = datetime.strptime(d_date_str, "%b %d,%Y")
-                            if current_row_date.date() < yesterday_obj.date(): break
-                        except: pass
-                        
-                    if not daily_statuses: y_status = "No Class"
-                    elif all(s == "P" for s in daily_statuses): y_status = "Present"
-                    else: y_status = "Absent"
+                    detail_rows = read_table(driver, detail_table_xpath, "(//table)[last()]")
+                    if detail_rows:
+                        # 🔖 Only rows added since the last run are parsed
+                        y_status, marks[subj_name] = incremental_day_status(
+                            [r["cells"] for r in detail_rows], yesterday_str, yesterday_obj, marks.get(subj_name)
+                        )
                         
                 except Exception as e:
                     print(f"   ⚠️ Details scrape failed for {subj_name}")
@@ -261,148 +211,307 @@ def check_attendance_for_user(user, is_final_attempt=True):
             
             except Exception as row_e: continue
 
-        # ==========================================
-        # 🎨 BUILD MATTE MODERN HTML EMAIL
-        # ==========================================
+        watermark_store.save(user_id, marks)
+
+        return {
+            "final_percent": final_percent,
+            "subjects": parsed_subjects,
+            "attended": total_attended,
+            "delivered": total_delivered,
+        }
+
+    finally:
+        net = resource_block.collect(driver)
+        pool.release(driver)
+        waits.SHARD_LOG.merge(wait_log)
+        resource_block.SHARD_REPORT.merge(net)
+        wait_log.report("   ⏱️ Waits")
+        net.report("   🚫 Network")
+
+def fail_state(user):
+    # 🛡️ 3-STRIKES FAILURE TRACKING
+    new_fail = user.get('fail_count', 0) + 1
+    if new_fail >= 3:
+        print("   💀 3 Strikes. Deactivating.")
+        return {"fail_count": new_fail, "is_active": False}
+    return {"fail_count": new_fail}
+
+def failed_job(item, error):
+    # 🧯 Stands in for a user / job lost to a stage exception, so the later
+    # stages still count the failure, close the lease and mark the ledger
+    user = item["user"] if "emails" in item else item
+    ledger.failed_user(user["college_id"], error)
+    return {"user": user, "report": None, "state": fail_state(user), "emails": []}
+
+def check_attendance_for_user(user, pool):
+    # 🕷️ SCRAPE STAGE: decrypt, scrape with one soft retry, decide the fail_count change
+    user_id = user['college_id']
+    
+    # 🛡️ FAILURE TRACKING
+    current_fails = user.get('fail_count', 0)
+    
+    print(f"\n🔄 Processing: {user_id} (Current Fails: {current_fails})")
+    
+    try:
+        college_pass = cipher.decrypt(user['encrypted_pass'].encode()).decode()
+    except:
+        print("   ❌ Decryption Failed")
+        lease_queue.complete(user_id)   # retrying cannot fix this today
+        ledger.failed_user(user_id, "decryption failed")
+        return None
+
+    job = {"user": user, "report": None, "state": None, "emails": []}
+    started = time.monotonic()
+    last_error = None
+
+    # 🛡️ OUTER SHELL SOFT RETRY
+    for attempt in range(2):
         try:
-            val = float(re.search(r'\d+\.?\d*', final_percent).group())
-            personality = get_personality(val)
-        except: 
-            personality = {"quote": "Attendance Updated", "status": "View Data", "color": "#1976d2", "subject_icon": "📅"}
-
-        table_html = ""
-        for subj in parsed_subjects:
-            p_val = float(subj['percent']) if subj['percent'].replace('.','',1).isdigit() else 100
-            p_color = "#B94A40" if p_val < 75 else "#3C4043" 
-            p_weight = "600" if p_val < 75 else "500"
-
-            if subj['yesterday'] == "Present":
-                badge = "<span style='background-color:#E8F3F0; color:#2E6B58; padding:6px 12px; border-radius:16px; font-size:0.75em; font-weight:700; letter-spacing:0.3px; text-transform:uppercase;'>Present</span>"
-            elif subj['yesterday'] == "Absent":
-                badge = "<span style='background-color:#F7EBEA; color:#9E3F36; padding:6px 12px; border-radius:16px; font-size:0.75em; font-weight:700; letter-spacing:0.3px; text-transform:uppercase;'>Absent</span>"
+            job["report"] = scrape_attendance(user_id, college_pass, pool)
+            break # Success, break out of retry loop
+        except Exception as e:
+            last_error = e
+            print(f"   ❌ FATAL ERROR: {e}")
+            traceback.print_exc()
+            print(f"   🔄 Retry attempt {attempt + 1} for {user_id}")
+            if attempt == 1:
+                print(f"   ❌ Final failure for {user_id}")
             else:
-                badge = "<span style='color:#9AA0A6; font-size:1.5em; line-height:0.8;'>-</span>"
-
-            table_html += f"""
-            <tr style="border-bottom: 1px solid #F1F3F4;">
-                <td style="padding: 16px 20px; font-size: 0.9em; color: #3C4043; line-height: 1.4; font-weight:500; vertical-align:middle;">{subj['name']}</td>
-                <td style="padding: 16px 20px; text-align: right; white-space: nowrap; vertical-align:middle;">
-                    <div style="font-size: 1em; color: {p_color}; font-weight: {p_weight};">{subj['percent']}%</div>
-                    <div style="font-size: 0.8em; color: #70757A; margin-top: 4px; font-weight: 500;">{subj['count']}</div>
-                </td>
-                <td style="padding: 16px 20px; text-align: right; white-space: nowrap; width: 90px; vertical-align:middle;">
-                    {badge}
-                </td>
-            </tr>
-            """
-
-        subject_line = f"{personality['subject_icon']} {personality['status']}: {final_percent}"
-        
-        html_body = f"""
-        <div style="background-color: #F8F9FA; padding: 30px 10px; font-family: 'Helvetica Neue', Helvetica, Arial, sans-serif; -webkit-font-smoothing: antialiased;">
-            <div style="max-width: 600px; margin: 0 auto; background: #ffffff; border-radius: 16px; overflow: hidden; box-shadow: 0 2px 8px rgba(0,0,0,0.08); border: 1px solid rgba(0,0,0,0.05);">
-                
-                <div style="background-color: {personality['color']}; padding: 45px 30px; text-align: center;">
-                    <h1 style="margin: 0; font-size: 4.5em; font-weight: 700; color: #ffffff; letter-spacing: -1.5px; line-height: 1;">{final_percent}</h1>
-                    <div style="font-size: 1.4em; font-weight: 600; color: rgba(255,255,255,0.95); margin-top: 12px; letter-spacing: 0.5px;">{total_attended} / {total_delivered}</div>
-                    <div style="font-size: 1.1em; color: rgba(255,255,255,0.85); font-weight: 600; margin-top: 10px; text-transform: uppercase; letter-spacing: 1.2px;">{personality['status']}</div>
-                </div>
-
-                <div style="background-color: #FFFFFF; padding: 20px 30px; text-align: center; border-bottom: 1px solid #F1F3F4;">
-                    <p style="margin: 0; color: #5F6368; font-style: italic; font-size: 1em; font-weight: 400; line-height: 1.5;">
-                        {personality['subject_icon']} "{personality['quote']}"
-                    </p>
-                </div>
-
-                <table style="width: 100%; border-collapse: collapse; margin-top: 10px;">
-                    <thead>
-                        <tr>
-                            <th style="padding: 12px 20px; text-align: left; font-size: 0.7em; text-transform: uppercase; color: #9AA0A6; font-weight: 700; letter-spacing: 0.8px;">Subject</th>
-                            <th style="padding: 12px 20px; text-align: right; font-size: 0.7em; text-transform: uppercase; color: #9AA0A6; font-weight: 700; letter-spacing: 0.8px;">Overall</th>
-                            <th style="padding: 12px 20px; text-align: right; font-size: 0.7em; text-transform: uppercase; color: #9AA0A6; font-weight: 700; letter-spacing: 0.8px;">Yesterday</th>
-                        </tr>
-                    </thead>
-                    <tbody>
-                        {table_html}
-                    </tbody>
-                </table>
-                
-                <div style="padding: 20px; text-align: center; font-size: 0.75em; color: #BDC1C6; border-top: 1px solid #F1F3F4; background-color: #FFFFFF;">
-                    NIET Attendance Bot • <a href="https://attendance-notify.vercel.app/" style="color:#BDC1C6; text-decoration:underline;">Update Settings</a>
-                </div>
-            </div>
-        </div>
-        """
-        
-        send_email_via_api(target_email, subject_line, html_body)
+                time.sleep(2)
 
+    if job["report"] is not None:
+        ledger.scraped(user_id, len(job["report"]["subjects"]))
+        # 🛡️ RESET FAILURE TRACKING ON SUCCESSFUL LOGIN
+        if current_fails > 0:
+            job["state"] = {"fail_count": 0}
+    else:
+        ledger.failed_user(user_id, last_error)
+        job["state"] = fail_state(user)
+
+    # ⚖️ SCRAPE COST (retries included) + SUBJECT COUNT → next run's shard balancing
+    subjects = len(job["report"]["subjects"]) if job["report"] is not None else None
+    costs    = cost_update(user, time.monotonic() - started, subjects)
+    if costs:
+        job["state"] = {**(job["state"] or {}), **costs}
+
+    return job
+
+def render_job(job):
+    # 🎨 RENDER STAGE: report email, or the deactivation notice on a 3rd strike
+    target_email = job["user"]["target_email"]
+
+    if job["report"] is None:
+        if job["state"].get("is_active") is False:
+            job["emails"].append((target_email, DEACTIVATION_SUBJECT, DEACTIVATION_HTML))
+        return job
+
+    # 🔕 Skip / shrink reports identical to the last one (users who opted in)
+    fingerprint = report_fingerprint(job["report"])
+    if "report_fingerprint" in job["user"] and fingerprint != job["user"]["report_fingerprint"]:
+        job["state"] = {**(job["state"] or {}), "report_fingerprint": fingerprint}
+
+    outcome = change_filter.decide(job["user"], fingerprint)
+    if outcome == "skip":
+        print(f"   🔕 No change for {job['user']['college_id']}, report skipped")
+        return job
+
+    # 🎨 MATTE MODERN HTML EMAIL (template precompiled + minified in renderer.py)
+    render = render_unchanged if outcome == "summary" else render_report
+    subject_line, html_body = render(job["report"])
+    job["emails"].append((target_email, subject_line, html_body))
+    return job
+
+def queue_email(college_id, target_email, subject, html_content):
+    # 📮 A mail problem is never the student's fault: it must not reach failed_job / fail_count
+    try:
+        return outbox.add(target_email, subject, html_content, college_id=college_id)
     except Exception as e:
-        print(f"   ❌ FATAL ERROR: {e}")
-        traceback.print_exc()
-
-        # 🛡️ SOFT RETRY ESCAPE (Don't log failure if it's going to retry)
-        if not is_final_attempt:
-            raise e 
-
-        # 🛡️ 3-STRIKES FAILURE TRACKING
-        new_fail = current_fails + 1
-
-        if new_fail >= 3:
-            print("   💀 3 Strikes. Deactivating.")
-            supabase.table("users").update({
-                "fail_count": new_fail,
-                "is_active": False
-            }).eq("college_id", user_id).execute()
-
-            send_email_via_api(
-                target_email,
-                "Bot Deactivated",
-                "<h1>Login Failed 3 Times</h1><p>Please update your password on the portal: <a href='https://attendance-notify.vercel.app/'>Update Settings</a>.</p>"
-            )
-        else:
-            supabase.table("users").update({
-                "fail_count": new_fail
-            }).eq("college_id", user_id).execute()
-        
-    finally:
-        driver.quit()
+        print(f"   ⚠️ Could not queue email to {target_email}: {e}")
+        return False
+
+def send_job(job):
+    # 📧 SEND STAGE
+    stored = [queue_email(job["user"]["college_id"], target_email, subject, html_content)
+              for target_email, subject, html_content in job["emails"]]
+    # 📒 Done for today only once every email is in the durable outbox (an email
+    #    only this process holds leaves the user 'scraped', so a re-run redoes it)
+    if job["report"] is not None and all(stored):
+        ledger.emailed(job["user"]["college_id"], len(job["emails"]))
+    return job
+
+def write_job_state(job):
+    # 💾 DB STAGE: fail_count reset / increment / deactivation, new report fingerprint (buffered, flushed in bulk)
+    # 📈 plus today's history snapshot, written in bulk at shard end
+    if job["state"]:
+        state_buffer.put(job["user"]["college_id"], job["state"], urgent=job["report"] is None)   # strikes go out at once
+    if job["report"]:
+        history.record(job["user"]["college_id"], job["report"])
+    lease_queue.complete(job["user"]["college_id"])
+    return job
+
+def process_user(user, pool):
+    # All stages back-to-back for one user
+    item = user
+    try:
+        item = check_attendance_for_user(user, pool)
+        if item is None:
+            return
+        item = send_job(render_job(item))
+    except Exception as e:
+        print(f"   ❌ Processing {user['college_id']} failed: {e}")
+        item = failed_job(item, e)
+    write_job_state(item)
 
 def main():
     # ⚡ SHARDING / LOAD BALANCING ARGUMENTS
     parser = argparse.ArgumentParser()
     parser.add_argument("--shard_id", type=int, default=0, help="Current Worker ID (0, 1, 2...)")
     parser.add_argument("--total_shards", type=int, default=1, help="Total number of Workers")
+    parser.add_argument("--browsers", type=int, default=1, help="Warm Chrome instances kept per Worker")
+    parser.add_argument("--recycle_after", type=int, default=20, help="Relaunch a browser after this many users")
+    parser.add_argument("--contexts", type=int, default=0, help="Users processed in parallel inside one Chrome (isolated contexts); 0 = one at a time")
+    parser.add_argument("--user_timeout", type=int, default=240, help="Seconds before a hung context is disposed")
+    parser.add_argument("--pipeline", action="store_true", help="Overlap scrape / render / send / db stages")
+    parser.add_argument("--queue_size", type=int, default=4, help="Bounded queue size between pipeline stages")
+    parser.add_argument("--page_size", type=int, default=200, help="Users fetched per keyset page")
+    parser.add_argument("--queue", action="store_true", help="Lease users from today's shared run queue instead of a fixed shard slice")
+    parser.add_argument("--lease_batch", type=int, default=1, help="Users leased per claim in --queue mode")
+    parser.add_argument("--lease_seconds", type=int, default=600, help="Seconds before an unfinished lease can be re-claimed")
+    parser.add_argument("--balance", choices=["cost", "hash"], default="cost", help="Split users by recorded scrape cost (LPT) or by college_id hash")
+    rerun = parser.add_mutually_exclusive_group()
+    rerun.add_argument("--resume", dest="force", action="store_false", help="Skip users already emailed today (default)")
+    rerun.add_argument("--force", dest="force", action="store_true", help="Ignore today's run ledger and process everyone")
+    parser.add_argument("--session_ttl", type=int, default=25, help="Minutes a cached portal session is trusted")
+    parser.add_argument("--send_batch", type=int, default=50, help="Emails handed to the mail transport per call (one Gmail batch request; max 100)")
+    parser.add_argument("--send_rate", type=float, default=SENDS_PER_SECOND, help="Account-wide Gmail sends per second")
+    parser.add_argument("--daily_limit", type=int, default=DAILY_SEND_LIMIT, help="Gmail daily sending limit")
+    parser.add_argument("--drain_only", action="store_true", help="Only send leftover outbox messages, no scraping")
+    parser.add_argument("--state_flush_every", type=int, default=10, help="Buffered user-state changes written per bulk flush")
+    parser.add_argument("--state_flush_seconds", type=float, default=15, help="Longest a user-state change waits in the buffer")
     args = parser.parse_args()
 
+    session_cache.ttl = args.session_ttl * 60
+    # 📮 The Gmail per-second quota belongs to the sending account, so shards split it
+    outbox.configure(batch_size=args.send_batch, rate=args.send_rate / max(1, args.total_shards),
+                     daily_limit=args.daily_limit, shards=args.total_shards)
+
+    if args.drain_only:
+        # 📤 Send what earlier runs left in the outbox, without scraping anyone
+        print(f"📤 OUTBOX DRAIN: Worker {args.shard_id + 1} of {args.total_shards}")
+        outbox.drain()
+        transport.close()
+        outbox.report()
+        return
+
     print(f"🚀 PRODUCTION BOT STARTED: Worker {args.shard_id + 1} of {args.total_shards}")
 
+    # 💾 fail_count / deactivation / fingerprint writes are buffered and flushed in bulk
+    state_buffer.flush_every   = max(1, args.state_flush_every)
+    state_buffer.flush_seconds = args.state_flush_seconds
+    state_buffer.journal_path  = f".state_journal.shard{args.shard_id}.jsonl"
+    state_buffer.recover()
+    state_buffer.install_handlers()
+
     try:
-        # 1. FETCH ALL ACTIVE USERS (Beta lock removed)
-        response = supabase.table("users").select("*").eq("is_active", True).execute()
-        all_users = response.data
-        
-        if not all_users:
-            print("   ⚠️ No users found in database.")
+        # 📤 Leftovers from earlier runs (deferred past the daily limit, crashed mid-send) go out first
+        outbox.drain()
+
+        stream = None
+        if args.queue:
+            # 1 + 2. 🎟️ WORK STEALING: keep leasing the next unprocessed user of today's run
+            lease_queue.configure(worker=f"shard{args.shard_id}-{os.environ.get('GITHUB_RUN_ID', os.getpid())}",
+                                  batch=args.lease_batch, lease_seconds=args.lease_seconds)
+            try:
+                lease_queue.start()
+                stream = lease_queue
+            except Exception as e:
+                print(f"   ⚠️ Lease queue unavailable ({e}), using a fixed shard plan")
+        if stream is None and args.balance == "cost":
+            # 1 + 2. ⚖️ LPT PLAN: equal shares of predicted scrape time, from recorded per-user costs
+            try:
+                stream = CostPlan(supabase, args.shard_id, args.total_shards, page_size=args.page_size,
+                                  run_date=ledger.run_date)
+                stream.describe()
+            except Exception as e:
+                print(f"   ⚠️ Cost plan unavailable ({e}), using hash buckets")
+        if stream is None:
+            # 1 + 2. STREAM THIS WORKER'S ACTIVE USERS (hash-bucket range, split inside the query,
+            #        keyset pages so scraping starts as soon as the first page lands)
+            stream = UserStream(supabase, args.shard_id, args.total_shards, page_size=args.page_size)
+        shard_started = time.monotonic()
+        if not args.force:
+            # 📒 Re-triggered run: users already emailed today are skipped
+            print(f"📒 Resume: {len(ledger.load_done())} users already done on {ledger.run_date}")
+        users = ledger.pending(iter(stream), on_skip=lease_queue.complete)
+        first = next(users, None)
+
+        if first is None:
+            print("   ⚠️ No users left for this worker.")
             return
 
-        # 2. APPLY LOAD BALANCING (Splits users among GitHub Actions)
-        my_users = [u for i, u in enumerate(all_users) if i % args.total_shards == args.shard_id]
-        print(f"📋 Total Active Users: {len(all_users)} | Worker Processing: {len(my_users)}")
+        my_users = itertools.chain([first], users)
+        if stream is lease_queue:
+            print(f"📋 Leasing from the {lease_queue.run_date} run queue as {lease_queue.worker}")
+        elif isinstance(stream, UserStream):
+            print(f"📋 Buckets {stream.lo}-{stream.hi - 1} of {SHARD_BUCKETS} | streaming pages of {stream.page_size}")
         
-        # 3. OUTER SHELL SOFT RETRY FOR EACH USER
-        for user in my_users:
-            for attempt in range(2):
-                try:
-                    check_attendance_for_user(user, is_final_attempt=(attempt == 1))
-                    break # Success, break out of retry loop
-                except Exception as e:
-                    print(f"   🔄 Retry attempt {attempt + 1} for {user['college_id']}")
-                    if attempt == 1:
-                        print(f"   ❌ Final failure for {user['college_id']}")
-                    time.sleep(2)
+        # 3. PROCESS USERS (browsers stay warm across users and retries)
+        if args.contexts > 0:
+            # 🧪 Several students at once inside one Chrome, one isolated context each
+            pool = ContextPool(size=args.contexts, lease_timeout=args.user_timeout)
+            workers = args.contexts
+        else:
+            pool = DriverPool(size=args.browsers, max_uses=args.recycle_after)
+            workers = args.browsers
+
+        if args.pipeline:
+            # 🏭 Sends and DB writes overlap with the next logins
+            run_pipeline(my_users, [
+                ("scrape", lambda u: check_attendance_for_user(u, pool), workers),
+                ("render", render_job, 1),
+                ("send", send_job, 1),
+                ("db", write_job_state, 1),
+            ], queue_size=args.queue_size, on_error=failed_job)
+        elif workers > 1:
+            run_bounded(my_users, lambda u: process_user(u, pool), workers)
+        else:
+            for user in my_users:
+                process_user(user, pool)
+        shard_seconds = time.monotonic() - shard_started
+
+        outbox.flush()
+        ledger.flush()
+        state_buffer.flush()
+        history.flush()
+        lease_queue.close()
+        if args.shard_id == 0:
+            history.compact()
+        pool.close()
+        if isinstance(stream, CostPlan):
+            stream.report(shard_seconds)   # predicted vs actual makespan of this shard
+        else:
+            stream.report()
+        pool.report()
+        waits.SHARD_LOG.report("⏱️ Shard waits")
+        resource_block.SHARD_REPORT.report("🚫 Shard network")
+        session_cache.report()
+        watermark_store.report()
+        outbox.report()
+        change_filter.report()
+        state_buffer.report()
+        history.report()
+        ledger.report()
+        transport.report()
             
     except Exception as e:
         print(f"🔥 CRITICAL ERROR: {e}")
+    finally:
+        outbox.flush() # 📮 whatever was rendered before a crash still goes out
+        state_buffer.flush() # 💾 same for buffered user-state changes
+        ledger.flush()
+        history.flush()
+        lease_queue.close()
+        transport.close()
 
 if __name__ == "__main__":
     main()
@@ -1,22 +1,35 @@
 import os
 import re
 import time
-import json
-import base64
 import argparse
+import itertools
 import traceback
 from datetime import datetime, timedelta
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-from selenium import webdriver
 from selenium.webdriver.common.by import By
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from supabase import create_client, Client
 from cryptography.fernet import Fernet
-from google.oauth2.credentials import Credentials
-from googleapiclient.discovery import build
+from driver_pool import DriverPool, ContextPool
+from pipeline import run_pipeline, run_bounded
+import waits
+from waits import RecordingWait, WaitLog, network_idle, row_count_stable, alert_or_url
+from table_extract import read_table
+import resource_block
+from session_cache import SessionCache, export_driver_cookies
+from watermarks import WatermarkStore
+from gmail_client import GmailClient
+from mail_transport import transport_from_env
+from outbox import Outbox, OutboxStore, SENDS_PER_SECOND, DAILY_SEND_LIMIT
+from renderer import render_report, render_unchanged, DEACTIVATION_SUBJECT, DEACTIVATION_HTML
+from notify import ChangeFilter, report_fingerprint
+from state_writes import StateBuffer
+from history import HistoryStore
+from leases import LeaseQueue
+from shards import UserStream
+from balance import CostPlan, cost_update
+from ledger import RunLedger
+import portal_http
+from portal_http import PortalHttpError
 
 # ====================================================
 # 🚀 BOT V10.5: WIDGET CLICK NAVIGATION + FIXED XPATH
@@ -27,6 +40,11 @@ LOGIN_URL = "https://nietcloud.niet.co.in/login.htm"
 # XPath for the attendance data table — works whether headers are <th> or <td>
 ATT_TABLE_XPATH = "//table[.//*[contains(text(),'Course Name')] and .//*[contains(text(),'Attendance Count')]]"
 
+# Detail page: the table right after the "Attendance Details" header, else the last Date/Status table
+DETAIL_HDR_XPATH      = "//*[contains(text(),'Attendance Details')]"
+DETAIL_TABLE_XPATH    = f"({DETAIL_HDR_XPATH}/following::table)[1]"
+DETAIL_FALLBACK_XPATH = "(//table[contains(., 'Date') and contains(., 'Status')])[last()]"
+
 # 1. LOAD SECRETS
 SUPABASE_URL = os.environ.get("SUPABASE_URL", "").strip()
 SUPABASE_KEY = os.environ.get("SUPABASE_KEY", "").strip()
@@ -36,6 +54,16 @@ TOKEN_JSON   = os.environ.get("GMAIL_TOKEN_JSON", "").strip()
 # 2. INIT CLIENTS
 supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
 cipher = Fernet(MASTER_KEY)
+session_cache = SessionCache(supabase, cipher)
+watermark_store = WatermarkStore(supabase)
+gmail = GmailClient(TOKEN_JSON)
+transport = transport_from_env(gmail)
+outbox = Outbox(transport, OutboxStore(supabase))
+change_filter = ChangeFilter()
+state_buffer = StateBuffer(supabase)
+history = HistoryStore(supabase)
+lease_queue = LeaseQueue(supabase)
+ledger = RunLedger(supabase)
 
 # ====================================================
 # 🛡️ HELPERS
@@ -47,32 +75,6 @@ def safe_click(driver, element):
     except:
         element.click()
 
-def get_personality(percentage):
-    p = float(percentage)
-    if p >= 90:   return {"quote": "Absolute Legend! 🏆 Basically living at college.",        "status": "Safe Zone",         "color": "#3A7D68", "subject_icon": "🏆"}
-    elif p >= 75: return {"quote": "You are Safe! Keep maintaining this flow.",                "status": "On Track",          "color": "#3A7D68", "subject_icon": "✅"}
-    elif p >= 60: return {"quote": "You are on thin ice! Don't skip anymore classes.",        "status": "Attendance is Low", "color": "#C27C2E", "subject_icon": "⚠️"}
-    else:         return {"quote": "DANGER ZONE! Run to college immediately!",                 "status": "Critical Low",      "color": "#B94A40", "subject_icon": "🚨"}
-
-def send_email_via_api(target_email, subject, html_content):
-    print(f"   📧 Sending to {target_email}...")
-    try:
-        creds_data = json.loads(TOKEN_JSON)
-        creds = Credentials.from_authorized_user_info(creds_data)
-        service = build('gmail', 'v1', credentials=creds)
-        msg = MIMEMultipart("alternative")
-        msg['Subject'] = subject
-        msg['From']    = "me"
-        msg['To']      = target_email
-        msg.attach(MIMEText(html_content, "html", "utf-8"))
-        raw_msg = base64.urlsafe_b64encode(msg.as_bytes()).decode()
-        service.users().messages().send(userId="me", body={'raw': raw_msg}).execute()
-        print("   ✅ Sent successfully!")
-        return True
-    except Exception as e:
-        print(f"   ❌ API Send Failed: {e}")
-        return False
-
 # ====================================================
 # 🔥 SCRAPING HELPERS (V10.5)
 # ====================================================
@@ -85,7 +87,7 @@ def open_attendance(driver, wait):
     Fallback: click SYLLABUS sidebar link → Attendance tab.
     Then waits for studentCourses.htm to load and the data table to appear.
     """
-    time.sleep(2)  # let dashboard JS settle
+    wait.settle(network_idle(), stage="dashboard idle")  # let dashboard JS settle (best effort)
 
     navigated = False
 
@@ -96,7 +98,7 @@ def open_attendance(driver, wait):
             "'ABCDEFGHIJKLMNOPQRSTUVWXYZ','abcdefghijklmnopqrstuvwxyz'),"
             "'attendance')]/ancestor::*[contains(.,('%'))][1]"
         )
-        widget = wait.until(EC.presence_of_element_located((By.XPATH, xpath_widget)))
+        widget = wait.until(EC.presence_of_element_located((By.XPATH, xpath_widget)), stage="dashboard widget")
 
         # try clicking the percentage number inside the widget first
         pct_match = re.search(r'(\d+\.?\d*)%', widget.text)
@@ -122,96 +124,222 @@ def open_attendance(driver, wait):
         try:
             safe_click(driver, wait.until(EC.element_to_be_clickable(
                 (By.XPATH, "//*[contains(text(),'SYLLABUS') or contains(text(),'Syllabus')]")
-            )))
-            time.sleep(1)
+            ), stage="sidebar syllabus"))
             safe_click(driver, wait.until(EC.element_to_be_clickable(
                 (By.XPATH, "//*[text()='Attendance' or text()='ATTENDANCE']")
-            )))
+            ), stage="sidebar attendance"))
         except Exception as e:
             print(f"   ⚠️ Fallback navigation failed ({e})")
 
     # ── WAIT FOR THE NEW PAGE AND TABLE ──────────────────────────────────
     # New UI navigates to studentCourses.htm — wait for that URL
-    wait.until(EC.url_contains("studentCourses"))
+    wait.until(EC.url_contains("studentCourses"), stage="attendance url")
     print(f"   ✅ On attendance page: {driver.current_url}")
 
     # Wait for the correct data table (headers can be th or td)
-    wait.until(EC.presence_of_element_located((By.XPATH, ATT_TABLE_XPATH)))
-    # Wait for at least one data row inside it
-    wait.until(EC.presence_of_element_located((By.XPATH, ATT_TABLE_XPATH + "//tr[td]")))
-    time.sleep(1)
+    wait.until(EC.presence_of_element_located((By.XPATH, ATT_TABLE_XPATH)), stage="summary table")
+    # Wait until the data rows stop arriving
+    wait.until(row_count_stable(ATT_TABLE_XPATH + "//tr[td]"), stage="summary rows stable")
 
 
-def scrape_yesterday(driver, wait, detail_url, yesterday_str, yesterday_obj):
+def scrape_yesterday(driver, wait, detail_url, yesterday_str, yesterday_obj, mark=None):
     """
     Visits the per-subject detail page, scrapes yesterday's status,
     then navigates back so the next subject starts clean.
+    Returns (status, watermark).
     """
     if not detail_url:
-        return "No Class"
+        return "No Class", mark
 
     # Remember where we came from so we can return
     overview_url = driver.current_url
 
     try:
         driver.get(detail_url)
-        time.sleep(1.5)
 
-        detail_table = None
         try:
-            hdr_xpath = "//*[contains(text(),'Attendance Details')]"
-            wait.until(EC.presence_of_element_located((By.XPATH, hdr_xpath)))
-            detail_table = driver.find_element(
-                By.XPATH, f"({hdr_xpath}/following::table)[1]"
-            )
+            wait.until(EC.presence_of_element_located((By.XPATH, DETAIL_HDR_XPATH)), stage="detail header")
+            wait.until(row_count_stable(DETAIL_TABLE_XPATH + "//tr"), stage="detail rows stable")
         except Exception:
-            for t in reversed(driver.find_elements(By.TAG_NAME, "table")):
-                if "Date" in t.text and "Status" in t.text:
-                    detail_table = t
-                    break
+            pass  # no header — read_table falls back to the last Date/Status table
 
-        if not detail_table:
-            return "No Class"
+        # One execute_script for the whole table instead of a call per cell
+        detail_rows = read_table(driver, DETAIL_TABLE_XPATH, DETAIL_FALLBACK_XPATH)
+        if detail_rows is None:
+            return "No Class", mark
 
-        daily_statuses = []
-        for d_row in reversed(detail_table.find_elements(By.TAG_NAME, "tr")):
-            d_cols = d_row.find_elements(By.TAG_NAME, "td")
-            if len(d_cols) < 5:
-                continue
-            d_date_str = d_cols[1].text.strip()
-            d_stat     = d_cols[4].text.strip()
-
-            if d_date_str == yesterday_str:
-                daily_statuses.append("P" if d_stat == "P" else "A")
-
-            try:
-                if datetime.strptime(d_date_str, "%b %d,%Y").date() < yesterday_obj.date():
-                    break
-            except Exception:
-                pass
-
-        if not daily_statuses:
-            return "No Class"
-        return "Present" if all(s == "P" for s in daily_statuses) else "Absent"
+        return portal_http.incremental_day_status(
+            [r["cells"] for r in detail_rows], yesterday_str, yesterday_obj, mark
+        )
 
     except Exception as e:
         print(f"      ⚠️  Detail scrape error: {e}")
-        return "Error"
+        return "Error", mark
 
     finally:
         # Return to the attendance overview for the next subject
         driver.get(overview_url)
-        wait.until(EC.presence_of_element_located((By.XPATH, ATT_TABLE_XPATH + "//tr[td]")))
-        time.sleep(0.8)
+        wait.until(row_count_stable(ATT_TABLE_XPATH + "//tr[td]"), stage="summary rows stable")
+
+
+def scrape_with_selenium(driver, wait, user_id, college_pass, yesterday_str, yesterday_obj, marks):
+    """Full browser flow. Returns (parsed_subjects, total_attended, total_delivered); updates marks in place."""
+    parsed_subjects = []
+
+    # ── 1. LOGIN (skipped while a cached portal session is still valid) ──
+    login_started = time.time()
+    resumed       = session_cache.resume_driver(driver, user_id)
+
+    if not resumed:
+        print("   ⏳ Logging in...")
+        driver.get(LOGIN_URL)
+
+        wait.until(EC.visibility_of_element_located((By.ID, "j_username")), stage="login form").send_keys(user_id)
+        driver.find_element(By.ID, "password-1").send_keys(college_pass)
+        safe_click(driver, driver.find_element(By.CSS_SELECTOR, "button[type='submit']"))
+
+        # Resolve on whichever comes first — the login alert or the dashboard
+        if wait.until(alert_or_url("home.htm"), stage="login redirect") == "alert":
+            try:
+                driver.switch_to.alert.accept()
+            except:
+                pass
+
+    print("   ⏳ Waiting for Dashboard...")
+    wait.until(EC.url_contains("home.htm"), stage="dashboard url")
+    wait.until(EC.presence_of_element_located((By.TAG_NAME, "body")), stage="dashboard body")
+    if not resumed:
+        session_cache.record_login(time.time() - login_started, "selenium")
+    session_cache.save(user_id, export_driver_cookies(driver))   # logged in: a later retry can resume
+
+    # ── 2. CLICK TO ATTENDANCE PAGE (widget or sidebar) ──────────────────
+    print("   🧭 Navigating to Attendance page...")
+    open_attendance(driver, wait)
+
+    # ── 3. PASS 1 — one JSON snapshot of the table → plain dicts ─────────
+    print("   📋 Reading attendance table...")
+    summary = read_table(driver, ATT_TABLE_XPATH) or []
+    rows_data, total_attended, total_delivered = portal_http.parse_summary_rows(
+        [(r["cells"], r["hrefs"][4] if len(r["cells"]) == 6 else None) for r in summary]
+    )
+
+    if not rows_data:
+        raise Exception("No subject rows found — table did not load correctly.")
+
+    # ── 4. PASS 2 — yesterday's status per subject ───────────────────────
+    # Detail pages are fetched in parallel with the browser's session cookies;
+    # any subject the HTTP fetch cannot read is re-checked in Chrome.
+    print(f"   ⚡ Fetching {len(rows_data)} detail pages (x{portal_http.DETAIL_CONCURRENCY})...")
+    with portal_http.session_from_driver(driver) as session:
+        results = portal_http.fetch_day_statuses(
+            session, [item["detail_url"] for item in rows_data], driver.current_url,
+            yesterday_str, yesterday_obj, missing=None,
+            marks=[marks.get(item["name"]) for item in rows_data],
+        )
+
+    for item, (y_status, mark) in zip(rows_data, results):
+        print(f"   🔍 {item['name']}...")
+        if y_status in (None, "Error"):
+            y_status, mark = scrape_yesterday(
+                driver, wait, item["detail_url"], yesterday_str, yesterday_obj, mark
+            )
+        if mark is not None:
+            marks[item["name"]] = mark
+        print(f"      → {y_status}")
+        parsed_subjects.append({
+            "name":      item["name"],
+            "percent":   item["percent"],
+            "count":     item["count"],
+            "yesterday": y_status,
+        })
+
+    return parsed_subjects, total_attended, total_delivered
 
 
 # ====================================================
-# 🔄 MAIN USER PROCESSOR
+# 🔄 MAIN USER PROCESSOR (scrape → render → send → state)
 # ====================================================
+#
+# One "job" dict carries a user through the stages, so they can run
+# back-to-back (process_user) or overlapped in the asyncio pipeline.
+
+def scrape_attendance(user_id, college_pass, pool, engine="auto"):
+    """HTTP engine first, Chrome only when it breaks. Returns the report dict."""
+    yesterday_obj = datetime.now() - timedelta(days=1)
+    yesterday_str = yesterday_obj.strftime("%b %d,%Y")
+    marks         = watermark_store.load(user_id)
 
-def check_attendance_for_user(user, is_final_attempt=True):
+    scraped = None
+    if engine in ("auto", "http"):
+        started = time.time()
+        try:
+            print("   🌐 Scraping over HTTP...")
+            scraped = portal_http.scrape_user(user_id, college_pass, yesterday_str, yesterday_obj,
+                                               cache=session_cache, marks=marks)
+            print(f"   ⚡ HTTP engine finished in {time.time() - started:.1f}s")
+        except PortalHttpError as e:
+            if engine == "http":
+                raise
+            print(f"   ⚠️ HTTP engine failed ({e}), falling back to Selenium...")
+
+    if scraped is None:
+        started  = time.time()
+        wait_log = WaitLog()
+        driver   = pool.acquire()
+        try:
+            resource_block.apply(driver)
+            scraped = scrape_with_selenium(
+                driver, RecordingWait(driver, 30, wait_log), user_id, college_pass, yesterday_str, yesterday_obj,
+                marks,
+            )
+        finally:
+            net = resource_block.collect(driver)
+            pool.release(driver)
+            waits.SHARD_LOG.merge(wait_log)
+            resource_block.SHARD_REPORT.merge(net)
+        print(f"   🐢 Selenium engine finished in {time.time() - started:.1f}s")
+        wait_log.report("   ⏱️ Waits")
+        net.report("   🚫 Network")
+
+    parsed_subjects, total_attended, total_delivered = scraped
+    watermark_store.save(user_id, marks)
+
+    final_percent = "N/A"
+    if total_delivered > 0:
+        final_percent = f"{round(total_attended / total_delivered * 100, 2)}%"
+
+    print(f"   📊 Overall: {final_percent} | Subjects found: {len(parsed_subjects)}")
+
+    return {
+        "final_percent": final_percent,
+        "subjects":      parsed_subjects,
+        "attended":      total_attended,
+        "delivered":     total_delivered,
+    }
+
+
+def fail_state(user):
+    """fail_count increment for one more failed day, deactivating on the 3rd strike."""
+    new_fail = user.get('fail_count', 0) + 1
+    if new_fail >= 3:
+        print("   💀 3 Strikes. Deactivating.")
+        return {"fail_count": new_fail, "is_active": False}
+    return {"fail_count": new_fail}
+
+
+def failed_job(item, error):
+    """
+    Stands in for a user or job lost to a stage exception, so the later
+    stages still count the failure, close the lease and mark the ledger.
+    """
+    user = item["user"] if "emails" in item else item
+    ledger.failed_user(user["college_id"], error)
+    return {"user": user, "report": None, "state": fail_state(user), "emails": []}
+
+
+def check_attendance_for_user(user, pool, engine="auto"):
+    """Scrape stage: decrypt, scrape with one soft retry, decide the fail_count change."""
     user_id       = user['college_id']
-    target_email  = user['target_email']
     current_fails = user.get('fail_count', 0)
 
     print(f"\n🔄 Processing: {user_id} (Current Fails: {current_fails})")
@@ -220,233 +348,119 @@ def check_attendance_for_user(user, is_final_attempt=True):
         college_pass = cipher.decrypt(user['encrypted_pass'].encode()).decode()
     except:
         print("   ❌ Decryption Failed")
-        return
-
-    chrome_options = Options()
-    chrome_options.add_argument("--headless")
-    chrome_options.add_argument("--no-sandbox")
-    chrome_options.add_argument("--disable-dev-shm-usage")
-    chrome_options.add_argument('--ignore-certificate-errors')
-    chrome_options.add_argument("--window-size=1920,1080")
-    chrome_options.add_argument(
-        "user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-        "AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
-    )
-    chrome_options.add_argument("--disable-popup-blocking")
-    chrome_options.set_capability("unhandledPromptBehavior", "accept")
-    chrome_options.add_experimental_option("prefs", {
-        "profile.managed_default_content_settings.images":      2,
-        "profile.default_content_setting_values.notifications": 2,
-        "profile.managed_default_content_settings.stylesheets": 2,
-    })
-
-    driver = webdriver.Chrome(options=chrome_options)
-    wait   = WebDriverWait(driver, 30)
-
-    final_percent   = "N/A"
-    parsed_subjects = []
-    total_attended  = 0
-    total_delivered = 0
-
-    yesterday_obj = datetime.now() - timedelta(days=1)
-    yesterday_str = yesterday_obj.strftime("%b %d,%Y")
+        lease_queue.complete(user_id)   # retrying cannot fix this today
+        ledger.failed_user(user_id, "decryption failed")
+        return None
 
-    try:
-        # ── 1. LOGIN ─────────────────────────────────────────────────────────
-        print("   ⏳ Logging in...")
-        driver.get(LOGIN_URL)
-
-        wait.until(EC.visibility_of_element_located((By.ID, "j_username"))).send_keys(user_id)
-        driver.find_element(By.ID, "password-1").send_keys(college_pass)
-        safe_click(driver, driver.find_element(By.CSS_SELECTOR, "button[type='submit']"))
+    job        = {"user": user, "report": None, "state": None, "emails": []}
+    started    = time.monotonic()
+    last_error = None
 
+    for attempt in range(2):
         try:
-            WebDriverWait(driver, 5).until(EC.alert_is_present())
-            driver.switch_to.alert.accept()
-        except:
-            pass
-
-        print("   ⏳ Waiting for Dashboard...")
-        wait.until(EC.url_contains("home.htm"))
-        wait.until(EC.presence_of_element_located((By.TAG_NAME, "body")))
+            job["report"] = scrape_attendance(user_id, college_pass, pool, engine)
+            break
+        except Exception as e:
+            last_error = e
+            print(f"   ❌ FATAL ERROR: {e}")
+            traceback.print_exc()
+            print(f"   🔄 Retry attempt {attempt + 1} for {user_id}")
+            if attempt == 1:
+                print(f"   ❌ Final failure for {user_id}")
+            else:
+                time.sleep(2)
 
+    if job["report"] is not None:
+        ledger.scraped(user_id, len(job["report"]["subjects"]))
         if current_fails > 0:
-            supabase.table("users").update({"fail_count": 0}).eq("college_id", user_id).execute()
+            job["state"] = {"fail_count": 0}
+    else:
+        ledger.failed_user(user_id, last_error)
+        job["state"] = fail_state(user)
 
-        # ── 2. CLICK TO ATTENDANCE PAGE (widget or sidebar) ──────────────────
-        print("   🧭 Navigating to Attendance page...")
-        open_attendance(driver, wait)
+    # Scrape time (retries included) and subject count feed the next run's shard plan
+    subjects = len(job["report"]["subjects"]) if job["report"] is not None else None
+    costs    = cost_update(user, time.monotonic() - started, subjects)
+    if costs:
+        job["state"] = {**(job["state"] or {}), **costs}
 
-        # ── 3. PASS 1 — read all rows into plain dicts ───────────────────────
-        print("   📋 Reading attendance table...")
-        main_table = driver.find_element(By.XPATH, ATT_TABLE_XPATH)
-        rows_data  = []
+    return job
 
-        for row in main_table.find_elements(By.TAG_NAME, "tr"):
-            cols = row.find_elements(By.TAG_NAME, "td")
 
-            # New UI: exactly 6 <td> per data row
-            # [0] Sr.No  [1] Course Code  [2] Course Name
-            # [3] Faculty  [4] Attendance Count  [5] Percentage
-            if len(cols) != 6:
-                continue
+def render_job(job):
+    """Render stage: the report email, or the deactivation notice on a 3rd strike."""
+    target_email = job["user"]["target_email"]
 
-            subj_name  = cols[2].text.strip()
-            count_text = cols[4].text.strip()
-            per_text   = cols[5].text.strip()
+    if job["report"] is None:
+        if job["state"].get("is_active") is False:
+            job["emails"].append((target_email, DEACTIVATION_SUBJECT, DEACTIVATION_HTML))
+        return job
 
-            if not subj_name:
-                continue
-            if "/" not in count_text:
-                continue  # skip footer / total rows
+    # Skip / shrink reports identical to the last one for users who opted in
+    fingerprint = report_fingerprint(job["report"])
+    if "report_fingerprint" in job["user"] and fingerprint != job["user"]["report_fingerprint"]:
+        job["state"] = {**(job["state"] or {}), "report_fingerprint": fingerprint}
 
-            try:
-                a, d = count_text.split("/")
-                total_attended  += int(a.strip())
-                total_delivered += int(d.strip())
-            except:
-                pass
+    outcome = change_filter.decide(job["user"], fingerprint)
+    if outcome == "skip":
+        print(f"   🔕 No change for {job['user']['college_id']}, report skipped")
+        return job
 
-            detail_url = None
-            try:
-                detail_url = cols[4].find_element(By.TAG_NAME, "a").get_attribute("href")
-            except:
-                pass
+    render = render_unchanged if outcome == "summary" else render_report
+    subject_line, html_body = render(job["report"])
+    job["emails"].append((target_email, subject_line, html_body))
+    return job
 
-            rows_data.append({
-                "name":       subj_name,
-                "percent":    per_text,
-                "count":      count_text,
-                "detail_url": detail_url,
-            })
 
-        if total_delivered > 0:
-            final_percent = f"{round(total_attended / total_delivered * 100, 2)}%"
+def queue_email(college_id, target_email, subject, html_content):
+    """
+    outbox.add that never raises: a mail problem must not reach failed_job and
+    count against the user's fail_count. False leaves the user 'scraped'.
+    """
+    try:
+        return outbox.add(target_email, subject, html_content, college_id=college_id)
+    except Exception as e:
+        print(f"   ⚠️ Could not queue email to {target_email}: {e}")
+        return False
 
-        print(f"   📊 Overall: {final_percent} | Subjects found: {len(rows_data)}")
 
-        if not rows_data:
-            raise Exception("No subject rows found — table did not load correctly.")
+def send_job(job):
+    """Send stage."""
+    stored = [queue_email(job["user"]["college_id"], target_email, subject, html_content)
+              for target_email, subject, html_content in job["emails"]]
+    # Done for today only once every email is in the durable outbox; otherwise
+    # the user stays 'scraped' and a re-triggered run redoes it
+    if job["report"] is not None and all(stored):
+        ledger.emailed(job["user"]["college_id"], len(job["emails"]))
+    return job
 
-        # ── 4. PASS 2 — yesterday's status per subject ───────────────────────
-        for item in rows_data:
-            print(f"   🔍 {item['name']}...")
-            y_status = scrape_yesterday(
-                driver, wait, item["detail_url"], yesterday_str, yesterday_obj
-            )
-            print(f"      → {y_status}")
-            parsed_subjects.append({
-                "name":      item["name"],
-                "percent":   item["percent"],
-                "count":     item["count"],
-                "yesterday": y_status,
-            })
-
-        # ── 5. BUILD & SEND EMAIL ─────────────────────────────────────────────
-        try:
-            val         = float(re.search(r'\d+\.?\d*', final_percent).group())
-            personality = get_personality(val)
-        except:
-            personality = {
-                "quote": "Attendance Updated", "status": "View Data",
-                "color": "#1976d2",            "subject_icon": "📅"
-            }
-
-        table_html = ""
-        for subj in parsed_subjects:
-            p_val    = float(subj['percent']) if subj['percent'].replace('.', '', 1).isdigit() else 100
-            p_color  = "#B94A40" if p_val < 75 else "#3C4043"
-            p_weight = "600"     if p_val < 75 else "500"
-
-            if subj['yesterday'] == "Present":
-                badge = ("<span style='background-color:#E8F3F0; color:#2E6B58; padding:6px 12px;"
-                         " border-radius:16px; font-size:0.75em; font-weight:700;"
-                         " letter-spacing:0.3px; text-transform:uppercase;'>Present</span>")
-            elif subj['yesterday'] == "Absent":
-                badge = ("<span style='background-color:#F7EBEA; color:#9E3F36; padding:6px 12px;"
-                         " border-radius:16px; font-size:0.75em; font-weight:700;"
-                         " letter-spacing:0.3px; text-transform:uppercase;'>Absent</span>")
-            else:
-                badge = "<span style='color:#9AA0A6; font-size:1.5em; line-height:0.8;'>-</span>"
-
-            table_html += f"""
-            <tr style="border-bottom: 1px solid #F1F3F4;">
-                <td style="padding: 16px 20px; font-size: 0.9em; color: #3C4043; line-height: 1.4; font-weight:500; vertical-align:middle;">{subj['name']}</td>
-                <td style="padding: 16px 20px; text-align: right; white-space: nowrap; vertical-align:middle;">
-                    <div style="font-size: 1em; color: {p_color}; font-weight: {p_weight};">{subj['percent']}%</div>
-                    <div style="font-size: 0.8em; color: #70757A; margin-top: 4px; font-weight: 500;">{subj['count']}</div>
-                </td>
-                <td style="padding: 16px 20px; text-align: right; white-space: nowrap; width: 90px; vertical-align:middle;">
-                    {badge}
-                </td>
-            </tr>
-            """
-
-        subject_line = f"{personality['subject_icon']} {personality['status']}: {final_percent}"
-
-        html_body = f"""
-        <div style="background-color: #F8F9FA; padding: 30px 10px; font-family: 'Helvetica Neue', Helvetica, Arial, sans-serif; -webkit-font-smoothing: antialiased;">
-            <div style="max-width: 600px; margin: 0 auto; background: #ffffff; border-radius: 16px; overflow: hidden; box-shadow: 0 2px 8px rgba(0,0,0,0.08); border: 1px solid rgba(0,0,0,0.05);">
-
-                <div style="background-color: {personality['color']}; padding: 45px 30px; text-align: center;">
-                    <h1 style="margin: 0; font-size: 4.5em; font-weight: 700; color: #ffffff; letter-spacing: -1.5px; line-height: 1;">{final_percent}</h1>
-                    <div style="font-size: 1.4em; font-weight: 600; color: rgba(255,255,255,0.95); margin-top: 12px; letter-spacing: 0.5px;">{total_attended} / {total_delivered}</div>
-                    <div style="font-size: 1.1em; color: rgba(255,255,255,0.85); font-weight: 600; margin-top: 10px; text-transform: uppercase; letter-spacing: 1.2px;">{personality['status']}</div>
-                </div>
-
-                <div style="background-color: #FFFFFF; padding: 20px 30px; text-align: center; border-bottom: 1px solid #F1F3F4;">
-                    <p style="margin: 0; color: #5F6368; font-style: italic; font-size: 1em; font-weight: 400; line-height: 1.5;">
-                        {personality['subject_icon']} "{personality['quote']}"
-                    </p>
-                </div>
-
-                <table style="width: 100%; border-collapse: collapse; margin-top: 10px;">
-                    <thead>
-                        <tr>
-                            <th style="padding: 12px 20px; text-align: left; font-size: 0.7em; text-transform: uppercase; color: #9AA0A6; font-weight: 700; letter-spacing: 0.8px;">Subject</th>
-                            <th style="padding: 12px 20px; text-align: right; font-size: 0.7em; text-transform: uppercase; color: #9AA0A6; font-weight: 700; letter-spacing: 0.8px;">Overall</th>
-                            <th style="padding: 12px 20px; text-align: right; font-size: 0.7em; text-transform: uppercase; color: #9AA0A6; font-weight: 700; letter-spacing: 0.8px;">Yesterday</th>
-                        </tr>
-                    </thead>
-                    <tbody>
-                        {table_html}
-                    </tbody>
-                </table>
-
-                <div style="padding: 20px; text-align: center; font-size: 0.75em; color: #BDC1C6; border-top: 1px solid #F1F3F4; background-color: #FFFFFF;">
-                    NIET Attendance Bot • <a href="https://attendance-notify.vercel.app/" style="color:#BDC1C6; text-decoration:underline;">Update Settings</a>
-                </div>
-            </div>
-        </div>
-        """
-
-        send_email_via_api(target_email, subject_line, html_body)
 
-    except Exception as e:
-        print(f"   ❌ FATAL ERROR: {e}")
-        traceback.print_exc()
+def write_job_state(job):
+    """
+    DB stage: writes fail_count increments / deactivations at once, queues
+    resets and the new report fingerprint for the next bulk flush, and
+    today's history snapshot.
+    """
+    if job["state"]:
+        state_buffer.put(job["user"]["college_id"], job["state"], urgent=job["report"] is None)   # strikes at once
+    if job["report"]:
+        history.record(job["user"]["college_id"], job["report"])
+    lease_queue.complete(job["user"]["college_id"])
+    return job
 
-        if not is_final_attempt:
-            raise e
-
-        new_fail = current_fails + 1
-        if new_fail >= 3:
-            print("   💀 3 Strikes. Deactivating.")
-            supabase.table("users").update({
-                "fail_count": new_fail,
-                "is_active":  False
-            }).eq("college_id", user_id).execute()
-            send_email_via_api(
-                target_email,
-                "Bot Deactivated",
-                "<h1>Login Failed 3 Times</h1><p>Please update your password on the portal: "
-                "<a href='https://attendance-notify.vercel.app/'>Update Settings</a>.</p>"
-            )
-        else:
-            supabase.table("users").update({"fail_count": new_fail}).eq("college_id", user_id).execute()
 
-    finally:
-        driver.quit()
+def process_user(user, pool, engine="auto"):
+    """All stages back-to-back for one user."""
+    item = user
+    try:
+        item = check_attendance_for_user(user, pool, engine)
+        if item is None:
+            return
+        item = send_job(render_job(item))
+    except Exception as e:
+        print(f"   ❌ Processing {user['college_id']} failed: {e}")
+        item = failed_job(item, e)
+    write_job_state(item)
 
 
 # ====================================================
@@ -457,50 +471,160 @@ def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("--shard_id",     type=int, default=0)
     parser.add_argument("--total_shards", type=int, default=1)
+    parser.add_argument("--browsers",      type=int, default=1)   # warm Chrome instances per worker
+    parser.add_argument("--recycle_after", type=int, default=20)  # relaunch a browser after N users
+    parser.add_argument("--engine", choices=["auto", "http", "selenium"], default="auto")
+    parser.add_argument("--detail_concurrency", type=int, default=4)  # parallel detail pages per user
+    parser.add_argument("--contexts",     type=int, default=0)    # >0: users in parallel, isolated contexts in one Chrome
+    parser.add_argument("--user_timeout", type=int, default=240)  # seconds before a hung context is disposed
+    parser.add_argument("--pipeline",     action="store_true")    # overlap scrape / render / send / db stages
+    parser.add_argument("--queue_size",   type=int, default=4)    # bounded queue between pipeline stages
+    parser.add_argument("--page_size",    type=int, default=200)  # users fetched per keyset page
+    parser.add_argument("--queue",        action="store_true")    # lease users from today's shared run queue
+    parser.add_argument("--lease_batch",  type=int, default=1)    # users leased per claim (--queue)
+    parser.add_argument("--lease_seconds", type=int, default=600) # before an unfinished lease can be re-claimed
+    parser.add_argument("--balance", choices=["cost", "hash"], default="cost")  # LPT on recorded costs, or college_id hash
+    rerun = parser.add_mutually_exclusive_group()
+    rerun.add_argument("--resume", dest="force", action="store_false")  # skip users already emailed today (default)
+    rerun.add_argument("--force",  dest="force", action="store_true")   # ignore today's ledger, redo everyone
+    parser.add_argument("--session_ttl",  type=int, default=25)   # minutes a cached portal session is trusted
+    parser.add_argument("--send_batch",   type=int, default=50)   # emails per transport call (one Gmail batch request, max 100)
+    parser.add_argument("--send_rate",    type=float, default=SENDS_PER_SECOND)  # account-wide sends/second
+    parser.add_argument("--daily_limit",  type=int, default=DAILY_SEND_LIMIT)    # Gmail daily sending limit
+    parser.add_argument("--drain_only",   action="store_true")    # only send outbox leftovers, no scraping
+    parser.add_argument("--state_flush_every",   type=int,   default=10)  # user-state changes per bulk flush
+    parser.add_argument("--state_flush_seconds", type=float, default=15)  # longest a state change stays buffered
     args = parser.parse_args()
 
+    session_cache.ttl = args.session_ttl * 60
+    # The Gmail per-second quota belongs to the sending account, so shards split it
+    outbox.configure(batch_size=args.send_batch, rate=args.send_rate / max(1, args.total_shards),
+                     daily_limit=args.daily_limit, shards=args.total_shards)
+
+    if args.drain_only:
+        # Send what earlier runs left in the outbox, without scraping anyone
+        print(f"📤 OUTBOX DRAIN — Worker {args.shard_id + 1} of {args.total_shards}")
+        outbox.drain()
+        transport.close()
+        outbox.report()
+        return
+
+    portal_http.DETAIL_CONCURRENCY = max(1, args.detail_concurrency)
+
     print(f"🚀 BOT V10.5 STARTED (BETA LOCK) — Worker {args.shard_id + 1} of {args.total_shards}")
 
+    # 💾 fail_count / deactivation / fingerprint writes are buffered and flushed in bulk
+    state_buffer.flush_every   = max(1, args.state_flush_every)
+    state_buffer.flush_seconds = args.state_flush_seconds
+    state_buffer.journal_path  = f".state_journal.shard{args.shard_id}.jsonl"
+    state_buffer.recover()
+    state_buffer.install_handlers()
+
     # 🔒 BETA LOCK
     BETA_USER = "0231csiot122@niet.co.in"
 
     try:
-        response = supabase.table("users") \
-            .select("*") \
-            .eq("is_active", True) \
-            .eq("college_id", BETA_USER) \
-            .execute()
-
-        all_users = response.data
-
-        if not all_users:
-            print("   ⚠️ Beta user not found or inactive.")
-            return
-
-        # ✅ SHARDING — only one worker processes the single beta user
-        my_users = [u for i, u in enumerate(all_users) if i % args.total_shards == args.shard_id]
-
-        if not my_users:
+        # Leftovers from earlier runs (deferred past the daily limit, crashed mid-send) go out first
+        outbox.drain(college_id=BETA_USER)
+
+        stream = None
+        if args.queue:
+            # 🎟️ WORK STEALING — whichever worker claims the beta user's lease first runs it
+            lease_queue.configure(worker=f"shard{args.shard_id}-{os.environ.get('GITHUB_RUN_ID', os.getpid())}",
+                                  batch=args.lease_batch, lease_seconds=args.lease_seconds,
+                                  college_id=BETA_USER)
+            try:
+                lease_queue.start()
+                stream = lease_queue
+            except Exception as e:
+                # sql/009 / 010 not applied — every worker falls back to the same fixed plan
+                print(f"   ⚠️ Lease queue unavailable ({e}), using a fixed shard plan")
+        if stream is None and args.balance == "cost":
+            # ⚖️ LPT PLAN — the beta user lands in whichever shard the plan gives it to
+            try:
+                stream = CostPlan(supabase, args.shard_id, args.total_shards,
+                                  page_size=args.page_size, college_id=BETA_USER, run_date=ledger.run_date)
+                stream.describe()
+            except Exception as e:
+                print(f"   ⚠️ Cost plan unavailable ({e}), using hash buckets")
+        if stream is None:
+            # ✅ SHARDING — the hash-bucket range is applied in the query, so only
+            #    the worker owning the beta user's bucket gets it back
+            stream = UserStream(supabase, args.shard_id, args.total_shards,
+                                page_size=args.page_size, college_id=BETA_USER)
+        shard_started = time.monotonic()
+        if not args.force:
+            # 📒 Re-triggered run: users already emailed today are skipped
+            print(f"📒 Resume: {len(ledger.load_done(BETA_USER))} user(s) already done on {ledger.run_date}")
+        users  = ledger.pending(iter(stream), on_skip=lease_queue.complete)
+        first  = next(users, None)
+
+        if first is None:
             print(f"   ℹ️ No users assigned to this worker. Exiting cleanly.")
             return
 
-        print(f"📋 Beta mode — this worker processing: {[u['college_id'] for u in my_users]}")
+        my_users = itertools.chain([first], users)
+        print(f"📋 Beta mode — this worker processing: {first['college_id']}")
 
-        for user in my_users:
-            for attempt in range(2):
-                try:
-                    check_attendance_for_user(user, is_final_attempt=(attempt == 1))
-                    break
-                except Exception as e:
-                    print(f"   🔄 Retry attempt {attempt + 1} for {user['college_id']}")
-                    if attempt == 1:
-                        print(f"   ❌ Final failure for {user['college_id']}")
-                    time.sleep(2)
+        if args.contexts > 0:
+            # 🧪 Several students at once inside one Chrome, one isolated context each
+            pool    = ContextPool(size=args.contexts, lease_timeout=args.user_timeout)
+            workers = args.contexts
+        else:
+            pool    = DriverPool(size=args.browsers, max_uses=args.recycle_after)
+            workers = args.browsers
+
+        if args.pipeline:
+            # 🏭 Sends and DB writes overlap with the next logins
+            run_pipeline(my_users, [
+                ("scrape", lambda u: check_attendance_for_user(u, pool, args.engine), workers),
+                ("render", render_job,      1),
+                ("send",   send_job,        1),
+                ("db",     write_job_state, 1),
+            ], queue_size=args.queue_size, on_error=failed_job)
+        elif workers > 1:
+            run_bounded(my_users, lambda u: process_user(u, pool, args.engine), workers)
+        else:
+            for user in my_users:
+                process_user(user, pool, args.engine)
+        shard_seconds = time.monotonic() - shard_started
+
+        outbox.flush()
+        ledger.flush()
+        state_buffer.flush()
+        history.flush()
+        lease_queue.close()
+        if args.shard_id == 0:
+            history.compact()
+        pool.close()
+        if isinstance(stream, CostPlan):
+            stream.report(shard_seconds)   # predicted vs actual makespan of this shard
+        else:
+            stream.report()
+        pool.report()
+        waits.SHARD_LOG.report("⏱️ Shard waits")
+        resource_block.SHARD_REPORT.report("🚫 Shard network")
+        session_cache.report()
+        watermark_store.report()
+        outbox.report()
+        change_filter.report()
+        state_buffer.report()
+        history.report()
+        ledger.report()
+        transport.report()
 
     except Exception as e:
         print(f"🔥 CRITICAL ERROR: {e}")
         traceback.print_exc()
 
+    finally:
+        outbox.flush()         # whatever was rendered before a crash still goes out
+        state_buffer.flush()   # same for buffered user-state changes
+        ledger.flush()
+        history.flush()
+        lease_queue.close()
+        transport.close()
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,166 @@
+import heapq
+import statistics
+from datetime import date, timedelta
+
+from shards import USER_COLUMNS
+
+# ====================================================
+# ⚖️ COST-AWARE SHARD BALANCING (LPT)
+# ====================================================
+#
+# Every user's scrape time (login retries included) and subject count
+# are kept on the user row (users.cost_seconds as a moving average,
+# users.subject_count, sql/010_user_costs.sql). The next run gives each
+# worker an equal share of predicted *time* instead of an equal share of
+# users: Longest Processing Time first — sort by predicted cost, give
+# each user to the currently lightest shard. Every worker computes the
+# same plan from the same (college_id, cost) list and keeps its own bin.
+# Users without history are predicted from their subject count, or the
+# median of everybody else.
+#
+# The list is frozen once per run date in `run_plans`
+# (sql/014_run_plans.sql): the first worker stores what it read, every
+# worker — including a late starter or a re-triggered run — plans from
+# that stored copy. Costs and deactivations written by workers already
+# running therefore never shift users between bins mid-run.
+
+COST_COLUMNS = "college_id, cost_seconds, subject_count"
+
+COST_SMOOTHING = 0.5    # weight of the newest measurement in cost_seconds
+BASE_SECONDS   = 20.0   # login + summary page, used while a user has no history
+PER_SUBJECT    = 3.0    # one detail page per subject
+DEFAULT_COST   = 45.0
+PLAN_DAYS      = 7      # frozen plans kept in run_plans (re-triggered runs of the last week)
+
+
+def cost_update(user, seconds, subjects=None):
+    """State columns recording one scrape; {} until the cost columns exist."""
+    if "cost_seconds" not in user:
+        return {}
+    previous = user.get("cost_seconds")
+    smoothed = seconds if previous is None else (1 - COST_SMOOTHING) * previous + COST_SMOOTHING * seconds
+    state    = {"cost_seconds": round(smoothed, 2)}
+    if subjects is not None and subjects != user.get("subject_count"):
+        state["subject_count"] = subjects
+    return state
+
+
+def predict(rows):
+    """[(college_id, predicted seconds)] for cost rows as stored in users."""
+    known    = [r["cost_seconds"] for r in rows if r.get("cost_seconds") is not None]
+    fallback = statistics.median(known) if known else DEFAULT_COST
+    out = []
+    for r in rows:
+        if r.get("cost_seconds") is not None:
+            cost = r["cost_seconds"]
+        elif r.get("subject_count"):
+            cost = BASE_SECONDS + PER_SUBJECT * r["subject_count"]
+        else:
+            cost = fallback
+        out.append((r["college_id"], float(cost)))
+    return out
+
+
+def lpt_assign(costs, bins):
+    """
+    Longest Processing Time first. Returns one (predicted_seconds, [college_id, ...])
+    per bin, each list in descending cost order. Ties break on college_id /
+    bin index, so every worker gets the identical plan.
+    """
+    bins    = max(1, bins)
+    heap    = [(0.0, i) for i in range(bins)]
+    members = [[] for _ in range(bins)]
+    for college_id, cost in sorted(costs, key=lambda c: (-c[1], c[0])):
+        load, i = heapq.heappop(heap)
+        members[i].append(college_id)
+        heapq.heappush(heap, (load + cost, i))
+    loads = [0.0] * bins
+    for load, i in heap:
+        loads[i] = load
+    return list(zip(loads, members))
+
+
+class CostPlan:
+    """
+    Iterable over this worker's bin: fetches the (small) cost list of all
+    active users, plans every shard, then loads full rows for its own
+    users only, page_size at a time, most expensive first.
+    """
+
+    def __init__(self, supabase, shard_id, total_shards, page_size=200, college_id=None, run_date=None):
+        self.supabase   = supabase
+        self.shard_id   = shard_id
+        self.page_size  = max(1, page_size)
+        self.college_id = college_id
+        self.run_date   = run_date or date.today()
+        self.users      = 0
+
+        rows  = self._snapshot()
+        costs = predict(rows)
+        self.plan      = lpt_assign(costs, total_shards)
+        self.predicted, self.ids = self.plan[shard_id] if shard_id < len(self.plan) else (0.0, [])
+        self.makespan  = max(load for load, _ in self.plan)
+        self.ideal     = sum(c for _, c in costs) / max(1, total_shards)
+        self.measured  = sum(1 for r in rows if r.get("cost_seconds") is not None)
+        self.total     = len(rows)
+
+    def _snapshot(self):
+        """Today's frozen cost rows; the first worker to get here stores the ones it read."""
+        scope = self.college_id or "*"
+
+        def _stored():
+            return self.supabase.table("run_plans").select("costs") \
+                .eq("run_date", self.run_date.isoformat()).eq("scope", scope).execute().data
+
+        found = _stored()
+        if not found:
+            self.supabase.table("run_plans").upsert(
+                {"run_date": self.run_date.isoformat(), "scope": scope, "costs": self._cost_rows()},
+                on_conflict="run_date,scope", ignore_duplicates=True,
+            ).execute()
+            found = _stored()   # a worker that raced us may have stored first — plan from its copy
+            try:
+                self.supabase.table("run_plans").delete() \
+                    .lt("run_date", (self.run_date - timedelta(days=PLAN_DAYS)).isoformat()).execute()
+            except Exception as e:
+                print(f"   ⚠️ Old run plans not cleaned up: {e}")
+        return found[0]["costs"]
+
+    def _cost_rows(self):
+        rows, after = [], None
+        while True:
+            query = self.supabase.table("users").select(COST_COLUMNS).eq("is_active", True)
+            if self.college_id:
+                query = query.eq("college_id", self.college_id)
+            if after is not None:
+                query = query.gt("college_id", after)
+            page = query.order("college_id").limit(1000).execute().data
+            rows.extend(page)
+            if len(page) < 1000:
+                return rows
+            after = page[-1]["college_id"]
+
+    def __iter__(self):
+        for i in range(0, len(self.ids), self.page_size):
+            chunk = self.ids[i:i + self.page_size]
+            found = {u["college_id"]: u for u in self.supabase.table("users")
+                     .select(USER_COLUMNS).in_("college_id", chunk).eq("is_active", True).execute().data}
+            for college_id in chunk:
+                if college_id in found:
+                    self.users += 1
+                    yield found[college_id]
+
+    def describe(self):
+        print(f"⚖️ LPT plan: {self.total} users ({self.measured} with history) | "
+              f"this shard {len(self.ids)} users, predicted {self.predicted:.0f}s | "
+              f"makespan {self.makespan:.0f}s vs ideal {self.ideal:.0f}s")
+        for i, (load, ids) in enumerate(self.plan):
+            mark = " ◀" if i == self.shard_id else ""
+            print(f"      shard {i}: {len(ids):4d} users | predicted {load:7.0f}s{mark}")
+
+    def report(self, actual_seconds=None):
+        line = f"⚖️ Shard {self.shard_id}: {self.users} users | predicted {self.predicted:.0f}s"
+        if actual_seconds is not None:
+            error = (actual_seconds - self.predicted) / self.predicted if self.predicted else 0.0
+            line += f" | actual {actual_seconds:.0f}s ({error:+.0%})"
+        print(line + f" | predicted makespan {self.makespan:.0f}s")
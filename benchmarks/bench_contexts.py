@@ -0,0 +1,94 @@
+import os
+import sys
+import time
+import threading
+import http.server
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from driver_pool import ContextPool, DriverPool
+
+# ====================================================
+# 🧪 CONTEXT POOL CHECK (needs Chrome)
+# ====================================================
+#
+#   python benchmarks/bench_contexts.py [slots] [users]
+#
+# Manual check for --contexts: serves a page on localhost, leases every
+# slot of a ContextPool at once, sets a cookie in each and verifies no
+# slot sees another's cookie — then runs `users` lease/release rounds
+# and compares the time per user with a DriverPool of the same size.
+# Exits non-zero when isolation breaks or a browser-level CDP command
+# is refused.
+
+
+class _Page(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html")
+        self.end_headers()
+        self.wfile.write(b"<html><body>ok</body></html>")
+
+    def log_message(self, *args):
+        pass
+
+
+def _serve():
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), _Page)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_address[1]}/"
+
+
+def check_isolation(pool, url, slots):
+    drivers = [pool.acquire() for _ in range(slots)]
+    try:
+        for i, driver in enumerate(drivers):
+            driver.get(url)
+            driver.execute_script(f"document.cookie = 'slot={i}; path=/'")
+        seen = [driver.execute_script("return document.cookie") for driver in drivers]
+    finally:
+        for driver in drivers:
+            pool.release(driver)
+    ok = seen == [f"slot={i}" for i in range(slots)]
+    print(f"🧪 Isolation across {slots} slots: {'ok' if ok else 'BROKEN'} {seen}")
+    return ok
+
+
+def rounds(pool, url, users):
+    started = time.perf_counter()
+    for _ in range(users):
+        driver = pool.acquire()
+        try:
+            driver.get(url)
+        finally:
+            pool.release(driver)
+    return (time.perf_counter() - started) / users
+
+
+def main():
+    if "-h" in sys.argv or "--help" in sys.argv:
+        sys.exit("usage: python benchmarks/bench_contexts.py [slots] [users]")
+    slots = int(sys.argv[1]) if len(sys.argv) > 1 else 2
+    users = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    url   = _serve()
+
+    contexts = ContextPool(size=slots)
+    try:
+        ok = check_isolation(contexts, url, slots)
+        per_context = rounds(contexts, url, users)
+    finally:
+        contexts.close()
+
+    drivers = DriverPool(size=1)
+    try:
+        per_driver = rounds(drivers, url, users)
+    finally:
+        drivers.close()
+
+    print(f"🧪 Per user: context pool {per_context * 1000:.0f}ms | driver pool {per_driver * 1000:.0f}ms")
+    contexts.report()
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+import os
+import sys
+import time
+import subprocess
+import statistics
+
+API_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "api")
+sys.path.insert(0, API_DIR)
+
+from flask import render_template_string
+from index import app, HTML_PAGE
+
+# ====================================================
+# 🧊 LANDING PAGE RESPONSE TIMES
+# ====================================================
+#
+#   python benchmarks/bench_landing.py [requests]
+#
+# Warm: in-process Flask test client, GET (plain, gzip, 304 revalidation)
+# and a POST that fails validation (no database round trip), next to the
+# old per-request render_template_string. Cold: a fresh interpreter that
+# imports the app and serves its first GET / POST.
+
+_COLD = """
+import sys, time
+started = time.perf_counter()
+sys.path.insert(0, {api!r})
+from index import app
+imported = time.perf_counter()
+client = app.test_client()
+client.{call}
+print((imported - started) * 1000, (time.perf_counter() - imported) * 1000)
+"""
+
+_BAD_FORM = {"college_id": "someone@gmail.com", "password": "x", "email": "a@b.c"}
+
+
+def _ms(fn, n):
+    samples = []
+    for _ in range(n):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def _cold(call):
+    out = subprocess.run([sys.executable, "-c", _COLD.format(api=API_DIR, call=call)],
+                         capture_output=True, text=True, check=True).stdout.split()
+    return float(out[-2]), float(out[-1])
+
+
+def main():
+    n      = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    client = app.test_client()
+    gz     = {"Accept-Encoding": "gzip, deflate, br"}
+    etag   = client.get("/", headers=gz).headers["ETag"]
+
+    def legacy_get():
+        with app.test_request_context("/"):
+            return render_template_string(HTML_PAGE, message=None, status="").encode()
+
+    rows = [
+        ("GET legacy render",   legacy_get),
+        ("GET identity",        lambda: client.get("/")),
+        ("GET gzip",            lambda: client.get("/", headers=gz)),
+        ("GET 304",             lambda: client.get("/", headers={**gz, "If-None-Match": etag})),
+        ("POST invalid (gzip)", lambda: client.post("/", data=_BAD_FORM, headers=gz)),
+    ]
+
+    real_stdout = sys.stdout
+    for name, fn in rows:
+        try:
+            sys.stdout = open(os.devnull, "w")   # the POST path logs a timing line per request
+            sample = fn()
+            ms     = _ms(fn, n)
+        finally:
+            sys.stdout.close()
+            sys.stdout = real_stdout
+        size = len(sample) if isinstance(sample, bytes) else len(sample.get_data())
+        print(f"🔥 warm {name:<20} {ms:7.3f}ms median | {size:6d} B")
+
+    for name, call in (("GET", "get('/')"), ("POST", f"post('/', data={_BAD_FORM!r})")):
+        imported, first = _cold(call)
+        print(f"🧊 cold {name:<4} import {imported:7.1f}ms | first response {first:7.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+import os
+import sys
+import time
+import statistics
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "api"))
+
+from index import app, get_clients, create_client, Fernet, SUPABASE_URL, SUPABASE_KEY, MASTER_KEY
+
+# ====================================================
+# 📝 REGISTRATION LATENCY
+# ====================================================
+#
+#   SUPABASE_URL=... SUPABASE_KEY=... MASTER_KEY=... \
+#   python benchmarks/bench_register.py [registrations]
+#
+# Registers throwaway users (bench-N@niet.co.in) against the configured
+# Supabase project, first the old way — fresh clients, select, then
+# update or insert — then through the registration route with shared
+# clients and one upsert (page rendering included, so the comparison
+# is conservative). Half of every round are re-registrations.
+# The throwaway rows are deleted at the end.
+
+
+def legacy_register(college_id, password, email):
+    """The per-POST path api/index.py used before shared clients (kept verbatim, minus the form parsing)."""
+    supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+    cipher = Fernet(MASTER_KEY.encode())
+    encrypted_pass = cipher.encrypt(password.encode()).decode()
+    check = supabase.table("users").select("*").eq("college_id", college_id).execute()
+    data = {
+        "college_id": college_id,
+        "encrypted_pass": encrypted_pass,
+        "target_email": email,
+        "is_active": True,
+        "fail_count": 0,
+        "notify_mode": "always"
+    }
+    if check.data:
+        supabase.table("users").update(data).eq("college_id", college_id).execute()
+    else:
+        supabase.table("users").insert(data).execute()
+
+
+def _summary(name, samples):
+    samples = sorted(samples)
+    p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+    print(f"📝 {name:<22} median {statistics.median(samples):7.1f}ms | p95 {p95:7.1f}ms | "
+          f"max {samples[-1]:7.1f}ms")
+
+
+def main():
+    if not (SUPABASE_URL and SUPABASE_KEY and MASTER_KEY):
+        sys.exit("usage: SUPABASE_URL=... SUPABASE_KEY=... MASTER_KEY=... "
+                 "python benchmarks/bench_register.py [registrations]\n"
+                 "(registers throwaway users, so it needs a real Supabase project)")
+
+    n   = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    ids = [f"bench-{i}@niet.co.in" for i in range(n // 2 or 1)]
+    ids = ids + ids   # second half re-registers
+
+    legacy = []
+    for college_id in ids:
+        started = time.perf_counter()
+        legacy_register(college_id, "bench-password", "bench@example.com")
+        legacy.append((time.perf_counter() - started) * 1000)
+
+    client = app.test_client()
+    shared = []
+    for college_id in ids:
+        started  = time.perf_counter()
+        response = client.post("/", data={"college_id": college_id, "password": "bench-password",
+                                          "email": "bench@example.com", "notify_mode": "always"})
+        shared.append((time.perf_counter() - started) * 1000)
+        if response.status_code != 200 or b"Error:" in response.data:
+            print(f"   ⚠️ {college_id}: registration failed")
+    print(f"   last Server-Timing: {response.headers.get('Server-Timing')}")
+
+    _summary("fresh clients + 2 RTT", legacy)
+    _summary("shared clients + upsert", shared)
+
+    supabase, _ = get_clients()
+    supabase.table("users").delete().like("college_id", "bench-%@niet.co.in").execute()
+
+
+if __name__ == "__main__":
+    main()
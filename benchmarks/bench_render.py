@@ -0,0 +1,159 @@
+import os
+import sys
+import time
+import random
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import re
+from renderer import render_report, get_personality
+from gmail_client import build_raw
+
+# ====================================================
+# ⏱️ RENDER MICROBENCHMARK
+# ====================================================
+#
+#   python benchmarks/bench_render.py [users] [subjects]
+#
+# Renders the same synthetic reports with the old f-string code and with
+# renderer.render_report, then prints time per message and payload bytes
+# (HTML and the base64 MIME body that is actually uploaded to Gmail).
+
+
+def legacy_render(report):
+    """The per-user f-string renderer the bots used before renderer.py (kept verbatim)."""
+    final_percent   = report["final_percent"]
+    parsed_subjects = report["subjects"]
+    total_attended  = report["attended"]
+    total_delivered = report["delivered"]
+
+    try:
+        val         = float(re.search(r'\d+\.?\d*', final_percent).group())
+        personality = get_personality(val)
+    except:
+        personality = {
+            "quote": "Attendance Updated", "status": "View Data",
+            "color": "#1976d2",            "subject_icon": "📅"
+        }
+
+    table_html = ""
+    for subj in parsed_subjects:
+        p_val    = float(subj['percent']) if subj['percent'].replace('.', '', 1).isdigit() else 100
+        p_color  = "#B94A40" if p_val < 75 else "#3C4043"
+        p_weight = "600"     if p_val < 75 else "500"
+
+        if subj['yesterday'] == "Present":
+            badge = ("<span style='background-color:#E8F3F0; color:#2E6B58; padding:6px 12px;"
+                     " border-radius:16px; font-size:0.75em; font-weight:700;"
+                     " letter-spacing:0.3px; text-transform:uppercase;'>Present</span>")
+        elif subj['yesterday'] == "Absent":
+            badge = ("<span style='background-color:#F7EBEA; color:#9E3F36; padding:6px 12px;"
+                     " border-radius:16px; font-size:0.75em; font-weight:700;"
+                     " letter-spacing:0.3px; text-transform:uppercase;'>Absent</span>")
+        else:
+            badge = "<span style='color:#9AA0A6; font-size:1.5em; line-height:0.8;'>-</span>"
+
+        table_html += f"""
+        <tr style="border-bottom: 1px solid #F1F3F4;">
+            <td style="padding: 16px 20px; font-size: 0.9em; color: #3C4043; line-height: 1.4; font-weight:500; vertical-align:middle;">{subj['name']}</td>
+            <td style="padding: 16px 20px; text-align: right; white-space: nowrap; vertical-align:middle;">
+                <div style="font-size: 1em; color: {p_color}; font-weight: {p_weight};">{subj['percent']}%</div>
+                <div style="font-size: 0.8em; color: #70757A; margin-top: 4px; font-weight: 500;">{subj['count']}</div>
+            </td>
+            <td style="padding: 16px 20px; text-align: right; white-space: nowrap; width: 90px; vertical-align:middle;">
+                {badge}
+            </td>
+        </tr>
+        """
+
+    subject_line = f"{personality['subject_icon']} {personality['status']}: {final_percent}"
+
+    html_body = f"""
+    <div style="background-color: #F8F9FA; padding: 30px 10px; font-family: 'Helvetica Neue', Helvetica, Arial, sans-serif; -webkit-font-smoothing: antialiased;">
+        <div style="max-width: 600px; margin: 0 auto; background: #ffffff; border-radius: 16px; overflow: hidden; box-shadow: 0 2px 8px rgba(0,0,0,0.08); border: 1px solid rgba(0,0,0,0.05);">
+
+            <div style="background-color: {personality['color']}; padding: 45px 30px; text-align: center;">
+                <h1 style="margin: 0; font-size: 4.5em; font-weight: 700; color: #ffffff; letter-spacing: -1.5px; line-height: 1;">{final_percent}</h1>
+                <div style="font-size: 1.4em; font-weight: 600; color: rgba(255,255,255,0.95); margin-top: 12px; letter-spacing: 0.5px;">{total_attended} / {total_delivered}</div>
+                <div style="font-size: 1.1em; color: rgba(255,255,255,0.85); font-weight: 600; margin-top: 10px; text-transform: uppercase; letter-spacing: 1.2px;">{personality['status']}</div>
+            </div>
+
+            <div style="background-color: #FFFFFF; padding: 20px 30px; text-align: center; border-bottom: 1px solid #F1F3F4;">
+                <p style="margin: 0; color: #5F6368; font-style: italic; font-size: 1em; font-weight: 400; line-height: 1.5;">
+                    {personality['subject_icon']} "{personality['quote']}"
+                </p>
+            </div>
+
+            <table style="width: 100%; border-collapse: collapse; margin-top: 10px;">
+                <thead>
+                    <tr>
+                        <th style="padding: 12px 20px; text-align: left; font-size: 0.7em; text-transform: uppercase; color: #9AA0A6; font-weight: 700; letter-spacing: 0.8px;">Subject</th>
+                        <th style="padding: 12px 20px; text-align: right; font-size: 0.7em; text-transform: uppercase; color: #9AA0A6; font-weight: 700; letter-spacing: 0.8px;">Overall</th>
+                        <th style="padding: 12px 20px; text-align: right; font-size: 0.7em; text-transform: uppercase; color: #9AA0A6; font-weight: 700; letter-spacing: 0.8px;">Yesterday</th>
+                    </tr>
+                </thead>
+                <tbody>
+                    {table_html}
+                </tbody>
+            </table>
+
+            <div style="padding: 20px; text-align: center; font-size: 0.75em; color: #BDC1C6; border-top: 1px solid #F1F3F4; background-color: #FFFFFF;">
+                NIET Attendance Bot • <a href="https://attendance-notify.vercel.app/" style="color:#BDC1C6; text-decoration:underline;">Update Settings</a>
+            </div>
+        </div>
+    </div>
+    """
+
+    return subject_line, html_body
+
+
+def synthetic_reports(users, subjects, seed=7):
+    rnd = random.Random(seed)
+    reports = []
+    for _ in range(users):
+        subj_rows, attended, delivered = [], 0, 0
+        for k in range(subjects):
+            d = rnd.randint(20, 60)
+            a = rnd.randint(d // 2, d)
+            attended, delivered = attended + a, delivered + d
+            subj_rows.append({
+                "name":      f"Subject {k + 1} — Applied Topic {rnd.randint(100, 999)}",
+                "percent":   f"{a / d * 100:.2f}",
+                "count":     f"{a}/{d}",
+                "yesterday": rnd.choice(["Present", "Absent", "No Class"]),
+            })
+        reports.append({
+            "final_percent": f"{round(attended / delivered * 100, 2)}%",
+            "subjects":      subj_rows,
+            "attended":      attended,
+            "delivered":     delivered,
+        })
+    return reports
+
+
+def bench(name, fn, reports, rounds=5):
+    best = float("inf")
+    for _ in range(rounds):
+        started = time.perf_counter()
+        out = [fn(r) for r in reports]
+        best = min(best, time.perf_counter() - started)
+    html_bytes = sum(len(body.encode()) for _, body in out) / len(out)
+    mime_bytes = sum(len(build_raw("student@example.com", subj, body)) for subj, body in out) / len(out)
+    per_msg_us = best / len(reports) * 1e6
+    print(f"{name:<10} {per_msg_us:9.1f} µs/msg | {html_bytes:8.0f} B html | {mime_bytes:8.0f} B raw MIME")
+    return per_msg_us, html_bytes, mime_bytes
+
+
+def main():
+    users    = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    subjects = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    reports  = synthetic_reports(users, subjects)
+
+    print(f"🎨 Rendering {users} reports x {subjects} subjects (best of 5)")
+    old = bench("f-string", legacy_render, reports)
+    new = bench("renderer", render_report, reports)
+    print(f"   speed-up x{old[0] / new[0]:.1f} | html -{1 - new[1] / old[1]:.0%} | raw MIME -{1 - new[2] / old[2]:.0%}")
+
+
+if __name__ == "__main__":
+    main()
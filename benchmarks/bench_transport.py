@@ -0,0 +1,149 @@
+import os
+import sys
+import time
+import tempfile
+import threading
+import socketserver
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from renderer import render_report
+from outbox import Outbox
+from mail_transport import MaildirTransport, SmtpTransport, transport_from_env
+from bench_render import synthetic_reports
+
+# ====================================================
+# 🚚 OFFLINE SEND THROUGHPUT
+# ====================================================
+#
+#   python benchmarks/bench_transport.py [messages] [maildir|sink|env]
+#
+#   maildir  writes into a temporary Maildir (default)
+#   sink     in-process SMTP sink on localhost; compares one pooled
+#            connection with a fresh connection per message
+#   env      whatever MAIL_TRANSPORT / SMTP_* point at (e.g. a local
+#            debugging SMTP server); smtp or maildir only — this is an
+#            offline benchmark and never sends through Gmail
+#
+# Render cost and send cost are timed separately, without scraping and
+# without the Gmail quota limiter.
+
+
+class _SinkHandler(socketserver.StreamRequestHandler):
+    """Just enough SMTP to accept mail and throw it away."""
+
+    def _reply(self, line):
+        self.wfile.write(line.encode() + b"\r\n")
+
+    def handle(self):
+        self._reply("220 sink ready")
+        for raw in self.rfile:
+            cmd = raw.decode(errors="replace").strip().upper()
+            if cmd.startswith(("EHLO", "HELO")):
+                self._reply("250 sink")
+            elif cmd == "DATA":
+                self._reply("354 go ahead")
+                for line in self.rfile:
+                    if line in (b".\r\n", b".\n"):
+                        break
+                self._reply("250 queued")
+            elif cmd == "QUIT":
+                self._reply("221 bye")
+                return
+            else:
+                self._reply("250 ok")
+
+
+def start_sink():
+    server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), _SinkHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+class _Reconnecting:
+    """Wraps an SmtpTransport so every message pays for its own connection (the un-pooled baseline)."""
+    name = "smtp"
+
+    def __init__(self, inner):
+        self.inner = inner
+
+    @property
+    def connects(self):
+        return self.inner.connects
+
+    @property
+    def connect_seconds(self):
+        return self.inner.connect_seconds
+
+    def send_many(self, items):
+        outcome = {}
+        for item in items:
+            outcome.update(self.inner.send_many([item]))
+            self.inner.close()
+        return outcome
+
+    def close(self):
+        self.inner.close()
+
+
+USAGE = "usage: python benchmarks/bench_transport.py [messages] [maildir|sink|env]"
+
+
+def main():
+    try:
+        n    = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+        mode = sys.argv[2] if len(sys.argv) > 2 else "maildir"
+    except ValueError:
+        sys.exit(USAGE)   # --help and friends
+    if mode not in ("maildir", "sink", "env"):
+        sys.exit(USAGE)
+    env_transport = os.environ.get("MAIL_TRANSPORT", "gmail").strip().lower()
+    if mode == "env" and env_transport not in ("smtp", "maildir"):
+        sys.exit(f"env mode needs MAIL_TRANSPORT=smtp or maildir (got {env_transport!r})\n{USAGE}")
+
+    with tempfile.TemporaryDirectory(prefix="bench_maildir_") as maildir:
+        run(n, mode, maildir)
+
+
+def run(n, mode, maildir):
+
+    started  = time.perf_counter()
+    rendered = [render_report(r) for r in synthetic_reports(n, 8)]
+    render_s = time.perf_counter() - started
+    print(f"🎨 Rendered {n} reports in {render_s * 1000:.1f}ms ({render_s / n * 1e6:.0f} µs/msg)")
+
+    results = []
+    if mode == "sink":
+        host, port = start_sink().server_address
+        results.append(("smtp pooled", SmtpTransport(host, port, tls="none", sender="bench@localhost")))
+        results.append(("smtp connect per msg",
+                        _Reconnecting(SmtpTransport(host, port, tls="none", sender="bench@localhost"))))
+    elif mode == "env":
+        results.append((os.environ["MAIL_TRANSPORT"].strip().lower(), transport_from_env(None)))
+    else:
+        results.append(("maildir", MaildirTransport(maildir)))
+
+    real_stdout = sys.stdout
+    for name, transport in results:
+        # The outbox prints a line per message; keep the benchmark output readable
+        try:
+            sys.stdout = open(os.devnull, "w")
+            started = time.perf_counter()
+            outbox  = Outbox(transport, batch_size=50, rate=1e9, daily_limit=10**9)
+            for subject, html_body in rendered:
+                outbox.add("student@example.com", subject, html_body)
+            outbox.flush()
+            wall = time.perf_counter() - started
+            transport.close()
+        finally:
+            sys.stdout.close()
+            sys.stdout = real_stdout
+        print(f"🚚 {name:<22} {n / wall:8.1f} msg/s | {wall / n * 1000:7.2f} ms/msg | "
+              f"{outbox.sent} sent, {outbox.failed} failed")
+        if hasattr(transport, "connects"):
+            print(f"      {transport.connects} SMTP connection(s), {transport.connect_seconds * 1000:.1f}ms connecting")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,362 @@
+import json
+import time
+import threading
+import urllib.request
+import websocket   # websocket-client, a selenium dependency
+from selenium import webdriver
+from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.chrome.service import Service
+
+# ====================================================
+# 🏊 WARM CHROME POOL (shared by both bots)
+# ====================================================
+#
+# Launching Chrome + Selenium Manager resolution costs several seconds.
+# The pool keeps a few browsers alive for the whole shard, wipes every
+# trace of the previous student between users and throws a browser away
+# after `max_uses` users or as soon as it stops responding.
+
+PORTAL_ORIGIN = "https://nietcloud.niet.co.in"
+
+
+def build_chrome_options():
+    chrome_options = Options()
+    chrome_options.add_argument("--headless")
+    chrome_options.add_argument("--no-sandbox")
+    chrome_options.add_argument("--disable-dev-shm-usage")
+    chrome_options.add_argument('--ignore-certificate-errors')
+    chrome_options.add_argument("--window-size=1920,1080")
+    chrome_options.add_argument(
+        "user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+        "AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+    )
+    chrome_options.add_argument("--disable-popup-blocking")
+    chrome_options.set_capability("unhandledPromptBehavior", "accept")
+    chrome_options.set_capability("goog:loggingPrefs", {"performance": "ALL"})  # feeds resource_block.collect
+    chrome_options.add_experimental_option("prefs", {
+        "profile.managed_default_content_settings.images":      2,
+        "profile.default_content_setting_values.notifications": 2,
+        "profile.managed_default_content_settings.stylesheets": 2,
+    })
+    return chrome_options
+
+
+class DriverPool:
+    def __init__(self, size=1, max_uses=20, options_factory=build_chrome_options):
+        self.size            = max(1, size)
+        self.max_uses        = max(1, max_uses)
+        self.options_factory = options_factory
+
+        self._idle      = []              # warm drivers waiting for a user
+        self._uses      = {}              # id(driver) -> users served
+        self._slots     = threading.Semaphore(self.size)
+        self._lock      = threading.Lock()
+        self._driver_path = None          # chromedriver resolved on first launch
+
+        self.launches       = 0
+        self.launch_seconds = 0.0
+        self.reuses         = 0
+        self.recycled       = 0
+        self.crashed        = 0
+
+    # ── LIFECYCLE ──────────────────────────────────────────────────────
+    def _launch(self):
+        started = time.time()
+        # Only the first launch pays for Selenium Manager; later ones reuse its answer
+        service = Service(executable_path=self._driver_path) if self._driver_path else Service()
+        driver  = webdriver.Chrome(options=self.options_factory(), service=service)
+        elapsed = time.time() - started
+
+        with self._lock:
+            if not self._driver_path:
+                self._driver_path = driver.service.path
+            self.launches       += 1
+            self.launch_seconds += elapsed
+            self._uses[id(driver)] = 0
+
+        print(f"   🚀 Chrome launched in {elapsed:.1f}s (pool launches: {self.launches})")
+        return driver
+
+    def _discard(self, driver):
+        with self._lock:
+            self._uses.pop(id(driver), None)
+        try:
+            driver.quit()
+        except Exception:
+            pass
+
+    def acquire(self):
+        self._slots.acquire()
+        with self._lock:
+            driver = self._idle.pop() if self._idle else None
+            if driver is not None:
+                self.reuses += 1
+        if driver is None:
+            try:
+                driver = self._launch()
+            except Exception:
+                self._slots.release()
+                raise
+        return driver
+
+    def release(self, driver):
+        """Hands a driver back. It is wiped first; a browser that cannot be wiped is dead."""
+        try:
+            with self._lock:
+                self._uses[id(driver)] = self._uses.get(id(driver), 0) + 1
+                worn_out = self._uses[id(driver)] >= self.max_uses
+
+            if worn_out:
+                self.recycled += 1
+                self._discard(driver)
+                return
+
+            try:
+                self.reset(driver)
+            except Exception as e:
+                print(f"   ♻️ Browser unhealthy after use ({type(e).__name__}), replacing it")
+                self.crashed += 1
+                self._discard(driver)
+                return
+
+            with self._lock:
+                self._idle.append(driver)
+        finally:
+            self._slots.release()
+
+    # ── ISOLATION BETWEEN STUDENTS ─────────────────────────────────────
+    @staticmethod
+    def reset(driver):
+        try:
+            driver.switch_to.alert.accept()
+        except Exception:
+            pass
+
+        # Close every tab except the first one
+        handles = driver.window_handles
+        for handle in handles[1:]:
+            driver.switch_to.window(handle)
+            driver.close()
+        driver.switch_to.window(handles[0])
+
+        driver.get("about:blank")
+        driver.delete_all_cookies()
+        driver.execute_cdp_cmd("Network.clearBrowserCookies", {})
+        driver.execute_cdp_cmd("Storage.clearDataForOrigin", {
+            "origin":       PORTAL_ORIGIN,
+            "storageTypes": "cookies,local_storage,session_storage,indexeddb,websql,service_workers,cache_storage",
+        })
+        driver.get_log("performance")   # drop the previous user's network events
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for driver in idle:
+            self._discard(driver)
+
+    # ── REPORTING ──────────────────────────────────────────────────────
+    def report(self):
+        avg_launch = self.launch_seconds / self.launches if self.launches else 0.0
+        saved      = self.reuses * avg_launch
+        print(
+            f"🏊 Driver pool: {self.launches} launches ({self.launch_seconds:.1f}s, avg {avg_launch:.1f}s) | "
+            f"{self.reuses} reuses | {self.recycled} recycled | {self.crashed} crashed | "
+            f"~{saved:.1f}s launch time saved"
+        )
+
+
+# ====================================================
+# 🧪 ISOLATED CONTEXTS IN ONE CHROME
+# ====================================================
+#
+# One host Chrome process; every slot is its own chromedriver session
+# attached to it (debuggerAddress) and driving a tab inside its own CDP
+# browser context — separate cookie jar and storage, like an incognito
+# window. Slots run users in parallel without paying for N browsers.
+# A context that stays leased longer than `lease_timeout` is disposed by
+# a watchdog, which makes the hung user's next command fail fast.
+#
+# Target.createBrowserContext / disposeBrowserContext / createTarget are
+# browser-level CDP commands: Chrome refuses them on a page session,
+# which is where chromedriver's execute_cdp_cmd sends everything. They
+# go over the browser websocket instead (BrowserCdp).
+#
+# Manual check (needs Chrome): python benchmarks/bench_contexts.py
+
+CDP_TIMEOUT = 30
+
+
+class BrowserCdp:
+    """Browser-target CDP session on a Chrome's debuggerAddress (host:port)."""
+
+    def __init__(self, debugger_address, timeout=CDP_TIMEOUT):
+        with urllib.request.urlopen(f"http://{debugger_address}/json/version", timeout=timeout) as resp:
+            url = json.loads(resp.read())["webSocketDebuggerUrl"]
+        self._ws     = websocket.create_connection(url, timeout=timeout, suppress_origin=True)
+        self._lock   = threading.Lock()
+        self._next   = 0
+
+    def send(self, method, params=None):
+        """Sends one command and returns its result; events in between are skipped."""
+        with self._lock:
+            self._next += 1
+            call_id = self._next
+            self._ws.send(json.dumps({"id": call_id, "method": method, "params": params or {}}))
+            while True:
+                message = json.loads(self._ws.recv())
+                if message.get("id") != call_id:
+                    continue
+                if "error" in message:
+                    raise RuntimeError(f"{method}: {message['error'].get('message', message['error'])}")
+                return message.get("result", {})
+
+    def close(self):
+        try:
+            self._ws.close()
+        except Exception:
+            pass
+
+
+class ContextPool:
+    def __init__(self, size=2, lease_timeout=240, options_factory=build_chrome_options):
+        self.size          = max(1, size)
+        self.lease_timeout = lease_timeout
+        self._host_pool    = DriverPool(size=1, max_uses=10**9, options_factory=options_factory)
+        self._host         = None
+        self._browser      = None               # BrowserCdp on the host's debuggerAddress
+        self._host_lock    = threading.Lock()   # host CDP calls are serialized
+        self._lock         = threading.Lock()
+        self._slots        = threading.Semaphore(self.size)
+        self._idle         = []                 # attached sessions ready for a user
+        self._contexts     = {}                 # id(driver) -> browserContextId
+        self._leases       = {}                 # id(driver) -> (driver, leased_at)
+
+        self.sessions  = 0
+        self.contexts  = 0
+        self.reuses    = 0
+        self.reaped    = 0
+        self.crashed   = 0
+
+        self._stop     = threading.Event()
+        self._watchdog = threading.Thread(target=self._watch, daemon=True)
+        self._watchdog.start()
+
+    # ── HOST + CONTEXTS ────────────────────────────────────────────────
+    def _host_driver(self):
+        with self._host_lock:
+            if self._host is None:
+                self._host = self._host_pool.acquire()
+            return self._host
+
+    def _cdp(self, cmd, params):
+        host = self._host_driver()
+        with self._host_lock:
+            if self._browser is None:
+                self._browser = BrowserCdp(host.capabilities["goog:chromeOptions"]["debuggerAddress"])
+            return self._browser.send(cmd, params)
+
+    def _new_context(self, driver):
+        context_id = self._cdp("Target.createBrowserContext", {"disposeOnDetach": False})["browserContextId"]
+        target_id  = self._cdp("Target.createTarget", {"url": "about:blank", "browserContextId": context_id})["targetId"]
+        driver.switch_to.window(target_id)   # chromedriver window handles are CDP target ids
+        with self._lock:
+            self._contexts[id(driver)] = context_id
+            self.contexts += 1
+
+    def _dispose_context(self, driver):
+        with self._lock:
+            context_id = self._contexts.pop(id(driver), None)
+        if context_id:
+            try:
+                self._cdp("Target.disposeBrowserContext", {"browserContextId": context_id})
+            except Exception:
+                pass
+
+    def _attach(self):
+        debugger_address = self._host_driver().capabilities["goog:chromeOptions"]["debuggerAddress"]
+        options = Options()
+        options.debugger_address = debugger_address
+        options.set_capability("unhandledPromptBehavior", "accept")
+        options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+        service = Service(executable_path=self._host_pool._driver_path)
+        driver  = webdriver.Chrome(options=options, service=service)
+        with self._lock:
+            self.sessions += 1
+        return driver
+
+    # ── POOL INTERFACE (same as DriverPool) ────────────────────────────
+    def acquire(self):
+        self._slots.acquire()
+        try:
+            with self._lock:
+                driver = self._idle.pop() if self._idle else None
+                if driver is not None:
+                    self.reuses += 1
+            if driver is None:
+                driver = self._attach()
+                self._new_context(driver)
+        except Exception:
+            self._slots.release()
+            raise
+        with self._lock:
+            self._leases[id(driver)] = (driver, time.monotonic())
+        return driver
+
+    def release(self, driver):
+        """Throws the user's whole context away and gives the session a brand-new one."""
+        try:
+            with self._lock:
+                self._leases.pop(id(driver), None)
+            self._dispose_context(driver)
+            try:
+                self._new_context(driver)
+            except Exception as e:
+                print(f"   ♻️ Context session unhealthy ({type(e).__name__}), replacing it")
+                self.crashed += 1
+                try:
+                    driver.quit()
+                except Exception:
+                    pass
+                return
+            with self._lock:
+                self._idle.append(driver)
+        finally:
+            self._slots.release()
+
+    # ── HANG WATCHDOG ──────────────────────────────────────────────────
+    def _watch(self):
+        while not self._stop.wait(5):
+            now = time.monotonic()
+            with self._lock:
+                hung = [d for d, leased_at in self._leases.values() if now - leased_at > self.lease_timeout]
+                for driver in hung:
+                    self._leases.pop(id(driver), None)
+            for driver in hung:
+                print(f"   ⏰ Context leased for over {self.lease_timeout}s — disposing it")
+                self.reaped += 1
+                self._dispose_context(driver)
+
+    def close(self):
+        self._stop.set()
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for driver in idle:
+            self._dispose_context(driver)
+            try:
+                driver.quit()
+            except Exception:
+                pass
+        if self._browser is not None:
+            self._browser.close()
+            self._browser = None
+        if self._host is not None:
+            self._host_pool._discard(self._host)
+            self._host = None
+
+    def report(self):
+        avg_launch = self._host_pool.launch_seconds / max(1, self._host_pool.launches)
+        print(
+            f"🧪 Context pool: 1 Chrome for {self.size} parallel slots | {self.sessions} sessions | "
+            f"{self.contexts} contexts | {self.reuses} reuses | {self.reaped} hung contexts reaped | "
+            f"{self.crashed} crashed | ~{(self.size - 1) * avg_launch:.1f}s of extra launches avoided"
+        )
@@ -0,0 +1,85 @@
+import json
+import time
+import base64
+import threading
+import httplib2
+import google_auth_httplib2
+from google.auth.transport.requests import Request
+from google.oauth2.credentials import Credentials
+from googleapiclient.discovery import build
+from email.mime.text import MIMEText
+from email.mime.multipart import MIMEMultipart
+
+# ====================================================
+# 📬 SHARED GMAIL API CLIENT
+# ====================================================
+#
+# Built once per process instead of once per email. The discovery
+# document comes from the copy bundled with google-api-python-client
+# (static_discovery=True, no network fetch), the OAuth token is only
+# refreshed when it has actually expired, and every sending thread gets
+# its own keep-alive AuthorizedHttp (httplib2 is not thread-safe) on top
+# of the one shared service object.
+
+HTTP_TIMEOUT = 30
+
+
+def build_raw(target_email, subject, html_content):
+    """base64url-encoded HTML message, ready for messages().send()."""
+    msg = MIMEMultipart("alternative")
+    msg['Subject'] = subject
+    msg['From']    = "me"
+    msg['To']      = target_email
+    msg.attach(MIMEText(html_content, "html", "utf-8"))
+    return base64.urlsafe_b64encode(msg.as_bytes()).decode()
+
+
+class GmailClient:
+    def __init__(self, token_json):
+        self.token_json = token_json
+        self._creds     = None
+        self._service   = None
+        self._lock      = threading.Lock()
+        self._local     = threading.local()
+
+        self.setup_seconds   = 0.0   # credentials + service build
+        self.refreshes       = 0
+        self.refresh_seconds = 0.0
+        self.sends           = 0
+        self.send_seconds    = 0.0
+        self.failures        = 0
+
+    # ── SETUP ──────────────────────────────────────────────────────────
+    @property
+    def service(self):
+        with self._lock:
+            if self._service is None:
+                started       = time.monotonic()
+                self._creds   = Credentials.from_authorized_user_info(json.loads(self.token_json))
+                self._service = build("gmail", "v1", credentials=self._creds,
+                                      static_discovery=True, cache_discovery=False)
+                self.setup_seconds += time.monotonic() - started
+            return self._service
+
+    def _fresh_credentials(self):
+        """Refreshes the access token once, under the lock, when it has expired."""
+        with self._lock:
+            if not self._creds.valid:
+                started = time.monotonic()
+                self._creds.refresh(Request())
+                self.refreshes       += 1
+                self.refresh_seconds += time.monotonic() - started
+        return self._creds
+
+    def http(self):
+        """This thread's authorized keep-alive connection."""
+        authed = getattr(self._local, "http", None)
+        if authed is None:
+            authed = google_auth_httplib2.AuthorizedHttp(self._creds, http=httplib2.Http(timeout=HTTP_TIMEOUT))
+            self._local.http = authed
+        return authed
+
+    def report(self):
+        avg = self.send_seconds / self.sends if self.sends else 0.0
+        print(f"📬 Gmail client: setup {self.setup_seconds:.2f}s once | {self.refreshes} token refreshes "
+              f"({self.refresh_seconds:.2f}s) | {self.sends} sends, avg {avg:.2f}s | {self.failures} failed")
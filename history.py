@@ -0,0 +1,143 @@
+import threading
+from datetime import date, timedelta
+
+# ====================================================
+# 📈 ATTENDANCE HISTORY (append-only snapshots)
+# ====================================================
+#
+# One row per (college_id, run_date, subject) in `attendance_history`
+# (sql/007_attendance_history.sql): attended / delivered as integers and
+# yesterday's status as one letter. Percentages are derived on read.
+# Rows are buffered for the whole shard and written with a few bulk
+# upserts at the end; re-running on the same day overwrites that day.
+#
+# Retention: daily rows are kept for `daily_days`, then only one row a
+# week (Mondays) until `weekly_days`, then nothing — compact_history()
+# in SQL, run once a day by worker 0.
+
+_STATUS_CODE = {"Present": "P", "Absent": "A", "No Class": "-", "Error": "E"}
+_STATUS_NAME = {v: k for k, v in _STATUS_CODE.items()}
+_STATUS_RANK = {"E": 3, "A": 2, "P": 1, "-": 0}   # which status wins when two rows merge
+
+_KEY = ("college_id", "run_date", "subject")
+
+
+def _counts(count_text):
+    try:
+        a, d = count_text.split("/")
+        return int(a.strip()), int(d.strip())
+    except:
+        return None
+
+
+class HistoryStore:
+    def __init__(self, supabase, table="attendance_history", batch_size=500,
+                 daily_days=60, weekly_days=365):
+        self.supabase    = supabase
+        self.table       = table
+        self.batch_size  = batch_size
+        self.daily_days  = daily_days
+        self.weekly_days = weekly_days
+        self._rows       = []
+        self._lock       = threading.Lock()
+
+        self.recorded = 0
+        self.written  = 0
+        self.requests = 0
+        self.failed   = 0
+
+    def record(self, college_id, report, run_date=None):
+        """
+        Buffers one snapshot row per subject of a scraped report. Subjects
+        listed twice under one name (theory + lab) are merged into one row.
+        """
+        run_date = (run_date or date.today()).isoformat()
+        merged = {}
+        for subj in report["subjects"]:
+            counts = _counts(subj["count"])
+            if counts is None:
+                continue
+            status = _STATUS_CODE.get(subj["yesterday"], "-")
+            row = merged.get(subj["name"])
+            if row is None:
+                merged[subj["name"]] = {
+                    "college_id": college_id,
+                    "run_date":   run_date,
+                    "subject":    subj["name"],
+                    "attended":   counts[0],
+                    "delivered":  counts[1],
+                    "yesterday":  status,
+                }
+            else:
+                row["attended"]  += counts[0]
+                row["delivered"] += counts[1]
+                row["yesterday"]  = max(row["yesterday"], status, key=_STATUS_RANK.get)
+        rows = list(merged.values())
+        with self._lock:
+            self._rows.extend(rows)
+            self.recorded += len(rows)
+
+    def flush(self):
+        """Writes everything buffered in batch_size chunks. Failed chunks stay buffered."""
+        with self._lock:
+            rows, self._rows = self._rows, []
+        # One row per conflict key: Postgres refuses to update the same row twice in one upsert
+        # (a user recorded again the same day keeps the latest snapshot)
+        rows = list({tuple(r[k] for k in _KEY): r for r in rows}.values())
+        kept = []
+        for i in range(0, len(rows), self.batch_size):
+            chunk = rows[i:i + self.batch_size]
+            try:
+                self.supabase.table(self.table) \
+                    .upsert(chunk, on_conflict="college_id,run_date,subject").execute()
+                self.requests += 1
+                self.written  += len(chunk)
+            except Exception as e:
+                self.failed += 1
+                kept.extend(chunk)
+                print(f"   ⚠️ History write failed ({len(chunk)} rows kept): {e}")
+        if kept:
+            with self._lock:
+                self._rows[:0] = kept
+        return not kept
+
+    def compact(self):
+        try:
+            self.supabase.rpc("compact_history", {
+                "daily_days":  self.daily_days,
+                "weekly_days": self.weekly_days,
+            }).execute()
+        except Exception as e:
+            print(f"   ⚠️ History compaction failed: {e}")
+
+    def recent(self, college_id, days=14):
+        """
+        A user's snapshots from the last `days` days, newest first:
+        [{"run_date", "attended", "delivered", "subjects": {name: {attended, delivered, percent, yesterday}}}].
+        One indexed range read on the primary key.
+        """
+        since = (date.today() - timedelta(days=days)).isoformat()
+        rows = self.supabase.table(self.table) \
+            .select("run_date, subject, attended, delivered, yesterday") \
+            .eq("college_id", college_id) \
+            .gte("run_date", since) \
+            .order("run_date", desc=True) \
+            .execute().data
+
+        snapshots = {}
+        for r in rows:
+            snap = snapshots.setdefault(r["run_date"], {"run_date": r["run_date"], "attended": 0,
+                                                        "delivered": 0, "subjects": {}})
+            snap["attended"]  += r["attended"]
+            snap["delivered"] += r["delivered"]
+            snap["subjects"][r["subject"]] = {
+                "attended":  r["attended"],
+                "delivered": r["delivered"],
+                "percent":   round(100.0 * r["attended"] / r["delivered"], 2) if r["delivered"] else None,
+                "yesterday": _STATUS_NAME.get(r["yesterday"], "No Class"),
+            }
+        return list(snapshots.values())
+
+    def report(self):
+        print(f"📈 History: {self.recorded} subject rows recorded, {self.written} written "
+              f"in {self.requests} request(s) | {len(self._rows)} unwritten | {self.failed} failed chunks")
@@ -0,0 +1,136 @@
+import time
+import threading
+from datetime import date
+
+# ====================================================
+# 🎟️ WORK-STEALING USER QUEUE (run leases)
+# ====================================================
+#
+# Instead of a fixed slice per shard, every worker keeps leasing the next
+# unprocessed user of today's run from `run_leases`
+# (sql/009_run_leases.sql). A fast worker simply claims more; a user
+# stuck behind a hung Chrome goes back to the pool once its lease runs
+# out (up to max_attempts claims in total). Finished users are reported
+# with the next claim, so a steady worker costs one round trip per user.
+#
+# When nothing is claimable but other workers still hold leases, the
+# queue waits for them to finish or expire before giving up. Users
+# deactivated mid-run are neither handed out nor waited for
+# (sql/013_active_leases.sql).
+
+class LeaseQueue:
+    def __init__(self, supabase, batch=1, lease_seconds=600, max_attempts=3, poll_seconds=15):
+        self.supabase      = supabase
+        self.enabled       = False
+        self.worker        = "worker"
+        self.run_date      = date.today()
+        self.college_id    = None   # restrict the run to one user (beta lock)
+        self.batch         = batch
+        self.lease_seconds = lease_seconds
+        self.max_attempts  = max_attempts
+        self.poll_seconds  = poll_seconds
+        self._done         = []
+        self._lock         = threading.Lock()
+
+        self.seeded    = 0
+        self.claims    = 0
+        self.claimed   = 0
+        self.completed = 0
+        self.waited    = 0.0
+
+    def configure(self, worker, batch=None, lease_seconds=None, college_id=None, run_date=None):
+        self.enabled    = True
+        self.worker     = worker
+        self.college_id = college_id
+        self.run_date   = run_date or self.run_date
+        if batch:
+            self.batch = max(1, batch)
+        if lease_seconds:
+            self.lease_seconds = lease_seconds
+
+    def seed(self):
+        """Adds today's active users to the queue; a no-op for everyone after the first worker."""
+        self.seeded = self.supabase.rpc("seed_run_leases", {
+            "p_run_date":   self.run_date.isoformat(),
+            "p_college_id": self.college_id,
+        }).execute().data or 0
+        return self.seeded
+
+    def start(self):
+        """
+        Seeds today's queue and checks that claim_run_leases answers. Raises —
+        with the queue disabled — when either is missing, so the caller can
+        fall back to a fixed shard plan.
+        """
+        try:
+            self.seed()
+            self._claim(0)
+        except Exception:
+            self.enabled = False
+            raise
+        return self.seeded
+
+    def complete(self, college_id):
+        """Marks a claimed user finished (reported with the next claim or at close)."""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._done.append(college_id)
+
+    def _take_done(self):
+        with self._lock:
+            done, self._done = self._done, []
+        return done
+
+    def _claim(self, limit):
+        done = self._take_done()
+        try:
+            rows = self.supabase.rpc("claim_run_leases", {
+                "p_run_date":      self.run_date.isoformat(),
+                "p_worker":        self.worker,
+                "p_limit":         limit,
+                "p_lease_seconds": self.lease_seconds,
+                "p_max_attempts":  self.max_attempts,
+                "p_done":          done,
+                "p_college_id":    self.college_id,
+            }).execute().data or []
+        except Exception:
+            with self._lock:
+                self._done[:0] = done   # not reported yet — try again with the next call
+            raise
+        self.claims    += 1
+        self.completed += len(done)
+        self.claimed   += len(rows)
+        return rows
+
+    def _open_elsewhere(self):
+        return self.supabase.rpc("open_run_leases", {
+            "p_run_date":     self.run_date.isoformat(),
+            "p_max_attempts": self.max_attempts,
+            "p_college_id":   self.college_id,
+        }).execute().data or 0
+
+    def __iter__(self):
+        while True:
+            rows = self._claim(self.batch)
+            if rows:
+                yield from rows
+                continue
+            # Nothing free: wait while other workers' leases may still finish or expire
+            if not self._open_elsewhere():
+                return
+            started = time.monotonic()
+            time.sleep(self.poll_seconds)
+            self.waited += time.monotonic() - started
+
+    def close(self):
+        """Reports the last finished users without claiming more."""
+        if self.enabled and self._done:
+            try:
+                self._claim(0)
+            except Exception as e:
+                print(f"   ⚠️ Lease completion failed: {e}")
+
+    def report(self):
+        print(f"🎟️ Leases ({self.worker}): {self.claimed} claimed in {self.claims} call(s), "
+              f"{self.completed} completed | waited {self.waited:.0f}s for other workers")
@@ -0,0 +1,126 @@
+import time
+import threading
+from datetime import date, datetime, timezone
+
+# ====================================================
+# 📒 RUN LEDGER (per-run-date completion checkpoints)
+# ====================================================
+#
+# `run_ledger` (sql/011_run_ledger.sql) holds one row per (run_date,
+# college_id) with the user's status for that day — scraped, emailed or
+# failed — and when each happened. "emailed" means the report reached
+# the durable outbox, so a re-triggered run (--resume, the default)
+# skips those users and only redoes the missing work: never reached,
+# scraped but not emailed, or failed. --force ignores the ledger.
+#
+# Marks are buffered and upserted in small batches (every flush_every
+# marks / flush_seconds), so a dying runner loses at most a few.
+
+class RunLedger:
+    def __init__(self, supabase, table="run_ledger", flush_every=10, flush_seconds=15.0):
+        self.supabase      = supabase
+        self.table         = table
+        self.run_date      = date.today()
+        self.flush_every   = flush_every
+        self.flush_seconds = flush_seconds
+        self._marks        = {}   # college_id -> columns changed this window
+        self._done         = set()
+        self._lock         = threading.Lock()
+        self._last         = time.monotonic()
+
+        self.skipped = 0
+        self.marked  = 0
+        self.writes  = 0
+        self.failed  = 0
+
+    # ── READ ───────────────────────────────────────────────────────────
+    def load_done(self, college_id=None):
+        """
+        College ids already emailed today, read in keyset pages. Empty when the
+        ledger cannot be read (sql/011 not applied yet): everyone is processed.
+        """
+        done, after = set(), None
+        try:
+            while True:
+                query = self.supabase.table(self.table).select("college_id") \
+                    .eq("run_date", self.run_date.isoformat()).eq("status", "emailed")
+                if college_id:
+                    query = query.eq("college_id", college_id)
+                if after is not None:
+                    query = query.gt("college_id", after)
+                page = query.order("college_id").limit(1000).execute().data
+                done.update(r["college_id"] for r in page)
+                if len(page) < 1000:
+                    break
+                after = page[-1]["college_id"]
+        except Exception as e:
+            print(f"   ⚠️ Ledger read failed ({e}), resuming nothing — every user is processed")
+            done = set()
+        self._done = done
+        return done
+
+    def pending(self, users, on_skip=None):
+        """Yields the users not completed yet today; on_skip(college_id) for the rest."""
+        for user in users:
+            if user["college_id"] in self._done:
+                self.skipped += 1
+                if on_skip:
+                    on_skip(user["college_id"])
+                continue
+            yield user
+
+    # ── WRITE ──────────────────────────────────────────────────────────
+    def _mark(self, college_id, status, **columns):
+        stamp = datetime.now(timezone.utc).isoformat()
+        with self._lock:
+            row = self._marks.setdefault(college_id, {})
+            row.update(columns)
+            row["status"] = status
+            row[f"{status}_at"] = stamp
+            self.marked += 1
+            due = (len(self._marks) >= self.flush_every
+                   or time.monotonic() - self._last >= self.flush_seconds)
+        if due:
+            self.flush()
+
+    def scraped(self, college_id, subjects):
+        self._mark(college_id, "scraped", subjects=subjects)
+
+    def emailed(self, college_id, emails):
+        self._mark(college_id, "emailed", emails=emails)
+
+    def failed_user(self, college_id, error=None):
+        self._mark(college_id, "failed", error=(str(error)[:500] if error else None))
+
+    def flush(self):
+        with self._lock:
+            marks, self._marks = self._marks, {}
+            self._last = time.monotonic()
+        if not marks:
+            return True
+
+        # Rows with the same column set go together, so an upsert never nulls a column it did not set
+        groups = {}
+        for college_id, row in marks.items():
+            full = {"run_date": self.run_date.isoformat(), "college_id": college_id, **row}
+            groups.setdefault(tuple(sorted(full)), []).append(full)
+
+        kept = {}
+        for rows in groups.values():
+            try:
+                self.supabase.table(self.table).upsert(rows, on_conflict="run_date,college_id").execute()
+                self.writes += 1
+            except Exception as e:
+                self.failed += 1
+                print(f"   ⚠️ Ledger write failed ({len(rows)} rows kept): {e}")
+                for r in rows:
+                    kept[r["college_id"]] = {k: v for k, v in r.items() if k not in ("run_date", "college_id")}
+        if kept:
+            with self._lock:
+                for college_id, row in kept.items():
+                    self._marks[college_id] = {**row, **self._marks.get(college_id, {})}
+        return not kept
+
+    def report(self):
+        print(f"📒 Ledger {self.run_date}: {self.skipped} users skipped as already done | "
+              f"{self.marked} marks in {self.writes} write(s) | {len(self._marks)} unwritten | {self.failed} failed writes")
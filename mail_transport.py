@@ -0,0 +1,204 @@
+import os
+import time
+import base64
+import smtplib
+import mailbox
+import threading
+from email import message_from_bytes, policy
+
+# ====================================================
+# 🚚 MAIL TRANSPORTS (chosen by MAIL_TRANSPORT)
+# ====================================================
+#
+# The outbox hands each transport a list of queued items ({"id", "to",
+# "raw", ...}, raw = base64url MIME as built by gmail_client.build_raw)
+# and gets back {str(id): None | exception}, one result per message.
+#
+#   MAIL_TRANSPORT=gmail    Gmail API batch endpoint (default)
+#   MAIL_TRANSPORT=smtp     one authenticated SMTP connection, reused for
+#                           every message (SMTP_HOST, SMTP_PORT, SMTP_USER,
+#                           SMTP_PASSWORD, SMTP_FROM, SMTP_TLS=starttls|ssl|none).
+#                           A local debugging server works as a stand-in.
+#   MAIL_TRANSPORT=maildir  writes every message into MAILDIR_PATH — an
+#                           offline sink for benchmarks and dry runs
+
+class GmailApiTransport:
+    name = "gmail"
+
+    def __init__(self, gmail):
+        self.gmail   = gmail
+        self.seconds = 0.0
+
+    def send_many(self, items):
+        outcome = {}
+
+        def _callback(request_id, response, exception):
+            outcome[request_id] = exception
+
+        started = time.monotonic()
+        try:
+            # Token, refresh and discovery problems are per-message failures too, like SMTP's
+            service = self.gmail.service
+            self.gmail._fresh_credentials()
+            batch = service.new_batch_http_request(callback=_callback)
+            for item in items:
+                batch.add(service.users().messages().send(userId="me", body={"raw": item["raw"]}),
+                          request_id=str(item["id"]))
+            batch.execute(http=self.gmail.http())
+        except Exception as e:
+            # The whole batch request failed — every message in it is a failure
+            for item in items:
+                outcome.setdefault(str(item["id"]), e)
+        elapsed = time.monotonic() - started
+        self.seconds += elapsed
+        with self.gmail._lock:
+            self.gmail.sends        += len(items)
+            self.gmail.send_seconds += elapsed
+            self.gmail.failures     += sum(1 for e in outcome.values() if e is not None)
+        return outcome
+
+    def close(self):
+        pass
+
+    def report(self):
+        self.gmail.report()
+
+
+def _mime_bytes(item, sender):
+    """Decodes the queued raw message and gives it a real From: (the Gmail API fills in 'me' itself)."""
+    msg = message_from_bytes(base64.urlsafe_b64decode(item["raw"]), policy=policy.SMTP)
+    del msg["From"]
+    msg["From"] = sender
+    return msg
+
+
+class SmtpTransport:
+    name = "smtp"
+
+    def __init__(self, host, port=587, user=None, password=None, sender=None, tls="starttls", timeout=30):
+        self.host     = host
+        self.port     = port
+        self.user     = user
+        self.password = password
+        self.sender   = sender or user or "attendance-bot@localhost"
+        self.tls      = tls
+        self.timeout  = timeout
+        self._conn    = None
+        self._lock    = threading.Lock()   # one connection, one conversation at a time
+
+        self.connects        = 0
+        self.connect_seconds = 0.0
+        self.sends           = 0
+        self.seconds         = 0.0
+
+    def _connect(self):
+        started = time.monotonic()
+        if self.tls == "ssl":
+            conn = smtplib.SMTP_SSL(self.host, self.port, timeout=self.timeout)
+        else:
+            conn = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+            if self.tls == "starttls":
+                conn.starttls()
+        if self.user:
+            conn.login(self.user, self.password)
+        self.connects        += 1
+        self.connect_seconds += time.monotonic() - started
+        return conn
+
+    def _send_one(self, item):
+        msg = _mime_bytes(item, self.sender)
+        for attempt in range(2):
+            if self._conn is None:
+                self._conn = self._connect()
+            try:
+                self._conn.send_message(msg, from_addr=self.sender, to_addrs=[item["to"]])
+                return
+            except smtplib.SMTPServerDisconnected:
+                # Server closed the idle connection — reconnect once and resend
+                self._conn = None
+                if attempt:
+                    raise
+
+    def send_many(self, items):
+        outcome = {}
+        with self._lock:
+            started = time.monotonic()
+            for item in items:
+                try:
+                    self._send_one(item)
+                    outcome[str(item["id"])] = None
+                    self.sends += 1
+                except Exception as e:
+                    outcome[str(item["id"])] = e
+                    if not isinstance(e, smtplib.SMTPRecipientsRefused):
+                        self._drop()
+            self.seconds += time.monotonic() - started
+        return outcome
+
+    def _drop(self):
+        try:
+            self._conn.quit()
+        except Exception:
+            pass
+        self._conn = None
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._drop()
+
+    def report(self):
+        avg = self.seconds / self.sends if self.sends else 0.0
+        print(f"🚚 SMTP {self.host}:{self.port}: {self.connects} connection(s) ({self.connect_seconds:.2f}s) | "
+              f"{self.sends} sends, avg {avg * 1000:.1f}ms")
+
+
+class MaildirTransport:
+    name = "maildir"
+
+    def __init__(self, path, sender="attendance-bot@localhost"):
+        for sub in ("tmp", "new", "cur"):
+            os.makedirs(os.path.join(path, sub), exist_ok=True)
+        self.path    = path
+        self.box     = mailbox.Maildir(path, create=False)
+        self.sender  = sender
+        self._lock   = threading.Lock()
+        self.sends   = 0
+        self.seconds = 0.0
+
+    def send_many(self, items):
+        outcome = {}
+        with self._lock:
+            started = time.monotonic()
+            for item in items:
+                try:
+                    self.box.add(_mime_bytes(item, self.sender))
+                    outcome[str(item["id"])] = None
+                    self.sends += 1
+                except Exception as e:
+                    outcome[str(item["id"])] = e
+            self.seconds += time.monotonic() - started
+        return outcome
+
+    def close(self):
+        pass
+
+    def report(self):
+        avg = self.seconds / self.sends if self.sends else 0.0
+        print(f"🚚 Maildir {self.path}: {self.sends} messages, avg {avg * 1000:.2f}ms")
+
+
+def transport_from_env(gmail):
+    kind = os.environ.get("MAIL_TRANSPORT", "gmail").strip().lower()
+    if kind == "smtp":
+        return SmtpTransport(
+            host     = os.environ.get("SMTP_HOST", "localhost"),
+            port     = int(os.environ.get("SMTP_PORT", "587")),
+            user     = os.environ.get("SMTP_USER") or None,
+            password = os.environ.get("SMTP_PASSWORD") or None,
+            sender   = os.environ.get("SMTP_FROM") or None,
+            tls      = os.environ.get("SMTP_TLS", "starttls").strip().lower(),
+        )
+    if kind == "maildir":
+        return MaildirTransport(os.environ.get("MAILDIR_PATH", "outbox_maildir"))
+    return GmailApiTransport(gmail)
@@ -0,0 +1,53 @@
+import json
+import hashlib
+import threading
+
+# ====================================================
+# 🔕 CHANGE-ONLY NOTIFICATIONS
+# ====================================================
+#
+# Every report gets a fingerprint (sha256 of its subjects and totals),
+# stored in users.report_fingerprint. Users who opted in via
+# users.notify_mode (sql/003_notify_mode.sql) get nothing ("changes") or
+# a one-line note ("summary") when today's report is identical to the
+# last one — holidays, weekends, days without lectures.
+
+NOTIFY_MODES = ("always", "changes", "summary")
+
+
+def report_fingerprint(report):
+    canonical = {
+        "subjects":  [[s["name"], s["percent"], s["count"], s["yesterday"]] for s in report["subjects"]],
+        "attended":  report["attended"],
+        "delivered": report["delivered"],
+    }
+    return hashlib.sha256(json.dumps(canonical, sort_keys=True, ensure_ascii=False).encode()).hexdigest()
+
+
+class ChangeFilter:
+    def __init__(self):
+        self._lock     = threading.Lock()
+        self.full      = 0
+        self.skipped   = 0
+        self.summaries = 0
+
+    def decide(self, user, fingerprint):
+        """'full', 'skip' or 'summary' for this user's report."""
+        mode = user.get("notify_mode") or "always"
+        same = fingerprint == user.get("report_fingerprint")
+        if not same or mode not in ("changes", "summary"):
+            outcome = "full"
+        else:
+            outcome = "skip" if mode == "changes" else "summary"
+        with self._lock:
+            if outcome == "full":
+                self.full += 1
+            elif outcome == "skip":
+                self.skipped += 1
+            else:
+                self.summaries += 1
+        return outcome
+
+    def report(self):
+        print(f"🔕 Change filter: {self.full} full reports | {self.summaries} one-line summaries | "
+              f"{self.skipped} unchanged reports skipped")
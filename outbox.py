@@ -0,0 +1,421 @@
+import time
+import random
+import smtplib
+import threading
+from datetime import datetime, timedelta, timezone
+from gmail_client import build_raw
+
+# ====================================================
+# 📮 DURABLE, BATCHED GMAIL OUTBOX
+# ====================================================
+#
+# Rendered emails are written to the Supabase `email_outbox` table
+# (sql/004_email_outbox.sql) the moment they are queued, then handed to
+# the mail transport in batches (mail_transport.py — for Gmail that is
+# one batch request, at most 100 calls) with a result per message.
+#
+# Sends are paced by a token bucket sized to the sending account's quota
+# and capped by the daily sending limit. 429 / 5xx / rate-limit 403s are
+# retried with exponential backoff and jitter; whatever is still unsent
+# at the end of the run stays `pending` in the table; the next run
+# drains it before scraping, and `--drain_only` sends it without
+# scraping anyone. The daily limit is shared by every shard: the sent
+# count is re-read from the table before each batch.
+
+GMAIL_BATCH_LIMIT = 100
+
+SENDS_PER_SECOND   = 2.5    # messages.send = 100 quota units, 250 units/s per user
+DAILY_SEND_LIMIT   = 500    # consumer Gmail; Workspace accounts allow 2000
+MAX_TOTAL_ATTEMPTS = 10     # across runs, then the message is marked failed
+BACKOFF_BASE       = 2.0
+BACKOFF_CAP        = 64.0
+STALE_CLAIM        = timedelta(minutes=15)   # a 'sending' row older than this belonged to a dead run
+
+
+class TokenBucket:
+    def __init__(self, rate, capacity):
+        self.rate     = rate
+        self.capacity = max(1.0, capacity)
+        self._tokens  = self.capacity
+        self._stamp   = time.monotonic()
+        self._lock    = threading.Lock()
+        self.waited   = 0.0
+
+    def take(self, n=1):
+        """Blocks until n tokens are available (n larger than the bucket is taken in bucket-sized steps)."""
+        while n > 0:
+            step = min(n, self.capacity)
+            with self._lock:
+                now          = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._stamp) * self.rate)
+                self._stamp  = now
+                missing      = step - self._tokens
+                if missing <= 0:
+                    self._tokens -= step
+                    n -= step
+                    continue
+                delay = missing / self.rate
+            self.waited += delay
+            time.sleep(delay)
+
+
+def _retriable(error):
+    """Network / batch failures, 429, 5xx, Gmail's rate-limit 403s and SMTP 4xx are worth another try."""
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return False   # every recipient rejected (no smtp_code of its own): resending changes nothing
+    smtp_code = getattr(error, "smtp_code", None)
+    if smtp_code is not None:
+        return 400 <= int(smtp_code) < 500
+    status = getattr(getattr(error, "resp", None), "status", None)
+    if status is None:
+        return True
+    status = int(status)
+    return status == 429 or status >= 500 or (status == 403 and "ateLimitExceeded" in str(error))
+
+
+def _backoff(attempts):
+    return min(BACKOFF_CAP, BACKOFF_BASE * 2 ** max(0, attempts - 1)) * random.uniform(0.5, 1.0)
+
+
+def _now():
+    return datetime.now(timezone.utc)
+
+
+def _stamp(dt):
+    """UTC timestamp safe to embed in a PostgREST or=() filter."""
+    return dt.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+# ====================================================
+# 🗄️ PERSISTENCE
+# ====================================================
+
+class OutboxStore:
+    def __init__(self, supabase, table="email_outbox"):
+        self.supabase = supabase
+        self.table    = table
+        self._use_rpc = True   # claim_outbox() (sql/015), until it turns out to be missing
+
+    def _try(self, what, fn):
+        try:
+            return fn()
+        except Exception as e:
+            print(f"   ⚠️ Outbox {what} failed: {e}")
+            return None
+
+    def insert(self, item):
+        """Stores a freshly rendered message, already claimed by this run. Returns its row id."""
+        res = self._try("insert", lambda: self.supabase.table(self.table).insert({
+            "college_id":   item["college_id"],
+            "target_email": item["to"],
+            "subject":      item["subject"],
+            "raw":          item["raw"],
+            "status":       "sending",
+            "claimed_at":   _now().isoformat(),
+        }).execute())
+        return res.data[0]["id"] if res and res.data else None
+
+    def claim_pending(self, limit, college_id=None):
+        """
+        Leftovers that are due, plus rows a crashed run had claimed. Other shards
+        drain at the same time, so a row is only ours if our claim won: one
+        claim_outbox() call (FOR UPDATE SKIP LOCKED), or else a per-row update
+        that still matches the status and claimed_at we read.
+        """
+        if self._use_rpc:
+            try:
+                return self.supabase.rpc("claim_outbox", {
+                    "p_limit":         limit,
+                    "p_stale_seconds": int(STALE_CLAIM.total_seconds()),
+                    "p_college_id":    college_id,
+                }).execute().data or []
+            except Exception as e:
+                # Migration not applied yet — compare-and-swap per row for the rest of the run
+                print(f"   ⚠️ claim_outbox() unavailable ({e}), claiming row by row")
+                self._use_rpc = False
+
+        now   = _now()
+        stale = _stamp(now - STALE_CLAIM)
+
+        def _read():
+            query = self.supabase.table(self.table) \
+                .select("id, college_id, target_email, subject, raw, attempts, status, claimed_at") \
+                .or_(f"and(status.eq.pending,next_attempt_at.lte.{_stamp(now)}),"
+                     f"and(status.eq.sending,claimed_at.lt.{stale})")
+            if college_id:
+                query = query.eq("college_id", college_id)
+            return query.order("id").limit(limit).execute()
+
+        res = self._try("read", _read)
+        claimed = []
+        for row in (res.data if res else []):
+            def _claim():
+                query = self.supabase.table(self.table) \
+                    .update({"status": "sending", "claimed_at": now.isoformat()}) \
+                    .eq("id", row["id"]).eq("status", row["status"])
+                if row["claimed_at"] is None:
+                    query = query.is_("claimed_at", "null")
+                else:
+                    query = query.eq("claimed_at", row["claimed_at"])
+                return query.execute()
+
+            got = self._try("claim", _claim)
+            if got and got.data:
+                claimed.append(row)
+        return claimed
+
+    def mark_sent(self, ids):
+        ids = [i for i in ids if isinstance(i, int)]
+        if ids:
+            self._try("update", lambda: self.supabase.table(self.table)
+                      .update({"status": "sent", "sent_at": _now().isoformat()})
+                      .in_("id", ids).execute())
+
+    def mark_retry(self, item, error, next_attempt_at):
+        if not isinstance(item["id"], int):
+            return   # never made it into the table
+        self._try("update", lambda: self.supabase.table(self.table).update({
+            "status":          "pending",
+            "attempts":        item["attempts"],
+            "last_error":      str(error)[:500],
+            "next_attempt_at": next_attempt_at.isoformat(),
+        }).eq("id", item["id"]).execute())
+
+    def mark_failed(self, item, error):
+        if not isinstance(item["id"], int):
+            return
+        self._try("update", lambda: self.supabase.table(self.table).update({
+            "status":     "failed",
+            "attempts":   item["attempts"],
+            "last_error": str(error)[:500],
+        }).eq("id", item["id"]).execute())
+
+    def sent_since(self, since):
+        """Messages sent since `since` by any run, or None when the count failed."""
+        res = self._try("count", lambda: self.supabase.table(self.table)
+                        .select("id", count="exact").eq("status", "sent")
+                        .gte("sent_at", since.isoformat()).limit(1).execute())
+        return (res.count or 0) if res else None
+
+
+# ====================================================
+# 📮 OUTBOX
+# ====================================================
+
+class Outbox:
+    def __init__(self, transport, store=None, batch_size=50, max_attempts=3,
+                 rate=SENDS_PER_SECOND, daily_limit=DAILY_SEND_LIMIT):
+        self.transport    = transport
+        self.store        = store
+        self.batch_size   = max(1, min(batch_size, GMAIL_BATCH_LIMIT))
+        self.max_attempts = max(1, max_attempts)   # tries within this run
+        self.daily_limit  = daily_limit
+        self.limiter      = TokenBucket(rate, capacity=rate)   # about one second of burst
+
+        self._pending   = []   # [{"id", "college_id", "to", "subject", "raw", "attempts", "tries"}]
+        self._lock      = threading.Lock()
+        self._flush     = threading.Lock()   # one batch in flight at a time
+        self._next_id   = 0
+        self._sent_today = 0                  # re-counted from the store before every batch
+        self.shards      = 1                  # workers sharing the daily limit
+
+        self.results  = {}   # id -> (to, subject, ok, error)
+        self.batches  = 0
+        self.sent     = 0
+        self.failed   = 0
+        self.retried  = 0
+        self.deferred = 0
+        self.drained  = 0
+        self.seconds  = 0.0
+
+    def configure(self, batch_size=None, rate=None, daily_limit=None, shards=None):
+        """Applies command-line settings before anything is queued."""
+        if batch_size is not None:
+            self.batch_size = max(1, min(batch_size, GMAIL_BATCH_LIMIT))
+        if rate is not None:
+            self.limiter = TokenBucket(rate, capacity=rate)
+        if daily_limit is not None:
+            self.daily_limit = daily_limit
+        if shards is not None:
+            self.shards = max(1, shards)
+
+    # ── QUEUEING ───────────────────────────────────────────────────────
+    def add(self, target_email, subject, html_content, college_id=None):
+        """
+        Persists and queues one message; sends a batch as soon as a full one is waiting.
+        Returns True when the message is stored in the table, False when only this
+        process holds it (no store, or the insert failed).
+        """
+        item = {
+            "id":         None,
+            "college_id": college_id,
+            "to":         target_email,
+            "subject":    subject,
+            "raw":        build_raw(target_email, subject, html_content),
+            "attempts":   0,
+            "tries":      0,
+        }
+        if self.store:
+            item["id"] = self.store.insert(item)
+        durable = item["id"] is not None
+        with self._lock:
+            if item["id"] is None:
+                self._next_id += 1
+                item["id"] = f"local-{self._next_id}"
+            self._pending.append(item)
+            full = len(self._pending) >= self.batch_size
+        print(f"   📮 Queued email to {target_email}")
+        if full:
+            self.flush(full_only=True)
+        return durable
+
+    def drain(self, college_id=None):
+        """
+        Sends leftovers from earlier runs (pending rows that are due, or orphaned
+        by a crash). Never raises: a failed drain is logged and the rows stay in
+        the table for the next one.
+        """
+        if not self.store:
+            return
+        try:
+            self._drain(college_id)
+        except Exception as e:
+            print(f"   ⚠️ Outbox drain failed, leftovers stay queued: {e}")
+
+    def _drain(self, college_id):
+        while True:
+            rows = self.store.claim_pending(self.batch_size, college_id)
+            if not rows:
+                break
+            with self._lock:
+                for row in rows:
+                    self._pending.append({
+                        "id":         row["id"],
+                        "college_id": row["college_id"],
+                        "to":         row["target_email"],
+                        "subject":    row["subject"],
+                        "raw":        row["raw"],
+                        "attempts":   row["attempts"] or 0,
+                        "tries":      0,
+                    })
+            self.drained += len(rows)
+            print(f"   📤 Draining {len(rows)} leftover message(s)...")
+            if not self.flush():
+                break   # daily quota reached
+
+    def _take(self, full_only):
+        with self._lock:
+            if not self._pending or (full_only and len(self._pending) < self.batch_size):
+                return []
+            chunk, self._pending = self._pending[:self.batch_size], self._pending[self.batch_size:]
+            return chunk
+
+    # ── QUOTA ──────────────────────────────────────────────────────────
+    def _quota_left(self):
+        """
+        How many messages this worker may send in its next batch. Today's sent count
+        comes from the table (all shards) when it can be read, else from our own
+        tally; each shard takes at most its share of what is left, so batches sent
+        at the same moment by other shards cannot push the total past the limit.
+        """
+        if self.store:
+            midnight = _now().replace(hour=0, minute=0, second=0, microsecond=0)
+            counted  = self.store.sent_since(midnight)
+            if counted is not None:
+                self._sent_today = max(counted, self._sent_today)
+        left = self.daily_limit - self._sent_today
+        if left <= 0:
+            return 0
+        return max(1, left // self.shards)
+
+    def _defer_all(self, reason):
+        """Leaves everything still queued in the table for a later run."""
+        with self._lock:
+            left, self._pending = self._pending, []
+        tomorrow = (_now() + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+        for item in left:
+            self.deferred += 1
+            if self.store:
+                self.store.mark_retry(item, reason, tomorrow)
+        if left:
+            print(f"   ⏸️ {reason} — {len(left)} message(s) left in the outbox for a later run")
+
+    # ── SENDING ────────────────────────────────────────────────────────
+    def _send_batch(self, chunk):
+        """{id: None or error} for every item; a transport that raises fails the whole chunk (retriable)."""
+        started = time.monotonic()
+        try:
+            outcome = self.transport.send_many(chunk)
+        except Exception as e:
+            print(f"   ⚠️ Mail transport failed for a batch of {len(chunk)}: {e}")
+            outcome = {str(item["id"]): e for item in chunk}
+        self.seconds += time.monotonic() - started
+        self.batches += 1
+        return outcome
+
+    def flush(self, full_only=False):
+        """
+        Sends everything queued (or only full batches). Returns False when
+        the daily limit stopped it. Failed messages are retried on their own.
+        """
+        with self._flush:
+            while True:
+                left = self._quota_left()
+                if left <= 0:
+                    self._defer_all("Daily Gmail sending limit reached")
+                    return False
+
+                chunk = self._take(full_only)
+                if not chunk:
+                    return True
+                if len(chunk) > left:
+                    with self._lock:
+                        self._pending = chunk[left:] + self._pending
+                    chunk = chunk[:left]
+
+                self.limiter.take(len(chunk))
+                outcome = self._send_batch(chunk)
+
+                sent_ids, retry = [], []
+                for item in chunk:
+                    item["attempts"] += 1
+                    item["tries"]    += 1
+                    error = outcome.get(str(item["id"]), "no response in batch")
+                    if error is None:
+                        self.sent += 1
+                        self._sent_today += 1
+                        sent_ids.append(item["id"])
+                        self.results[item["id"]] = (item["to"], item["subject"], True, None)
+                        print(f"   ✅ Sent to {item['to']}")
+                    elif not _retriable(error) or item["attempts"] >= MAX_TOTAL_ATTEMPTS:
+                        self.failed += 1
+                        self.results[item["id"]] = (item["to"], item["subject"], False, str(error))
+                        if self.store:
+                            self.store.mark_failed(item, error)
+                        print(f"   ❌ API Send Failed for {item['to']}: {error}")
+                    elif item["tries"] < self.max_attempts:
+                        self.retried += 1
+                        item["error"] = error
+                        retry.append(item)
+                    else:
+                        # Out of tries for this run — a later run (or --drain_only) picks it up
+                        self.deferred += 1
+                        if self.store:
+                            self.store.mark_retry(item, error, _now() + timedelta(seconds=_backoff(item["attempts"])))
+                        print(f"   ⏸️ Deferring {item['to']} after {item['tries']} tries: {error}")
+
+                if self.store:
+                    self.store.mark_sent(sent_ids)
+
+                if retry:
+                    delay = _backoff(max(item["attempts"] for item in retry))
+                    print(f"   🔁 Retrying {len(retry)} failed message(s) in {delay:.1f}s...")
+                    time.sleep(delay)
+                    with self._lock:
+                        self._pending = retry + self._pending
+
+    def report(self):
+        drained = f" | {self.drained} drained from earlier runs" if self.drained else ""
+        print(f"📮 Outbox ({self.transport.name}): {self.sent} sent in {self.batches} batch(es) ({self.seconds:.1f}s) | "
+              f"{self.retried} retried | {self.deferred} deferred | {self.failed} failed | "
+              f"{self.limiter.waited:.1f}s rate-limited{drained}")
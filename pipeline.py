@@ -0,0 +1,126 @@
+import time
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# ====================================================
+# 🏭 STAGED PIPELINE (load → scrape → render → send → db)
+# ====================================================
+#
+# Each stage is a blocking function run in worker threads and connected
+# to the next stage by a bounded asyncio.Queue. A full queue blocks the
+# upstream stage (backpressure), so a slow Gmail send never lets scraped
+# reports pile up unbounded — while the next login is already underway.
+
+_DONE = object()
+
+
+class StageStats:
+    def __init__(self, name, workers):
+        self.name    = name
+        self.workers = workers
+        self.items   = 0
+        self.errors  = 0
+        self.busy    = 0.0   # seconds spent inside the stage function
+        self.blocked = 0.0   # seconds waiting on a full downstream queue
+
+
+async def _put(queue, item, stats):
+    started = time.monotonic()
+    await queue.put(item)
+    stats.blocked += time.monotonic() - started
+
+
+async def _run(source, stages, queue_size, on_error):
+    queues = [asyncio.Queue(maxsize=queue_size) for _ in stages]
+    stats  = [StageStats("load", 1)] + [StageStats(name, workers) for name, _, workers in stages]
+
+    async def load():
+        it, st = iter(source), stats[0]
+        while True:
+            started = time.monotonic()
+            item    = await asyncio.to_thread(next, it, _DONE)   # source may page lazily from the DB
+            st.busy += time.monotonic() - started
+            if item is _DONE:
+                break
+            st.items += 1
+            await _put(queues[0], item, st)
+        for _ in range(stages[0][2]):
+            await queues[0].put(_DONE)
+
+    async def worker(i, fn):
+        inq  = queues[i]
+        outq = queues[i + 1] if i + 1 < len(stages) else None
+        st   = stats[i + 1]
+        while True:
+            item = await inq.get()
+            if item is _DONE:
+                return
+            started = time.monotonic()
+            try:
+                out = await asyncio.to_thread(fn, item)
+            except Exception as e:
+                print(f"   ❌ Pipeline stage '{st.name}' failed: {e}")
+                st.errors += 1
+                out = on_error(item, e) if on_error else None
+            st.busy  += time.monotonic() - started
+            st.items += 1
+            if out is not None and outq is not None:
+                await _put(outq, out, st)
+
+    async def stage(i, fn, workers):
+        await asyncio.gather(*(worker(i, fn) for _ in range(workers)))
+        if i + 1 < len(stages):
+            for _ in range(stages[i + 1][2]):
+                await queues[i + 1].put(_DONE)
+
+    # Enough threads for every stage worker at once (the default pool can be tiny on CI runners)
+    loop = asyncio.get_running_loop()
+    loop.set_default_executor(ThreadPoolExecutor(max_workers=1 + sum(w for _, _, w in stages)))
+
+    await asyncio.gather(load(), *(stage(i, fn, w) for i, (_, fn, w) in enumerate(stages)))
+    return stats
+
+
+def run_pipeline(source, stages, queue_size=4, on_error=None):
+    """
+    source:   iterable of items for the first stage.
+    stages:   [(name, fn, workers), ...] — fn(item) returns the item for the
+              next stage, or None to drop it.
+    on_error: on_error(item, exception) when a stage raises; its return value
+              goes on to the next stage in place of the lost item (None drops it).
+    """
+    started = time.monotonic()
+    stats   = asyncio.run(_run(source, stages, max(1, queue_size), on_error))
+    wall    = time.monotonic() - started
+
+    print(f"🏭 Pipeline finished in {wall:.1f}s")
+    for st in stats:
+        rate = st.items / wall if wall else 0.0
+        util = st.busy / (wall * st.workers) if wall else 0.0
+        err  = f" | {st.errors} errors" if st.errors else ""
+        print(f"      {st.name:<7} x{st.workers}: {st.items:4d} items | {rate:5.2f}/s | "
+              f"busy {st.busy:6.1f}s ({util:4.0%}) | blocked {st.blocked:5.1f}s{err}")
+    return stats
+
+
+def run_bounded(source, fn, workers):
+    """
+    fn(item) for every item of a (lazy) source on `workers` threads, with
+    at most 2 x workers submitted at once — unlike Executor.map, which
+    drains the whole source up front.
+    """
+    in_flight = threading.BoundedSemaphore(2 * workers)
+
+    def _call(item):
+        try:
+            fn(item)
+        except Exception as e:
+            print(f"   ❌ Worker failed: {e}")
+        finally:
+            in_flight.release()
+
+    with ThreadPoolExecutor(max_workers=workers) as ex:
+        for item in source:
+            in_flight.acquire()
+            ex.submit(_call, item)
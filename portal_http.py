@@ -0,0 +1,429 @@
+import re
+import time
+import hashlib
+import threading
+import requests
+from concurrent.futures import ThreadPoolExecutor
+import lxml.html
+import lxml.etree
+from datetime import datetime, date
+from urllib.parse import urljoin
+from requests.adapters import HTTPAdapter
+from session_cache import export_session_cookies
+
+# ====================================================
+# 🌐 BROWSERLESS PORTAL ENGINE (V10.5 flow over plain HTTP)
+# ====================================================
+#
+# Replays login → home.htm → studentCourses.htm → detail pages with a
+# cookie-carrying requests.Session and parses the HTML with lxml.
+# Anything unexpected raises PortalHttpError so the caller can fall
+# back to the Selenium path.
+
+LOGIN_URL  = "https://nietcloud.niet.co.in/login.htm"
+USER_AGENT = ("Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+              "AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36")
+TIMEOUT    = (10, 30)   # connect, read
+
+# Detail pages fetched in parallel per user (main() may override)
+DETAIL_CONCURRENCY = 4
+
+# Newest detail rows fingerprinted in a watermark (in-place corrections land here)
+TAIL_ROWS = 10
+
+ATT_TABLE_XPATH = "//table[.//*[contains(text(),'Course Name')] and .//*[contains(text(),'Attendance Count')]]"
+DETAIL_HDR_XPATH = "//*[contains(text(),'Attendance Details')]"
+
+# Closing a Session closes the adapters mounted on it, so every Session gets
+# its own. The HTTP engine keeps one long-lived Session per worker thread and
+# only drops its cookies between users — TLS connections to the portal are
+# reused across users while cookies stay per-user.
+_worker = threading.local()
+
+
+class PortalHttpError(Exception):
+    pass
+
+
+def new_session():
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=1)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update({"User-Agent": USER_AGENT})
+    return session
+
+
+def worker_session():
+    """This thread's reusable Session, with the previous user's cookies dropped."""
+    session = getattr(_worker, "session", None)
+    if session is None:
+        session = _worker.session = new_session()
+    session.cookies.clear()
+    session.headers["User-Agent"] = USER_AGENT
+    return session
+
+
+def session_from_driver(driver):
+    """HTTP session that carries the logged-in browser's cookies and user agent."""
+    session = new_session()
+    session.headers["User-Agent"] = driver.execute_script("return navigator.userAgent;")
+    for c in driver.get_cookies():
+        session.cookies.set(
+            c["name"], c["value"],
+            domain=c.get("domain", ""), path=c.get("path", "/"), secure=c.get("secure", False),
+        )
+    return session
+
+
+def _text(el):
+    return " ".join(el.text_content().split())
+
+
+def _parse(html, base_url=None):
+    """lxml document, or PortalHttpError for an empty / unparseable body (so auto mode falls back)."""
+    if not html or not html.strip():
+        raise PortalHttpError("Empty HTTP response body")
+    try:
+        return lxml.html.fromstring(html, base_url=base_url)
+    except (lxml.etree.ParserError, ValueError) as e:
+        raise PortalHttpError(f"Unparseable HTML: {e}") from e
+
+
+def _get(session, url, referer=None):
+    headers = {"Referer": referer} if referer else {}
+    resp = session.get(url, headers=headers, timeout=TIMEOUT)
+    resp.raise_for_status()
+    return resp
+
+
+# ====================================================
+# 🧩 PURE PARSERS (shared with the Selenium path)
+# ====================================================
+
+def day_status(rows, yesterday_str, yesterday_obj):
+    """
+    rows: detail-table rows as lists of cell texts, in page order.
+    Walks newest-first exactly like the Selenium scraper did.
+    """
+    daily_statuses = []
+    for d_cols in reversed(rows):
+        if len(d_cols) < 5:
+            continue
+        d_date_str = d_cols[1].strip()
+        d_stat     = d_cols[4].strip()
+
+        if d_date_str == yesterday_str:
+            daily_statuses.append("P" if d_stat == "P" else "A")
+
+        try:
+            if datetime.strptime(d_date_str, "%b %d,%Y").date() < yesterday_obj.date():
+                break
+        except Exception:
+            pass
+
+    if not daily_statuses:
+        return "No Class"
+    return "Present" if all(s == "P" for s in daily_statuses) else "Absent"
+
+
+def _row_date(d_cols):
+    if len(d_cols) < 5:
+        return None
+    try:
+        return datetime.strptime(d_cols[1].strip(), "%b %d,%Y").date()
+    except Exception:
+        return None
+
+
+def tail_hash(rows, row_count):
+    """Fingerprint of the last TAIL_ROWS rows among the first row_count."""
+    tail = rows[max(0, row_count - TAIL_ROWS):row_count]
+    text = "\n".join("\x1f".join(c.strip() for c in r) for r in tail)
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def tail_watermark(rows):
+    """Watermark for a fully scanned table: row count, newest date and the statuses recorded on it."""
+    last_date, statuses = None, []
+    for d_cols in reversed(rows):
+        d = _row_date(d_cols)
+        if d is None:
+            continue
+        if last_date is None:
+            last_date = d
+        elif d != last_date:
+            break
+        statuses.append("P" if d_cols[4].strip() == "P" else "A")
+    statuses.reverse()
+    return {
+        "row_count":     len(rows),
+        "last_date":     last_date.isoformat() if last_date else None,
+        "last_statuses": statuses,
+        "tail_hash":     tail_hash(rows, len(rows)),
+    }
+
+
+def incremental_day_status(rows, yesterday_str, yesterday_obj, mark=None):
+    """
+    Same answer as day_status, but only parses the rows added since `mark`
+    (see watermarks.py). Returns (status, new_mark).
+    Lectures are appended oldest-first, so rows[row_count:] are the new ones;
+    the watermark's tail_hash catches statuses corrected in place before that.
+    """
+    if not rows:
+        return "No Class", mark   # an empty read never wipes the watermark
+
+    y = yesterday_obj.date()
+    mark_date = date.fromisoformat(mark["last_date"]) if mark and mark.get("last_date") else None
+
+    # First sighting, a shrunk table (new term / portal reset), rows edited in
+    # place (tail fingerprint moved) or a watermark already past the day asked
+    # for — fall back to the full reverse walk.
+    if (mark is None or len(rows) < mark["row_count"] or (mark_date and mark_date > y)
+            or (mark.get("tail_hash") and tail_hash(rows, mark["row_count"]) != mark["tail_hash"])):
+        return day_status(rows, yesterday_str, yesterday_obj), tail_watermark(rows)
+
+    y_statuses = list(mark["last_statuses"]) if mark_date == y else []
+
+    # Nothing new since the last run
+    if len(rows) == mark["row_count"]:
+        status = "No Class"
+        if y_statuses:
+            status = "Present" if all(s == "P" for s in y_statuses) else "Absent"
+        if not mark.get("tail_hash"):
+            mark = {**mark, "tail_hash": tail_hash(rows, len(rows))}   # watermark from before tail hashes
+        return status, mark
+
+    last_date, statuses = mark_date, list(mark["last_statuses"])
+    for d_cols in rows[mark["row_count"]:]:
+        d = _row_date(d_cols)
+        if d is None:
+            continue
+        stat = "P" if d_cols[4].strip() == "P" else "A"
+        if d != last_date:
+            last_date, statuses = d, []
+        statuses.append(stat)
+        if d == y:
+            y_statuses.append(stat)
+
+    new_mark = {
+        "row_count":     len(rows),
+        "last_date":     last_date.isoformat() if last_date else None,
+        "last_statuses": statuses,
+        "tail_hash":     tail_hash(rows, len(rows)),
+    }
+    if not y_statuses:
+        return "No Class", new_mark
+    return ("Present" if all(s == "P" for s in y_statuses) else "Absent"), new_mark
+
+
+def parse_summary_rows(rows):
+    """
+    rows: summary-table rows as (cell texts, detail href or None).
+    Returns (rows_data, total_attended, total_delivered).
+    """
+    rows_data       = []
+    total_attended  = 0
+    total_delivered = 0
+
+    for cells, detail_url in rows:
+        # [0] Sr.No  [1] Course Code  [2] Course Name
+        # [3] Faculty  [4] Attendance Count  [5] Percentage
+        if len(cells) != 6:
+            continue
+
+        subj_name  = cells[2].strip()
+        count_text = cells[4].strip()
+        per_text   = cells[5].strip()
+
+        if not subj_name:
+            continue
+        if "/" not in count_text:
+            continue  # skip footer / total rows
+
+        try:
+            a, d = count_text.split("/")
+            total_attended  += int(a.strip())
+            total_delivered += int(d.strip())
+        except:
+            pass
+
+        rows_data.append({
+            "name":       subj_name,
+            "percent":    per_text,
+            "count":      count_text,
+            "detail_url": detail_url,
+        })
+
+    return rows_data, total_attended, total_delivered
+
+
+# ====================================================
+# 🔍 HTML EXTRACTION
+# ====================================================
+
+def extract_summary(html, base_url):
+    doc = _parse(html, base_url)
+    doc.make_links_absolute(base_url)
+
+    tables = doc.xpath(ATT_TABLE_XPATH)
+    if not tables:
+        return None
+
+    rows = []
+    for tr in tables[0].iter("tr"):
+        cols = list(tr.iter("td"))
+        href = None
+        if len(cols) == 6:
+            links = cols[4].xpath(".//a[@href]")
+            if links:
+                href = links[0].get("href")
+        rows.append(([_text(td) for td in cols], href))
+    return rows
+
+
+def extract_detail_rows(html):
+    doc = _parse(html)
+
+    detail_table = None
+    tables = doc.xpath(f"({DETAIL_HDR_XPATH}/following::table)[1]")
+    if tables:
+        detail_table = tables[0]
+    else:
+        for t in reversed(doc.xpath("//table")):
+            text = t.text_content()
+            if "Date" in text and "Status" in text:
+                detail_table = t
+                break
+
+    if detail_table is None:
+        return None
+    return [[_text(td) for td in tr.iter("td")] for tr in detail_table.iter("tr")]
+
+
+# ====================================================
+# 🚪 FLOW
+# ====================================================
+
+def login(session, user_id, college_pass):
+    resp = _get(session, LOGIN_URL)
+    doc  = _parse(resp.text, resp.url)
+
+    user_inputs = doc.xpath("//input[@id='j_username']")
+    pass_inputs = doc.xpath("//input[@id='password-1']")
+    if not user_inputs or not pass_inputs:
+        raise PortalHttpError("Login form not found in HTTP response")
+
+    form = user_inputs[0].getparent()
+    while form is not None and form.tag != "form":
+        form = form.getparent()
+    if form is None:
+        raise PortalHttpError("Login inputs are not inside a <form>")
+
+    # Carry over hidden fields (CSRF tokens etc.) exactly as the browser would
+    payload = {i.get("name"): i.get("value", "") for i in form.xpath(".//input[@name]")
+               if i.get("type", "text").lower() not in ("submit", "button", "checkbox", "radio")}
+    payload[user_inputs[0].get("name") or "j_username"] = user_id
+    payload[pass_inputs[0].get("name") or "j_password"] = college_pass
+
+    action = urljoin(resp.url, form.get("action") or resp.url)
+    resp   = session.post(action, data=payload, headers={"Referer": resp.url}, timeout=TIMEOUT)
+    resp.raise_for_status()
+
+    if "home.htm" not in resp.url:
+        if "j_username" in resp.text:
+            raise PortalHttpError("Login rejected (still on login page)")
+        resp = _get(session, urljoin(LOGIN_URL, "home.htm"), referer=action)
+        if "home.htm" not in resp.url:
+            raise PortalHttpError(f"Unexpected post-login URL: {resp.url}")
+    return resp
+
+
+def open_attendance(session, home_resp):
+    # The dashboard widget links to studentCourses.htm — follow the same link
+    # (with the dashboard as Referer) instead of clicking it.
+    link = re.search(r"""studentCourses\.htm[^"'\s)<>]*""", home_resp.text)
+    url  = urljoin(home_resp.url, link.group(0) if link else "studentCourses.htm")
+
+    resp = _get(session, url, referer=home_resp.url)
+    rows = extract_summary(resp.text, resp.url)
+    if not rows:
+        raise PortalHttpError("Attendance table missing from studentCourses.htm response")
+    return resp, rows
+
+
+def fetch_day_status(session, detail_url, referer, yesterday_str, yesterday_obj, missing="No Class", mark=None):
+    """
+    Returns (status, watermark). The watermark is unchanged unless the table was read.
+    missing: what to return when the page has no detail table. The browser
+    path passes None so it can re-check that subject in Chrome.
+    """
+    if not detail_url:
+        return "No Class", mark
+    try:
+        rows = extract_detail_rows(_get(session, detail_url, referer=referer).text)
+        if rows is None:
+            return missing, mark
+        return incremental_day_status(rows, yesterday_str, yesterday_obj, mark)
+    except Exception as e:
+        print(f"      ⚠️  Detail fetch error: {e}")
+        return "Error", mark
+
+
+def fetch_day_statuses(session, detail_urls, referer, yesterday_str, yesterday_obj, missing="No Class", marks=None):
+    """Fetches every detail page concurrently (bounded by DETAIL_CONCURRENCY); results keep input order."""
+    if not detail_urls:
+        return []
+    marks   = marks or [None] * len(detail_urls)
+    workers = max(1, min(DETAIL_CONCURRENCY, len(detail_urls)))
+    with ThreadPoolExecutor(max_workers=workers) as ex:
+        return list(ex.map(
+            lambda job: fetch_day_status(session, job[0], referer, yesterday_str, yesterday_obj, missing, job[1]),
+            zip(detail_urls, marks),
+        ))
+
+
+def scrape_user(user_id, college_pass, yesterday_str, yesterday_obj, cache=None, marks=None):
+    """
+    Returns (parsed_subjects, total_attended, total_delivered) — same shape as the Selenium path.
+    cache: optional SessionCache — a still-valid portal session skips the login post.
+    marks: optional {subject: watermark}, updated in place (see watermarks.py).
+    """
+    marks = {} if marks is None else marks
+    session = worker_session()
+    try:
+        home_resp = cache.resume_session(session, user_id) if cache else None
+        if home_resp is None:
+            started   = time.monotonic()
+            home_resp = login(session, user_id, college_pass)
+            if cache:
+                cache.record_login(time.monotonic() - started, "http")
+        if cache:
+            cache.save(user_id, export_session_cookies(session))   # logged in: a later retry can resume
+        att_resp, summary = open_attendance(session, home_resp)
+    except requests.RequestException as e:
+        raise PortalHttpError(f"HTTP error: {e}") from e
+
+    rows_data, total_attended, total_delivered = parse_summary_rows(summary)
+    if not rows_data:
+        raise PortalHttpError("No subject rows found in HTTP response")
+
+    results = fetch_day_statuses(
+        session, [item["detail_url"] for item in rows_data], att_resp.url, yesterday_str, yesterday_obj,
+        marks=[marks.get(item["name"]) for item in rows_data],
+    )
+
+    parsed_subjects = []
+    for item, (y_status, mark) in zip(rows_data, results):
+        print(f"   🔍 {item['name']} → {y_status}")
+        if mark is not None:
+            marks[item["name"]] = mark
+        parsed_subjects.append({
+            "name":      item["name"],
+            "percent":   item["percent"],
+            "count":     item["count"],
+            "yesterday": y_status,
+        })
+
+    return parsed_subjects, total_attended, total_delivered
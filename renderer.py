@@ -0,0 +1,166 @@
+import re
+
+# ====================================================
+# 🎨 REPORT EMAIL RENDERER (shared by both bots)
+# ====================================================
+#
+# The matte report template is minified and split into ready-made
+# pieces once, at import: page shell, one row template and the three
+# yesterday badges. Rendering a user is then a handful of joins over
+# those pieces instead of rebuilding kilobytes of inline styles.
+# benchmarks/bench_render.py compares it with the old f-string code.
+
+SETTINGS_URL = "https://attendance-notify.vercel.app/"
+
+DEFAULT_PERSONALITY = {"quote": "Attendance Updated", "status": "View Data", "color": "#1976d2", "subject_icon": "📅"}
+
+
+def get_personality(percentage):
+    p = float(percentage)
+    if p >= 90:   return {"quote": "Absolute Legend! 🏆 Basically living at college.",        "status": "Safe Zone",         "color": "#3A7D68", "subject_icon": "🏆"}
+    elif p >= 75: return {"quote": "You are Safe! Keep maintaining this flow.",                "status": "On Track",          "color": "#3A7D68", "subject_icon": "✅"}
+    elif p >= 60: return {"quote": "You are on thin ice! Don't skip anymore classes.",        "status": "Attendance is Low", "color": "#C27C2E", "subject_icon": "⚠️"}
+    else:         return {"quote": "DANGER ZONE! Run to college immediately!",                 "status": "Critical Low",      "color": "#B94A40", "subject_icon": "🚨"}
+
+
+# ── MINIFIER ───────────────────────────────────────────────────────────
+def _compact_style(match):
+    quote, css = match.group(1), match.group(2)
+    css = re.sub(r"\s*([;:,])\s*", r"\1", css.strip()).rstrip(";")
+    return f"style={quote}{css}{quote}"
+
+
+def minify(html):
+    """Drops indentation/newlines between tags and the spaces inside style attributes."""
+    html = re.sub(r"\s+", " ", html)
+    html = re.sub(r">\s+<", "><", html)
+    html = re.sub(r"style=([\"'])(.*?)\1", _compact_style, html)
+    return html.strip()
+
+
+def compile_template(html, fields):
+    """
+    Minifies html and splits it around its {field} slots. Returns the
+    literal pieces, len(fields) + 1 of them, to be joined with the values
+    in between. `fields` must list the slots in order — checked once, here.
+    """
+    html  = minify(html)
+    found = tuple(re.findall(r"\{(\w+)\}", html))
+    if found != tuple(fields):
+        raise ValueError(f"template slots {found} != {tuple(fields)}")
+    return tuple(re.split(r"\{\w+\}", html))
+
+
+# ── TEMPLATE PIECES (compiled once) ────────────────────────────────────
+_PAGE = compile_template("""
+<div style="background-color: #F8F9FA; padding: 30px 10px; font-family: 'Helvetica Neue', Helvetica, Arial, sans-serif; -webkit-font-smoothing: antialiased;">
+    <div style="max-width: 600px; margin: 0 auto; background: #ffffff; border-radius: 16px; overflow: hidden; box-shadow: 0 2px 8px rgba(0,0,0,0.08); border: 1px solid rgba(0,0,0,0.05);">
+        <div style="background-color: {color}; padding: 45px 30px; text-align: center;">
+            <h1 style="margin: 0; font-size: 4.5em; font-weight: 700; color: #ffffff; letter-spacing: -1.5px; line-height: 1;">{final_percent}</h1>
+            <div style="font-size: 1.4em; font-weight: 600; color: rgba(255,255,255,0.95); margin-top: 12px; letter-spacing: 0.5px;">{attended} / {delivered}</div>
+            <div style="font-size: 1.1em; color: rgba(255,255,255,0.85); font-weight: 600; margin-top: 10px; text-transform: uppercase; letter-spacing: 1.2px;">{status}</div>
+        </div>
+        <div style="background-color: #FFFFFF; padding: 20px 30px; text-align: center; border-bottom: 1px solid #F1F3F4;">
+            <p style="margin: 0; color: #5F6368; font-style: italic; font-size: 1em; font-weight: 400; line-height: 1.5;">{icon} "{quote}"</p>
+        </div>
+        <table style="width: 100%; border-collapse: collapse; margin-top: 10px;">
+            <thead>
+                <tr>
+                    <th style="padding: 12px 20px; text-align: left; font-size: 0.7em; text-transform: uppercase; color: #9AA0A6; font-weight: 700; letter-spacing: 0.8px;">Subject</th>
+                    <th style="padding: 12px 20px; text-align: right; font-size: 0.7em; text-transform: uppercase; color: #9AA0A6; font-weight: 700; letter-spacing: 0.8px;">Overall</th>
+                    <th style="padding: 12px 20px; text-align: right; font-size: 0.7em; text-transform: uppercase; color: #9AA0A6; font-weight: 700; letter-spacing: 0.8px;">Yesterday</th>
+                </tr>
+            </thead>
+            <tbody>{rows}</tbody>
+        </table>
+        <div style="padding: 20px; text-align: center; font-size: 0.75em; color: #BDC1C6; border-top: 1px solid #F1F3F4; background-color: #FFFFFF;">
+            NIET Attendance Bot • <a href="__SETTINGS_URL__" style="color:#BDC1C6; text-decoration:underline;">Update Settings</a>
+        </div>
+    </div>
+</div>
+""".replace("__SETTINGS_URL__", SETTINGS_URL),
+    ("color", "final_percent", "attended", "delivered", "status", "icon", "quote", "rows"))
+
+_ROW = compile_template("""
+<tr style="border-bottom: 1px solid #F1F3F4;">
+    <td style="padding: 16px 20px; font-size: 0.9em; color: #3C4043; line-height: 1.4; font-weight:500; vertical-align:middle;">{name}</td>
+    <td style="padding: 16px 20px; text-align: right; white-space: nowrap; vertical-align:middle;">
+        <div style="font-size: 1em; {percent_style}">{percent}%</div>
+        <div style="font-size: 0.8em; color: #70757A; margin-top: 4px; font-weight: 500;">{count}</div>
+    </td>
+    <td style="padding: 16px 20px; text-align: right; white-space: nowrap; width: 90px; vertical-align:middle;">{badge}</td>
+</tr>
+""", ("name", "percent_style", "percent", "count", "badge"))
+
+_LOW_PERCENT = "color:#B94A40;font-weight:600"
+_OK_PERCENT  = "color:#3C4043;font-weight:500"
+
+_PILL   = ("padding: 6px 12px; border-radius: 16px; font-size: 0.75em; font-weight: 700; "
+           "letter-spacing: 0.3px; text-transform: uppercase;")
+_BADGES = {
+    "Present": minify(f"<span style='background-color: #E8F3F0; color: #2E6B58; {_PILL}'>Present</span>"),
+    "Absent":  minify(f"<span style='background-color: #F7EBEA; color: #9E3F36; {_PILL}'>Absent</span>"),
+}
+_NO_CLASS = minify("<span style='color: #9AA0A6; font-size: 1.5em; line-height: 0.8;'>-</span>")
+
+DEACTIVATION_SUBJECT = "Bot Deactivated"
+DEACTIVATION_HTML    = (f"<h1>Login Failed 3 Times</h1><p>Please update your password on the portal: "
+                        f"<a href='{SETTINGS_URL}'>Update Settings</a>.</p>")
+
+
+# ── RENDERING ──────────────────────────────────────────────────────────
+def _row(subj):
+    percent = subj['percent']
+    p_val   = float(percent) if percent.replace('.', '', 1).isdigit() else 100
+    r = _ROW
+    return "".join((
+        r[0], subj['name'],
+        r[1], _LOW_PERCENT if p_val < 75 else _OK_PERCENT,
+        r[2], percent,
+        r[3], subj['count'],
+        r[4], _BADGES.get(subj['yesterday'], _NO_CLASS),
+        r[5],
+    ))
+
+
+def render_report(report):
+    """report: the dict returned by scrape_attendance. Returns (subject_line, html_body)."""
+    final_percent = report["final_percent"]
+    try:
+        personality = get_personality(float(re.search(r'\d+\.?\d*', final_percent).group()))
+    except:
+        personality = DEFAULT_PERSONALITY
+
+    p = _PAGE
+    html_body = "".join((
+        p[0], personality['color'],
+        p[1], final_percent,
+        p[2], str(report["attended"]),
+        p[3], str(report["delivered"]),
+        p[4], personality['status'],
+        p[5], personality['subject_icon'],
+        p[6], personality['quote'],
+        p[7], "".join([_row(subj) for subj in report["subjects"]]),
+        p[8],
+    ))
+    return f"{personality['subject_icon']} {personality['status']}: {final_percent}", html_body
+
+
+_UNCHANGED = compile_template("""
+<p style="font-family: 'Helvetica Neue', Helvetica, Arial, sans-serif; color: #3C4043; font-size: 1em;">
+    No change since your last report — overall <b>{final_percent}</b> ({attended} / {delivered}).
+    <a href="__SETTINGS_URL__" style="color: #70757A;">Settings</a>
+</p>
+""".replace("__SETTINGS_URL__", SETTINGS_URL), ("final_percent", "attended", "delivered"))
+
+
+def render_unchanged(report):
+    """One-line note for notify_mode='summary' users whose report did not change."""
+    u = _UNCHANGED
+    html_body = "".join((
+        u[0], report["final_percent"],
+        u[1], str(report["attended"]),
+        u[2], str(report["delivered"]),
+        u[3],
+    ))
+    return f"📅 No change: {report['final_percent']}", html_body
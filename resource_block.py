@@ -0,0 +1,114 @@
+import os
+import json
+import threading
+
+# ====================================================
+# 🚫 NETWORK-LEVEL RESOURCE BLOCKING (CDP)
+# ====================================================
+#
+# The Chrome prefs only stop images/stylesheets from being *rendered*.
+# Network.setBlockedURLs stops the requests themselves. The performance
+# log (enabled in build_chrome_options) is then replayed to report, per
+# page, how many requests were made, how many bytes came over the wire
+# and how many requests the block-list cancelled.
+
+DEFAULT_BLOCKLIST = [
+    # fonts
+    "*.woff", "*.woff2", "*.ttf", "*.otf", "*.eot",
+    "*fonts.googleapis.com*", "*fonts.gstatic.com*",
+    # images / media (prefs hide them, this stops the download)
+    "*.png", "*.jpg", "*.jpeg", "*.gif", "*.svg", "*.ico", "*.webp", "*.mp4", "*.webm",
+    # stylesheets (already disabled via prefs)
+    "*.css",
+    # analytics / third-party trackers
+    "*google-analytics.com*", "*googletagmanager.com*", "*doubleclick.net*",
+    "*facebook.net*", "*hotjar.com*", "*clarity.ms*",
+]
+
+
+def blocklist():
+    """RESOURCE_BLOCKLIST (comma-separated URL patterns) replaces the default list; 'none' disables blocking."""
+    raw = os.environ.get("RESOURCE_BLOCKLIST", "").strip()
+    if not raw:
+        return list(DEFAULT_BLOCKLIST)
+    if raw.lower() == "none":
+        return []
+    return [p.strip() for p in raw.split(",") if p.strip()]
+
+
+def apply(driver):
+    patterns = blocklist()
+    driver.execute_cdp_cmd("Network.enable", {})
+    driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": patterns})
+    return patterns
+
+
+# ====================================================
+# 📊 TRAFFIC REPORT
+# ====================================================
+
+class NetReport:
+    def __init__(self):
+        self.pages = {}   # page url -> [requests, bytes, blocked]
+        self._lock = threading.Lock()
+
+    def add(self, page, requests=0, nbytes=0, blocked=0):
+        with self._lock:
+            entry = self.pages.setdefault(page, [0, 0, 0])
+            entry[0] += requests
+            entry[1] += nbytes
+            entry[2] += blocked
+
+    def merge(self, other):
+        for page, (requests, nbytes, blocked) in other.pages.items():
+            self.add(page, requests, nbytes, blocked)
+
+    def totals(self):
+        return [sum(v[i] for v in self.pages.values()) for i in range(3)]
+
+    def report(self, title="🚫 Network"):
+        requests, nbytes, blocked = self.totals()
+        print(f"{title}: {requests} requests | {nbytes / 1024:.1f} KB transferred | {blocked} blocked")
+        for page, (r, b, x) in sorted(self.pages.items(), key=lambda kv: -kv[1][1]):
+            print(f"      {page[:60]:<60} {r:4d} req {b / 1024:8.1f} KB {x:4d} blocked")
+
+
+# Aggregated over every user this worker processes, keyed by page path
+SHARD_REPORT = NetReport()
+
+
+def _page_key(url):
+    return url.split("?", 1)[0]
+
+
+def collect(driver):
+    """Drains the performance log and groups traffic by the page (navigation) it belongs to."""
+    report = NetReport()
+    try:
+        entries = driver.get_log("performance")
+    except Exception:
+        return report
+
+    pages    = {}   # loaderId -> page url
+    owner    = {}   # requestId -> loaderId
+    pending  = []   # events seen before their document request
+
+    for entry in entries:
+        msg    = json.loads(entry["message"])["message"]
+        method = msg.get("method", "")
+        params = msg.get("params", {})
+
+        if method == "Network.requestWillBeSent":
+            loader = params.get("loaderId", "")
+            owner[params["requestId"]] = loader
+            if params.get("type") == "Document" and params["requestId"] == loader:
+                pages[loader] = _page_key(params["request"]["url"])
+            pending.append((loader, 1, 0, 0))
+        elif method == "Network.loadingFinished":
+            pending.append((owner.get(params["requestId"], ""), 0, int(params.get("encodedDataLength", 0)), 0))
+        elif method == "Network.loadingFailed" and params.get("blockedReason"):
+            pending.append((owner.get(params["requestId"], ""), 0, 0, 1))
+
+    for loader, requests, nbytes, blocked in pending:
+        report.add(pages.get(loader, "(other)"), requests, nbytes, blocked)
+    return report
@@ -0,0 +1,151 @@
+import json
+import threading
+from datetime import datetime, timedelta, timezone
+from cryptography.fernet import InvalidToken
+from selenium.webdriver.common.by import By
+
+# ====================================================
+# 🍪 ENCRYPTED PORTAL SESSION CACHE
+# ====================================================
+#
+# As soon as the dashboard loads the portal cookies are Fernet-encrypted with
+# MASTER_KEY and stored per college_id (memory + Supabase
+# `portal_sessions`, see sql/001_portal_sessions.sql). A retry or a later
+# run replays them and goes straight to home.htm; if the portal bounces
+# us back to the login page the entry is dropped and we log in normally.
+# The TTL is enforced by Fernet itself (decrypt(..., ttl=...)).
+
+PORTAL_HOME_URL = "https://nietcloud.niet.co.in/home.htm"
+
+
+class SessionCache:
+    def __init__(self, supabase, cipher, ttl_minutes=25, table="portal_sessions"):
+        self.supabase = supabase
+        self.cipher   = cipher
+        self.ttl      = int(ttl_minutes * 60)
+        self.table    = table
+        self._memory  = {}   # college_id -> token
+        self._lock    = threading.Lock()
+
+        self.hits     = {}   # engine -> resumed sessions
+        self.misses   = 0
+        self.rejected = 0
+        self.logins   = {}   # engine -> [count, seconds]
+
+    # ── STORAGE ────────────────────────────────────────────────────────
+    def load(self, college_id):
+        token = self._memory.get(college_id)
+        if token is None:
+            try:
+                rows = self.supabase.table(self.table).select("token") \
+                    .eq("college_id", college_id).limit(1).execute().data
+                token = rows[0]["token"] if rows else None
+            except Exception as e:
+                print(f"   ⚠️ Session cache read failed: {e}")
+        if token is None:
+            return None
+        try:
+            return json.loads(self.cipher.decrypt(token.encode(), ttl=self.ttl))
+        except InvalidToken:
+            return None   # expired (or written with another key)
+
+    def save(self, college_id, cookies):
+        token   = self.cipher.encrypt(json.dumps(cookies).encode()).decode()
+        expires = datetime.now(timezone.utc) + timedelta(seconds=self.ttl)
+        with self._lock:
+            self._memory[college_id] = token
+        try:
+            self.supabase.table(self.table).upsert({
+                "college_id": college_id,
+                "token":      token,
+                "expires_at": expires.isoformat(),
+            }, on_conflict="college_id").execute()
+        except Exception as e:
+            print(f"   ⚠️ Session cache write failed: {e}")
+
+    def drop(self, college_id):
+        with self._lock:
+            self._memory.pop(college_id, None)
+            self.rejected += 1
+        try:
+            self.supabase.table(self.table).delete().eq("college_id", college_id).execute()
+        except Exception:
+            pass
+
+    # ── ACCOUNTING ─────────────────────────────────────────────────────
+    def record_login(self, seconds, engine):
+        with self._lock:
+            entry = self.logins.setdefault(engine, [0, 0.0])
+            entry[0] += 1
+            entry[1] += seconds
+
+    def _hit(self, engine):
+        with self._lock:
+            self.hits[engine] = self.hits.get(engine, 0) + 1
+
+    def _miss(self):
+        with self._lock:
+            self.misses += 1
+
+    def report(self):
+        hits    = sum(self.hits.values())
+        lookups = hits + self.misses + self.rejected
+        saved   = sum(n * (self.logins[e][1] / self.logins[e][0])
+                      for e, n in self.hits.items() if self.logins.get(e, [0])[0])
+        rate    = hits / lookups if lookups else 0.0
+        print(f"🍪 Session cache: {hits}/{lookups} hits ({rate:.0%}) | {self.rejected} rejected by portal | "
+              f"~{saved:.1f}s of logins saved")
+
+    # ── RESUME HELPERS ─────────────────────────────────────────────────
+    def resume_session(self, session, college_id):
+        """requests.Session: returns the home.htm response when the cached cookies still work."""
+        cookies = self.load(college_id)
+        if not cookies:
+            self._miss()
+            return None
+        for c in cookies:
+            session.cookies.set(c["name"], c["value"], domain=c.get("domain", ""),
+                                path=c.get("path", "/"), secure=c.get("secure", False))
+        try:
+            resp = session.get(PORTAL_HOME_URL, timeout=(10, 30))
+            if "home.htm" in resp.url and "j_username" not in resp.text:
+                print("   🍪 Reusing cached portal session")
+                self._hit("http")
+                return resp
+        except Exception:
+            pass
+        session.cookies.clear()
+        self.drop(college_id)
+        return None
+
+    def resume_driver(self, driver, college_id):
+        """Selenium: True when the browser lands on home.htm with the cached cookies."""
+        cookies = self.load(college_id)
+        if not cookies:
+            self._miss()
+            return False
+        # Network.setCookies works before we are on the portal's domain
+        driver.execute_cdp_cmd("Network.setCookies", {"cookies": [
+            {"name": c["name"], "value": c["value"], "domain": c.get("domain", ""),
+             "path": c.get("path", "/"), "secure": c.get("secure", False)}
+            for c in cookies
+        ]})
+        driver.get(PORTAL_HOME_URL)
+        if "home.htm" in driver.current_url and not driver.find_elements(By.ID, "j_username"):
+            print("   🍪 Reusing cached portal session")
+            self._hit("selenium")
+            return True
+        driver.delete_all_cookies()
+        self.drop(college_id)
+        return False
+
+
+def export_session_cookies(session):
+    return [{"name": c.name, "value": c.value, "domain": c.domain, "path": c.path, "secure": bool(c.secure)}
+            for c in session.cookies]
+
+
+def export_driver_cookies(driver):
+    return [{"name": c["name"], "value": c["value"], "domain": c.get("domain", ""),
+             "path": c.get("path", "/"), "secure": c.get("secure", False)}
+            for c in driver.get_cookies()]
@@ -0,0 +1,106 @@
+import time
+import hashlib
+
+# ====================================================
+# 🧩 STABLE SHARD ASSIGNMENT
+# ====================================================
+#
+# Every user sits in one of SHARD_BUCKETS buckets derived from
+# md5(college_id) — the generated users.shard_bucket column
+# (sql/006_shard_bucket.sql). Worker k of n owns a contiguous bucket
+# range, so the split happens in the query: each worker downloads only
+# its own users, only the columns the bot reads, in college_id order,
+# one keyset page at a time.
+# Adding a user never moves anybody else to another worker.
+
+SHARD_BUCKETS = 840
+
+# Everything check_attendance_for_user / render_job / ChangeFilter / balance.cost_update read
+USER_COLUMNS = ("college_id, encrypted_pass, target_email, fail_count, notify_mode, report_fingerprint, "
+                "cost_seconds, subject_count")
+
+
+def shard_bucket(college_id):
+    """Python twin of users.shard_bucket."""
+    return int(hashlib.md5(college_id.encode()).hexdigest()[:8], 16) % SHARD_BUCKETS
+
+
+def bucket_range(shard_id, total_shards):
+    """[lo, hi) bucket range owned by one worker."""
+    total_shards = max(1, total_shards)
+    return (shard_id * SHARD_BUCKETS // total_shards,
+            (shard_id + 1) * SHARD_BUCKETS // total_shards)
+
+
+class UserStream:
+    """
+    This worker's active users, fetched page_size at a time with keyset
+    pagination on college_id (college_id > last seen, ordered, limited),
+    so scraping starts after the first page and only one page is held.
+    Iterating again starts a fresh pass.
+    """
+
+    def __init__(self, supabase, shard_id, total_shards, page_size=200, college_id=None):
+        self.supabase   = supabase
+        self.page_size  = max(1, page_size)
+        self.college_id = college_id
+        self._local     = False   # shard_bucket column missing: filter buckets client-side
+        self.lo, self.hi = bucket_range(shard_id, total_shards)
+
+        self.pages      = 0
+        self.users      = 0
+        self.seconds    = 0.0
+        self.first_page = None    # seconds until the first page arrived
+
+    def _query(self, after):
+        if self._local:
+            query = self.supabase.table("users").select("*").eq("is_active", True)
+        else:
+            query = self.supabase.table("users") \
+                .select(USER_COLUMNS) \
+                .eq("is_active", True) \
+                .gte("shard_bucket", self.lo) \
+                .lt("shard_bucket", self.hi)
+        if self.college_id:
+            query = query.eq("college_id", self.college_id)
+        if after is not None:
+            query = query.gt("college_id", after)
+        return query.order("college_id").limit(self.page_size)
+
+    def _page(self, after):
+        started = time.monotonic()
+        try:
+            rows = self._query(after).execute().data
+        except Exception as e:
+            if self._local:
+                raise
+            # Migration not applied yet — same buckets, computed client-side
+            print(f"   ⚠️ Shard query failed ({e}), filtering buckets locally")
+            self._local = True
+            rows = self._query(after).execute().data
+        elapsed = time.monotonic() - started
+        self.seconds += elapsed
+        self.pages   += 1
+        if self.first_page is None:
+            self.first_page = elapsed
+        return rows
+
+    def __iter__(self):
+        after = None
+        while True:
+            rows = self._page(after)
+            if not rows:
+                return
+            after = rows[-1]["college_id"]
+            for user in rows:
+                if self._local and not self.lo <= shard_bucket(user["college_id"]) < self.hi:
+                    continue
+                self.users += 1
+                yield user
+            if len(rows) < self.page_size:
+                return
+
+    def report(self):
+        first = f"{self.first_page * 1000:.0f}ms" if self.first_page is not None else "-"
+        print(f"📋 User stream: {self.users} users in {self.pages} page(s) of {self.page_size} "
+              f"({self.seconds:.2f}s, first page {first})")
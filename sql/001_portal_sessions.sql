@@ -0,0 +1,10 @@
+-- 🍪 Encrypted portal session cookies (session_cache.py)
+-- token = Fernet(MASTER_KEY) ciphertext of the cookie list; Fernet enforces the TTL,
+-- expires_at only exists so stale rows can be cleaned up.
+create table if not exists portal_sessions (
+    college_id  text primary key references users (college_id) on delete cascade,
+    token       text        not null,
+    expires_at  timestamptz not null
+);
+
+create index if not exists portal_sessions_expires_at_idx on portal_sessions (expires_at);
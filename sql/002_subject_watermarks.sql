@@ -0,0 +1,12 @@
+-- 🔖 Per-subject detail-table watermarks (watermarks.py)
+-- row_count     = detail rows seen by the last run
+-- last_date     = newest lecture date among them
+-- last_statuses = 'P'/'A' for every lecture on last_date (reused on a same-day re-run)
+create table if not exists subject_watermarks (
+    college_id     text    not null references users (college_id) on delete cascade,
+    subject        text    not null,
+    row_count      integer not null,
+    last_date      date,
+    last_statuses  jsonb   not null default '[]'::jsonb,
+    primary key (college_id, subject)
+);
@@ -0,0 +1,8 @@
+-- 🔕 Change-only notifications (notify.py)
+-- notify_mode        = 'always' (daily report), 'changes' (skip unchanged reports)
+--                      or 'summary' (one-line note when unchanged)
+-- report_fingerprint = sha256 of the last report's subjects and totals
+alter table users
+    add column if not exists notify_mode text not null default 'always'
+        check (notify_mode in ('always', 'changes', 'summary')),
+    add column if not exists report_fingerprint text;
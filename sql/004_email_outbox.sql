@@ -0,0 +1,20 @@
+-- 📮 Durable email outbox (outbox.py)
+-- status: sending (claimed by a running bot) -> sent | pending (retry at next_attempt_at) | failed
+create table if not exists email_outbox (
+    id               bigint generated always as identity primary key,
+    college_id       text references users (college_id) on delete set null,
+    target_email     text        not null,
+    subject          text        not null,
+    raw              text        not null,   -- base64url MIME, exactly what messages.send uploads
+    status           text        not null default 'pending'
+                     check (status in ('pending', 'sending', 'sent', 'failed')),
+    attempts         integer     not null default 0,
+    last_error       text,
+    next_attempt_at  timestamptz not null default now(),
+    claimed_at       timestamptz,
+    sent_at          timestamptz,
+    created_at       timestamptz not null default now()
+);
+
+create index if not exists email_outbox_due_idx  on email_outbox (status, next_attempt_at);
+create index if not exists email_outbox_sent_idx on email_outbox (sent_at) where status = 'sent';
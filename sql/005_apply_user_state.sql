@@ -0,0 +1,18 @@
+-- 💾 Bulk user-state writes (state_writes.py)
+-- changes = [{"college_id": ..., "fail_count"?: int, "is_active"?: bool, "report_fingerprint"?: text}, ...]
+-- Only the keys present in an element are changed; one statement for the whole batch.
+create or replace function apply_user_state(changes jsonb)
+returns integer
+language sql
+as $$
+    with updated as (
+        update users u set
+            fail_count         = case when c ? 'fail_count'         then (c->>'fail_count')::integer  else u.fail_count end,
+            is_active          = case when c ? 'is_active'          then (c->>'is_active')::boolean   else u.is_active end,
+            report_fingerprint = case when c ? 'report_fingerprint' then c->>'report_fingerprint'      else u.report_fingerprint end
+        from jsonb_array_elements(changes) as c
+        where u.college_id = c->>'college_id'
+        returning 1
+    )
+    select count(*)::integer from updated;
+$$;
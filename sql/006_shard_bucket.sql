@@ -0,0 +1,11 @@
+-- 🧩 Stable, database-side sharding (shards.py)
+-- shard_bucket = first 32 bits of md5(college_id) mod 840. 840 splits evenly
+-- into 1..8, 10, 12, 14, 15 ... workers; worker k of n reads the bucket range
+-- [k*840/n, (k+1)*840/n). shards.shard_bucket() computes the same value in Python.
+alter table users
+    add column if not exists shard_bucket integer
+        generated always as ((('x' || substr(md5(college_id), 1, 8))::bit(32)::bigint % 840)::integer) stored;
+
+create index if not exists users_active_shard_bucket_idx
+    on users (shard_bucket, college_id)
+    where is_active;
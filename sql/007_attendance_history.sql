@@ -0,0 +1,28 @@
+-- 📈 Append-only attendance snapshots (history.py)
+-- One row per user, run date and subject; percentages are attended / delivered.
+-- yesterday: 'P' present, 'A' absent, '-' no class, 'E' scrape error
+create table if not exists attendance_history (
+    college_id  text     not null references users (college_id) on delete cascade,
+    run_date    date     not null,
+    subject     text     not null,
+    attended    smallint not null,
+    delivered   smallint not null,
+    yesterday   char(1)  not null default '-',
+    primary key (college_id, run_date, subject)
+);
+
+create index if not exists attendance_history_run_date_idx on attendance_history (run_date);
+
+-- Retention: every row for `daily_days`, then Mondays only until `weekly_days`, then nothing.
+create or replace function compact_history(daily_days integer default 60, weekly_days integer default 365)
+returns integer
+language sql
+as $$
+    with removed as (
+        delete from attendance_history
+        where run_date < current_date - weekly_days
+           or (run_date < current_date - daily_days and extract(isodow from run_date) <> 1)
+        returning 1
+    )
+    select count(*)::integer from removed;
+$$;
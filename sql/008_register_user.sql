@@ -0,0 +1,22 @@
+-- 📝 One-round-trip registration (api/index.py)
+-- Inserts or updates the user in a single statement keyed on college_id and
+-- reports which one happened (xmax = 0 only for a freshly inserted row).
+create or replace function register_user(
+    p_college_id     text,
+    p_encrypted_pass text,
+    p_target_email   text,
+    p_notify_mode    text default 'always'
+)
+returns boolean
+language sql
+as $$
+    insert into users (college_id, encrypted_pass, target_email, is_active, fail_count, notify_mode)
+    values (p_college_id, p_encrypted_pass, p_target_email, true, 0, p_notify_mode)
+    on conflict (college_id) do update set
+        encrypted_pass = excluded.encrypted_pass,
+        target_email   = excluded.target_email,
+        is_active      = true,
+        fail_count     = 0,
+        notify_mode    = excluded.notify_mode
+    returning (xmax = 0);
+$$;
@@ -0,0 +1,88 @@
+-- 🎟️ Work-stealing run queue (leases.py)
+-- One row per (run_date, active user). Workers lease the next free users with
+-- FOR UPDATE SKIP LOCKED, so concurrent claims never block or double-book;
+-- a lease that outlives leased_until (crashed / hung worker) is claimable again,
+-- at most max_attempts times in total.
+create table if not exists run_leases (
+    run_date      date        not null,
+    college_id    text        not null references users (college_id) on delete cascade,
+    worker        text,
+    leased_until  timestamptz,
+    attempts      integer     not null default 0,
+    done_at       timestamptz,
+    primary key (run_date, college_id)
+);
+
+create index if not exists run_leases_open_idx on run_leases (run_date, college_id) where done_at is null;
+
+-- Idempotent: every worker calls it at start, the first one does the inserts
+create or replace function seed_run_leases(p_run_date date, p_college_id text default null)
+returns integer
+language sql
+as $$
+    with seeded as (
+        insert into run_leases (run_date, college_id)
+        select p_run_date, college_id from users
+        where is_active and (p_college_id is null or college_id = p_college_id)
+        on conflict do nothing
+        returning 1
+    )
+    select count(*)::integer from seeded;
+$$;
+
+-- Completes p_done (leases this worker finished) and claims up to p_limit more in one round trip
+create or replace function claim_run_leases(
+    p_run_date      date,
+    p_worker        text,
+    p_limit         integer default 1,
+    p_lease_seconds integer default 600,
+    p_max_attempts  integer default 3,
+    p_done          text[]  default '{}',
+    p_college_id    text    default null
+)
+returns table (college_id text, encrypted_pass text, target_email text, fail_count integer,
+               notify_mode text, report_fingerprint text)
+language plpgsql
+as $$
+#variable_conflict use_column
+begin
+    update run_leases l set done_at = now(), leased_until = null
+    where l.run_date = p_run_date and l.college_id = any(p_done) and l.done_at is null;
+
+    return query
+    with picked as (
+        select l.college_id from run_leases l
+        where l.run_date = p_run_date
+          and l.done_at is null
+          and l.attempts < p_max_attempts
+          and (l.leased_until is null or l.leased_until < now())
+          and (p_college_id is null or l.college_id = p_college_id)
+        order by l.college_id
+        limit p_limit
+        for update skip locked
+    ), claimed as (
+        update run_leases l set
+            worker       = p_worker,
+            leased_until = now() + make_interval(secs => p_lease_seconds),
+            attempts     = l.attempts + 1
+        from picked
+        where l.run_date = p_run_date and l.college_id = picked.college_id
+        returning l.college_id
+    )
+    select u.college_id, u.encrypted_pass, u.target_email, u.fail_count, u.notify_mode, u.report_fingerprint
+    from users u join claimed c on c.college_id = u.college_id
+    where u.is_active
+    order by u.college_id;
+end;
+$$;
+
+-- Leases still held by someone else that may yet expire and come back
+create or replace function open_run_leases(p_run_date date, p_max_attempts integer default 3,
+                                           p_college_id text default null)
+returns integer
+language sql
+as $$
+    select count(*)::integer from run_leases
+    where run_date = p_run_date and done_at is null and attempts < p_max_attempts
+      and (p_college_id is null or college_id = p_college_id);
+$$;
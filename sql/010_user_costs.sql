@@ -0,0 +1,76 @@
+-- ⚖️ Per-user scrape cost for LPT shard balancing (balance.py)
+-- cost_seconds  = moving average of the scrape time, login retries included
+-- subject_count = subjects on the last report (one detail page each)
+alter table users
+    add column if not exists cost_seconds  real,
+    add column if not exists subject_count integer;
+
+-- apply_user_state (sql/005) learns the two new columns
+create or replace function apply_user_state(changes jsonb)
+returns integer
+language sql
+as $$
+    with updated as (
+        update users u set
+            fail_count         = case when c ? 'fail_count'         then (c->>'fail_count')::integer  else u.fail_count end,
+            is_active          = case when c ? 'is_active'          then (c->>'is_active')::boolean   else u.is_active end,
+            report_fingerprint = case when c ? 'report_fingerprint' then c->>'report_fingerprint'      else u.report_fingerprint end,
+            cost_seconds       = case when c ? 'cost_seconds'       then (c->>'cost_seconds')::real    else u.cost_seconds end,
+            subject_count      = case when c ? 'subject_count'      then (c->>'subject_count')::integer else u.subject_count end
+        from jsonb_array_elements(changes) as c
+        where u.college_id = c->>'college_id'
+        returning 1
+    )
+    select count(*)::integer from updated;
+$$;
+
+-- claim_run_leases (sql/009) returns the cost columns and hands out the most
+-- expensive users first (unknown cost first), the dynamic form of LPT
+drop function if exists claim_run_leases(date, text, integer, integer, integer, text[], text);
+
+create or replace function claim_run_leases(
+    p_run_date      date,
+    p_worker        text,
+    p_limit         integer default 1,
+    p_lease_seconds integer default 600,
+    p_max_attempts  integer default 3,
+    p_done          text[]  default '{}',
+    p_college_id    text    default null
+)
+returns table (college_id text, encrypted_pass text, target_email text, fail_count integer,
+               notify_mode text, report_fingerprint text, cost_seconds real, subject_count integer)
+language plpgsql
+as $$
+#variable_conflict use_column
+begin
+    update run_leases l set done_at = now(), leased_until = null
+    where l.run_date = p_run_date and l.college_id = any(p_done) and l.done_at is null;
+
+    return query
+    with picked as (
+        select l.college_id from run_leases l
+        join users u on u.college_id = l.college_id
+        where l.run_date = p_run_date
+          and l.done_at is null
+          and l.attempts < p_max_attempts
+          and (l.leased_until is null or l.leased_until < now())
+          and (p_college_id is null or l.college_id = p_college_id)
+        order by u.cost_seconds desc nulls first, l.college_id
+        limit p_limit
+        for update of l skip locked
+    ), claimed as (
+        update run_leases l set
+            worker       = p_worker,
+            leased_until = now() + make_interval(secs => p_lease_seconds),
+            attempts     = l.attempts + 1
+        from picked
+        where l.run_date = p_run_date and l.college_id = picked.college_id
+        returning l.college_id
+    )
+    select u.college_id, u.encrypted_pass, u.target_email, u.fail_count, u.notify_mode, u.report_fingerprint,
+           u.cost_seconds, u.subject_count
+    from users u join claimed c on c.college_id = u.college_id
+    where u.is_active
+    order by u.cost_seconds desc nulls first, u.college_id;
+end;
+$$;
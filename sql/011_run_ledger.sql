@@ -0,0 +1,17 @@
+-- 📒 Per-run-date completion ledger (ledger.py)
+-- status: scraped -> emailed (report handed to the durable outbox) | failed
+-- A re-triggered run with --resume skips users already 'emailed' that day.
+create table if not exists run_ledger (
+    run_date    date        not null,
+    college_id  text        not null references users (college_id) on delete cascade,
+    status      text        not null check (status in ('scraped', 'emailed', 'failed')),
+    subjects    integer,
+    emails      integer,
+    error       text,
+    scraped_at  timestamptz,
+    emailed_at  timestamptz,
+    failed_at   timestamptz,
+    primary key (run_date, college_id)
+);
+
+create index if not exists run_ledger_done_idx on run_ledger (run_date, college_id) where status = 'emailed';
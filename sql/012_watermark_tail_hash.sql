@@ -0,0 +1,6 @@
+-- 🔖 Tail fingerprint for subject_watermarks (watermarks.py)
+-- tail_hash = sha1 of the last TAIL_ROWS detail rows as of row_count, so a
+--             status the portal corrected in place forces a full rescan
+--             even though the row count did not move
+alter table subject_watermarks
+    add column if not exists tail_hash text;
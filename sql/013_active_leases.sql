@@ -0,0 +1,63 @@
+-- 🎟️ Leases of users deactivated mid-run (leases.py)
+-- seed_run_leases only queues active users, but a user can be deactivated
+-- (3rd strike, another worker's state flush) after the seed. Their leases
+-- are no longer handed out, and no longer count as open work a worker
+-- should wait for.
+create or replace function claim_run_leases(
+    p_run_date      date,
+    p_worker        text,
+    p_limit         integer default 1,
+    p_lease_seconds integer default 600,
+    p_max_attempts  integer default 3,
+    p_done          text[]  default '{}',
+    p_college_id    text    default null
+)
+returns table (college_id text, encrypted_pass text, target_email text, fail_count integer,
+               notify_mode text, report_fingerprint text, cost_seconds real, subject_count integer)
+language plpgsql
+as $$
+#variable_conflict use_column
+begin
+    update run_leases l set done_at = now(), leased_until = null
+    where l.run_date = p_run_date and l.college_id = any(p_done) and l.done_at is null;
+
+    return query
+    with picked as (
+        select l.college_id from run_leases l
+        join users u on u.college_id = l.college_id
+        where l.run_date = p_run_date
+          and l.done_at is null
+          and l.attempts < p_max_attempts
+          and (l.leased_until is null or l.leased_until < now())
+          and (p_college_id is null or l.college_id = p_college_id)
+          and u.is_active
+        order by u.cost_seconds desc nulls first, l.college_id
+        limit p_limit
+        for update of l skip locked
+    ), claimed as (
+        update run_leases l set
+            worker       = p_worker,
+            leased_until = now() + make_interval(secs => p_lease_seconds),
+            attempts     = l.attempts + 1
+        from picked
+        where l.run_date = p_run_date and l.college_id = picked.college_id
+        returning l.college_id
+    )
+    select u.college_id, u.encrypted_pass, u.target_email, u.fail_count, u.notify_mode, u.report_fingerprint,
+           u.cost_seconds, u.subject_count
+    from users u join claimed c on c.college_id = u.college_id
+    order by u.cost_seconds desc nulls first, u.college_id;
+end;
+$$;
+
+create or replace function open_run_leases(p_run_date date, p_max_attempts integer default 3,
+                                           p_college_id text default null)
+returns integer
+language sql
+as $$
+    select count(*)::integer from run_leases l
+    join users u on u.college_id = l.college_id
+    where l.run_date = p_run_date and l.done_at is null and l.attempts < p_max_attempts
+      and (p_college_id is null or l.college_id = p_college_id)
+      and u.is_active;
+$$;
@@ -0,0 +1,13 @@
+-- ⚖️ Frozen LPT input per run date (balance.py)
+-- costs = [{college_id, cost_seconds, subject_count}] of the active users as
+--         the first worker of the day read them; every worker plans from this
+--         copy, so cost / is_active writes made during the run never move
+--         users between shards. scope = '*' or the one college_id a run is
+--         locked to (beta).
+create table if not exists run_plans (
+    run_date    date        not null,
+    scope       text        not null,
+    costs       jsonb       not null,
+    created_at  timestamptz not null default now(),
+    primary key (run_date, scope)
+);
@@ -0,0 +1,27 @@
+-- 📮 Atomic outbox claims (outbox.py)
+-- Every shard drains the outbox at start. Rows are picked with
+-- FOR UPDATE SKIP LOCKED and flipped to 'sending' in the same statement,
+-- so two shards can never both claim (and send) the same leftover — the
+-- same pattern claim_run_leases (sql/009) uses for leases.
+create or replace function claim_outbox(
+    p_limit         integer default 50,
+    p_stale_seconds integer default 900,
+    p_college_id    text    default null
+)
+returns table (id bigint, college_id text, target_email text, subject text, raw text, attempts integer)
+language sql
+as $$
+    with picked as (
+        select o.id from email_outbox o
+        where ((o.status = 'pending' and o.next_attempt_at <= now())
+            or (o.status = 'sending' and o.claimed_at < now() - make_interval(secs => p_stale_seconds)))
+          and (p_college_id is null or o.college_id = p_college_id)
+        order by o.id
+        limit p_limit
+        for update skip locked
+    )
+    update email_outbox o set status = 'sending', claimed_at = now()
+    from picked
+    where o.id = picked.id
+    returning o.id, o.college_id, o.target_email, o.subject, o.raw, o.attempts;
+$$;
@@ -0,0 +1,158 @@
+import os
+import json
+import time
+import atexit
+import signal
+import threading
+
+# ====================================================
+# 💾 BATCHED USER-STATE WRITES
+# ====================================================
+#
+# fail_count resets / increments, deactivations and report fingerprints
+# are collected per college_id instead of being written inline, then
+# flushed together every `flush_every` users / `flush_seconds` and at
+# shard end. One flush is a single apply_user_state() RPC
+# (sql/005_apply_user_state.sql); without it, one update per distinct
+# payload (.in_("college_id", ids)). A partial upsert is deliberately
+# not used: it would have to satisfy the NOT NULL columns of the insert.
+#
+# Failure strikes (fail_count increments, deactivations) are flushed
+# at once rather than buffered: they are the writes a lost runner must
+# not drop. Resets, fingerprints and costs wait for the next flush.
+#
+# Every change is also appended to a journal on local disk, cleared
+# after a successful flush; atexit / SIGTERM handlers flush on the way
+# out and recover() replays what a crashed process left behind. That
+# only helps when the next run shares the disk — on an ephemeral CI
+# runner that dies, buffered changes (at most flush_every users /
+# flush_seconds) are lost.
+
+class StateBuffer:
+    def __init__(self, supabase, table="users", rpc="apply_user_state",
+                 flush_every=10, flush_seconds=15.0, journal_path=".state_journal.jsonl"):
+        self.supabase      = supabase
+        self.table         = table
+        self.rpc           = rpc
+        self.flush_every   = max(1, flush_every)
+        self.flush_seconds = flush_seconds
+        self.journal_path  = journal_path
+
+        self._pending   = {}   # college_id -> merged changes
+        self._lock      = threading.RLock()
+        self._last      = time.monotonic()
+        self._use_rpc   = True
+
+        self.puts     = 0
+        self.flushes  = 0
+        self.requests = 0
+        self.seconds  = 0.0
+        self.failed   = 0
+
+    # ── JOURNAL ────────────────────────────────────────────────────────
+    def _journal(self, college_id, changes):
+        try:
+            with open(self.journal_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps({"college_id": college_id, "changes": changes}) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+        except OSError as e:
+            print(f"   ⚠️ State journal write failed: {e}")
+
+    def _clear_journal(self):
+        try:
+            os.remove(self.journal_path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            print(f"   ⚠️ State journal cleanup failed: {e}")
+
+    def recover(self):
+        """Re-queues changes a crashed process on this machine journaled but never flushed."""
+        try:
+            with open(self.journal_path, encoding="utf-8") as f:
+                lines = f.readlines()
+        except FileNotFoundError:
+            return 0
+        with self._lock:
+            for line in lines:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue   # torn last line
+                self._pending.setdefault(entry["college_id"], {}).update(entry["changes"])
+        if lines:
+            print(f"   ♻️ Recovered {len(lines)} unflushed state change(s) from {self.journal_path}")
+        return len(lines)
+
+    # ── BUFFERING ──────────────────────────────────────────────────────
+    def put(self, college_id, changes, urgent=False):
+        """Buffers one user's changes; urgent=True (a failure strike) flushes right away."""
+        with self._lock:
+            self._journal(college_id, changes)
+            self._pending.setdefault(college_id, {}).update(changes)
+            self.puts += 1
+            due = (urgent or len(self._pending) >= self.flush_every
+                   or time.monotonic() - self._last >= self.flush_seconds)
+        if due:
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            if not self._pending:
+                self._last = time.monotonic()
+                return True
+            pending = self._pending
+            started = time.monotonic()
+            try:
+                self._write(pending)
+            except Exception as e:
+                self.failed += 1
+                print(f"   ❌ State flush failed ({len(pending)} users kept for the next flush): {e}")
+                return False
+            self._pending = {}
+            self._clear_journal()
+            self.flushes += 1
+            self.seconds += time.monotonic() - started
+            self._last    = time.monotonic()
+            return True
+
+    def _write(self, pending):
+        if self._use_rpc:
+            try:
+                rows = [{"college_id": cid, **changes} for cid, changes in pending.items()]
+                self.supabase.rpc(self.rpc, {"changes": rows}).execute()
+                self.requests += 1
+                return
+            except Exception as e:
+                # Migration not applied yet — fall back to grouped updates for the rest of the run
+                print(f"   ⚠️ {self.rpc}() unavailable ({e}), using grouped updates")
+                self._use_rpc = False
+
+        groups = {}
+        for cid, changes in pending.items():
+            groups.setdefault(json.dumps(changes, sort_keys=True), []).append(cid)
+        for payload, ids in groups.items():
+            self.supabase.table(self.table).update(json.loads(payload)).in_("college_id", ids).execute()
+            self.requests += 1
+
+    # ── SHUTDOWN ───────────────────────────────────────────────────────
+    def install_handlers(self):
+        """Flush at interpreter exit and on SIGTERM (cancelled workflow runs)."""
+        atexit.register(self.flush)
+
+        previous = signal.getsignal(signal.SIGTERM)
+
+        def _on_term(signum, frame):
+            print("   🛑 SIGTERM — flushing buffered state changes")
+            self.flush()
+            if callable(previous):
+                previous(signum, frame)
+            else:
+                raise SystemExit(128 + signum)
+
+        signal.signal(signal.SIGTERM, _on_term)
+
+    def report(self):
+        print(f"💾 State writes: {self.puts} changes in {self.flushes} flush(es), {self.requests} request(s) "
+              f"({self.seconds:.2f}s) | {len(self._pending)} pending | {self.failed} failed flushes")
@@ -0,0 +1,50 @@
+import json
+
+# ====================================================
+# 📦 ONE-ROUNDTRIP TABLE SNAPSHOTS
+# ====================================================
+#
+# Reading a table with find_elements + .text costs one WebDriver call per
+# row and per cell. These helpers serialize the whole table inside the
+# page and hand it back as JSON in a single execute_script call.
+
+_READ_TABLE_JS = """
+const pick = xp => document.evaluate(xp, document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+let table = null;
+for (const xp of arguments[0]) { table = pick(xp); if (table) break; }
+if (!table) return null;
+return JSON.stringify(Array.from(table.querySelectorAll('tr'), tr => {
+    const tds = Array.from(tr.querySelectorAll('td'));
+    return {
+        cells: tds.map(td => td.innerText.trim()),
+        hrefs: tds.map(td => { const a = td.querySelector('a[href]'); return a ? a.href : null; }),
+    };
+}));
+"""
+
+_CLICK_CELL_LINK_JS = """
+const table = document.evaluate(arguments[0], document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+if (!table) return false;
+const row = table.querySelectorAll('tr')[arguments[1]];
+if (!row) return false;
+const td = Array.from(row.querySelectorAll('td')).at(arguments[2]);
+const a  = td && td.querySelector('a');
+if (!a) return false;
+a.click();
+return true;
+"""
+
+
+def read_table(driver, *xpaths):
+    """
+    Snapshot of the first table matched by any of xpaths (tried in order):
+    [{"cells": [text, ...], "hrefs": [href or None, ...]}, ...] — or None.
+    Rows and cells are every descendant <tr>/<td>, same as find_elements.
+    """
+    raw = driver.execute_script(_READ_TABLE_JS, list(xpaths))
+    return json.loads(raw) if raw else None
+
+
+def click_cell_link(driver, table_xpath, row_index, cell_index):
+    """Clicks the link inside one cell (negative cell_index counts from the end). False if absent."""
+    return bool(driver.execute_script(_CLICK_CELL_LINK_JS, table_xpath, row_index, cell_index))
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Tests import the flat modules at the repository root, like the workers do
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
@@ -0,0 +1,140 @@
+from datetime import date
+
+import pytest
+
+from balance import BASE_SECONDS, DEFAULT_COST, PER_SUBJECT, CostPlan, lpt_assign, predict
+
+
+# ── predict / lpt_assign ──────────────────────────────────────────────
+
+def test_predict_prefers_history_then_subjects_then_median():
+    rows = [
+        {"college_id": "a", "cost_seconds": 10.0, "subject_count": 9},
+        {"college_id": "b", "cost_seconds": 30.0, "subject_count": None},
+        {"college_id": "c", "cost_seconds": None, "subject_count": 5},
+        {"college_id": "d", "cost_seconds": None, "subject_count": None},
+    ]
+    assert predict(rows) == [("a", 10.0), ("b", 30.0), ("c", BASE_SECONDS + 5 * PER_SUBJECT), ("d", 20.0)]
+
+
+def test_predict_without_any_history_uses_the_default():
+    assert predict([{"college_id": "a"}]) == [("a", DEFAULT_COST)]
+
+
+def test_lpt_assign_balances_and_orders_bins():
+    plan = lpt_assign([("a", 7), ("b", 5), ("c", 4), ("d", 3), ("e", 3), ("f", 2)], 2)
+    assert plan == [(12.0, ["a", "d", "f"]), (12.0, ["b", "c", "e"])]
+
+
+def test_lpt_assign_is_independent_of_input_order():
+    costs = [(f"u{i}", float(i % 7)) for i in range(50)]
+    assert lpt_assign(costs, 4) == lpt_assign(list(reversed(costs)), 4)
+
+
+@pytest.mark.parametrize("bins", [1, 3, 8])
+def test_lpt_assign_places_every_user_once(bins):
+    costs = [(f"u{i}", float(i)) for i in range(20)]
+    plan  = lpt_assign(costs, bins)
+    assert len(plan) == bins
+    assert sorted(c for _, ids in plan for c in ids) == sorted(c for c, _ in costs)
+    assert sum(load for load, _ in plan) == sum(c for _, c in costs)
+
+
+def test_lpt_assign_with_no_bins_still_plans_one():
+    assert lpt_assign([("a", 1.0)], 0) == [(1.0, ["a"])]
+
+
+# ── frozen per-run-date snapshot ──────────────────────────────────────
+
+class FakeQuery:
+    def __init__(self, db, table):
+        self.db, self.table, self.filters, self.op, self.payload = db, table, [], "select", None
+
+    def select(self, columns, **kwargs):
+        return self
+
+    def eq(self, column, value):
+        self.filters.append(lambda r: r.get(column) == value)
+        return self
+
+    def gt(self, column, value):
+        self.filters.append(lambda r: r[column] > value)
+        return self
+
+    def lt(self, column, value):
+        self.filters.append(lambda r: r[column] < value)
+        return self
+
+    def in_(self, column, values):
+        self.filters.append(lambda r: r[column] in values)
+        return self
+
+    def order(self, column):
+        return self
+
+    def limit(self, n):
+        return self
+
+    def upsert(self, row, on_conflict=None, ignore_duplicates=False):
+        self.op, self.payload = "upsert", row
+        return self
+
+    def delete(self):
+        self.op = "delete"
+        return self
+
+    def execute(self):
+        rows = self.db[self.table]
+        if self.op == "upsert":
+            if not any(r["run_date"] == self.payload["run_date"] and r["scope"] == self.payload["scope"] for r in rows):
+                rows.append(self.payload)
+            return type("Response", (), {"data": []})()
+        matched = [r for r in rows if all(f(r) for f in self.filters)]
+        if self.op == "delete":
+            self.db[self.table] = [r for r in rows if r not in matched]
+        return type("Response", (), {"data": [dict(r) for r in matched]})()
+
+
+class FakeSupabase:
+    def __init__(self, users):
+        self.db = {"users": users, "run_plans": []}
+
+    def table(self, name):
+        return FakeQuery(self.db, name)
+
+
+def _users(n):
+    return [{"college_id": f"u{i:02d}", "is_active": True, "cost_seconds": float(10 + i), "subject_count": 4}
+            for i in range(n)]
+
+
+def test_late_workers_plan_from_the_frozen_costs():
+    client = FakeSupabase(_users(12))
+    run    = date(2026, 3, 10)
+    first  = CostPlan(client, 0, 3, run_date=run)
+
+    # Workers already running rewrite costs and deactivate users
+    for u in client.db["users"]:
+        u["cost_seconds"] = 100.0 - u["cost_seconds"]
+    client.db["users"][0]["is_active"] = False
+
+    late = [CostPlan(client, shard, 3, run_date=run) for shard in range(3)]
+    assert late[0].plan == first.plan
+    owned = [c for plan in late for c in plan.ids]
+    assert sorted(owned) == [f"u{i:02d}" for i in range(12)]
+
+
+def test_deactivated_users_are_skipped_not_moved():
+    client = FakeSupabase(_users(6))
+    plan   = CostPlan(client, 0, 1, run_date=date(2026, 3, 10))
+    client.db["users"][5]["is_active"] = False
+    assert [u["college_id"] for u in plan] == [f"u{i:02d}" for i in (4, 3, 2, 1, 0)]
+
+
+def test_a_new_day_takes_a_new_snapshot_and_prunes_old_ones():
+    client = FakeSupabase(_users(4))
+    CostPlan(client, 0, 2, run_date=date(2026, 3, 1))
+    client.db["users"].append({"college_id": "u99", "is_active": True, "cost_seconds": 1.0, "subject_count": 1})
+    plan = CostPlan(client, 0, 2, run_date=date(2026, 3, 10))
+    assert plan.total == 5
+    assert [r["run_date"] for r in client.db["run_plans"]] == ["2026-03-10"]
@@ -0,0 +1,89 @@
+import json
+import threading
+import http.server
+
+import pytest
+
+from driver_pool import BrowserCdp, ContextPool
+
+ws_server = pytest.importorskip("websockets.sync.server")
+
+
+class FakeChrome:
+    """
+    /json/version plus a browser websocket that only accepts browser-level
+    Target commands — the way Chrome answers them on the browser target.
+    """
+
+    def __init__(self):
+        self.calls = []
+        self.ws    = ws_server.serve(self._session, "127.0.0.1", 0)
+        threading.Thread(target=self.ws.serve_forever, daemon=True).start()
+        ws_port = self.ws.socket.getsockname()[1]
+
+        class Version(http.server.BaseHTTPRequestHandler):
+            def do_GET(handler):
+                body = json.dumps({"webSocketDebuggerUrl": f"ws://127.0.0.1:{ws_port}/devtools/browser/x"})
+                handler.send_response(200)
+                handler.end_headers()
+                handler.wfile.write(body.encode())
+
+            def log_message(handler, *args):
+                pass
+
+        self.http = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Version)
+        threading.Thread(target=self.http.serve_forever, daemon=True).start()
+        self.address = f"127.0.0.1:{self.http.server_address[1]}"
+
+    def _session(self, conn):
+        for raw in conn:
+            msg = json.loads(raw)
+            self.calls.append(msg["method"])
+            conn.send(json.dumps({"method": "Target.targetCreated", "params": {}}))   # an event first
+            if msg["method"] == "Target.createBrowserContext":
+                conn.send(json.dumps({"id": msg["id"], "result": {"browserContextId": "CTX1"}}))
+            elif msg["method"] == "Target.createTarget":
+                conn.send(json.dumps({"id": msg["id"], "result": {"targetId": "T1"}}))
+            elif msg["method"] == "Target.disposeBrowserContext":
+                conn.send(json.dumps({"id": msg["id"], "result": {}}))
+            else:
+                conn.send(json.dumps({"id": msg["id"], "error": {"code": -32000, "message": "Not allowed"}}))
+
+    def close(self):
+        self.ws.shutdown()
+        self.http.shutdown()
+
+
+@pytest.fixture
+def chrome():
+    fake = FakeChrome()
+    yield fake
+    fake.close()
+
+
+def test_browser_cdp_resolves_the_websocket_and_skips_events(chrome):
+    cdp = BrowserCdp(chrome.address, timeout=5)
+    try:
+        assert cdp.send("Target.createBrowserContext", {"disposeOnDetach": False}) == {"browserContextId": "CTX1"}
+        with pytest.raises(RuntimeError, match="Not allowed"):
+            cdp.send("Page.navigate", {"url": "about:blank"})
+    finally:
+        cdp.close()
+
+
+def test_context_pool_sends_context_commands_to_the_browser_target(chrome):
+    class Host:
+        capabilities = {"goog:chromeOptions": {"debuggerAddress": chrome.address}}
+
+    pool = ContextPool(size=1)
+    pool._host = Host()
+    driver = type("Driver", (), {})()
+    driver.switch_to = type("SwitchTo", (), {"window": lambda self, handle: setattr(driver, "handle", handle)})()
+    try:
+        pool._new_context(driver)
+        pool._dispose_context(driver)
+    finally:
+        pool._stop.set()
+        pool._browser.close()
+    assert driver.handle == "T1"
+    assert chrome.calls == ["Target.createBrowserContext", "Target.createTarget", "Target.disposeBrowserContext"]
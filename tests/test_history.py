@@ -0,0 +1,46 @@
+from history import HistoryStore
+
+
+class FakeSupabase:
+    def __init__(self):
+        self.upserts = []
+
+    def table(self, name):
+        return self
+
+    def upsert(self, rows, on_conflict=None):
+        keys = [tuple(r[k] for k in on_conflict.split(",")) for r in rows]
+        assert len(keys) == len(set(keys)), "ON CONFLICT DO UPDATE cannot affect row a second time"
+        self.upserts.append(rows)
+        return self
+
+    def execute(self):
+        return self
+
+
+def _subject(name, count, yesterday="Present"):
+    return {"name": name, "percent": "", "count": count, "yesterday": yesterday}
+
+
+def test_duplicate_subject_names_merge_into_one_row():
+    store = HistoryStore(FakeSupabase())
+    store.record("a@niet.co.in", {"subjects": [
+        _subject("Physics", "8/10"),
+        _subject("Physics", "3/4", "Absent"),
+        _subject("Maths", "5/5"),
+        _subject("Broken", "n/a"),
+    ]})
+    assert store.flush()
+    rows = {r["subject"]: r for r in store.supabase.upserts[0]}
+    assert set(rows) == {"Physics", "Maths"}
+    assert (rows["Physics"]["attended"], rows["Physics"]["delivered"], rows["Physics"]["yesterday"]) == (11, 14, "A")
+
+
+def test_same_user_recorded_twice_keeps_the_latest():
+    store = HistoryStore(FakeSupabase())
+    store.record("a@niet.co.in", {"subjects": [_subject("Maths", "4/5")]})
+    store.record("a@niet.co.in", {"subjects": [_subject("Maths", "5/6")]})
+    assert store.flush()
+    (row,) = store.supabase.upserts[0]
+    assert (row["attended"], row["delivered"]) == (5, 6)
+    assert store.written == 1
@@ -0,0 +1,40 @@
+import pytest
+
+from leases import LeaseQueue
+
+
+class FakeSupabase:
+    def __init__(self, missing=()):
+        self.missing = set(missing)
+        self.calls   = []
+
+    def rpc(self, name, params):
+        self.calls.append((name, params))
+        self._name = name
+        return self
+
+    def execute(self):
+        if self._name in self.missing:
+            raise Exception(f"Could not find the function public.{self._name}")
+        return type("Response", (), {"data": 3 if self._name == "seed_run_leases" else []})()
+
+
+def test_start_seeds_and_probes_claims():
+    client = FakeSupabase()
+    queue  = LeaseQueue(client)
+    queue.configure("w1")
+    assert queue.start() == 3
+    assert [name for name, _ in client.calls] == ["seed_run_leases", "claim_run_leases"]
+    assert client.calls[1][1]["p_limit"] == 0
+    assert queue.enabled
+
+
+@pytest.mark.parametrize("missing", ["seed_run_leases", "claim_run_leases"])
+def test_start_disables_the_queue_when_a_migration_is_missing(missing):
+    queue = LeaseQueue(FakeSupabase([missing]))
+    queue.configure("w1")
+    with pytest.raises(Exception):
+        queue.start()
+    assert not queue.enabled
+    queue.complete("a@niet.co.in")   # a fallback run must not queue completions
+    assert queue._done == []
@@ -0,0 +1,79 @@
+from datetime import date
+
+from ledger import RunLedger
+
+
+class FakeSupabase:
+    def __init__(self, fail=0):
+        self.fail    = fail
+        self.upserts = []
+
+    def table(self, name):
+        return self
+
+    def upsert(self, rows, on_conflict=None):
+        self._rows = rows
+        return self
+
+    def execute(self):
+        if self.fail:
+            self.fail -= 1
+            raise Exception("network down")
+        self.upserts.append(self._rows)
+        return self
+
+
+def _ledger(client):
+    ledger = RunLedger(client, flush_every=1000, flush_seconds=1e9)
+    ledger.run_date = date(2026, 3, 10)
+    return ledger
+
+
+def test_flush_groups_rows_by_column_set():
+    client = FakeSupabase()
+    ledger = _ledger(client)
+    ledger.scraped("a", 5)
+    ledger.scraped("b", 6)
+    ledger.failed_user("c", "boom")
+    ledger.scraped("d", 4)
+    ledger.emailed("d", 1)
+    assert ledger.flush()
+
+    assert len(client.upserts) == 3
+    for rows in client.upserts:
+        assert len({tuple(sorted(r)) for r in rows}) == 1   # one column set per upsert
+        assert all(r["run_date"] == "2026-03-10" for r in rows)
+    by_id = {r["college_id"]: r for rows in client.upserts for r in rows}
+    assert by_id["a"]["status"] == by_id["b"]["status"] == "scraped"
+    assert by_id["c"]["error"] == "boom"
+    assert by_id["d"]["status"] == "emailed" and by_id["d"]["subjects"] == 4 and by_id["d"]["emails"] == 1
+
+
+def test_failed_write_keeps_marks_without_overwriting_newer_ones():
+    client = FakeSupabase(fail=1)
+    ledger = _ledger(client)
+    ledger.scraped("a", 5)
+    assert not ledger.flush()
+    ledger.emailed("a", 1)
+    assert ledger.flush()
+    (row,) = client.upserts[0]
+    assert row["status"] == "emailed" and row["subjects"] == 5 and row["emails"] == 1
+
+
+def test_pending_skips_done_users():
+    ledger  = _ledger(FakeSupabase())
+    ledger._done = {"b"}
+    skipped = []
+    users   = [{"college_id": c} for c in "abc"]
+    assert [u["college_id"] for u in ledger.pending(users, on_skip=skipped.append)] == ["a", "c"]
+    assert skipped == ["b"] and ledger.skipped == 1
+
+
+def test_missing_ledger_table_resumes_nothing():
+    class NoTable:
+        def table(self, name):
+            raise Exception("relation \"public.run_ledger\" does not exist")
+
+    ledger = _ledger(NoTable())
+    assert ledger.load_done() == set()
+    assert [u["college_id"] for u in ledger.pending([{"college_id": "a"}])] == ["a"]
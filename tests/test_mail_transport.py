@@ -0,0 +1,24 @@
+from mail_transport import GmailApiTransport
+
+
+class BrokenGmail:
+    """A GmailClient whose token cannot even be parsed."""
+
+    def __init__(self):
+        import threading
+        self._lock        = threading.Lock()
+        self.sends        = 0
+        self.send_seconds = 0.0
+        self.failures     = 0
+
+    @property
+    def service(self):
+        raise ValueError("Expecting value: line 1 column 1 (char 0)")
+
+
+def test_gmail_setup_failure_comes_back_per_message():
+    transport = GmailApiTransport(BrokenGmail())
+    outcome   = transport.send_many([{"id": 1, "raw": "x"}, {"id": "local-2", "raw": "y"}])
+    assert set(outcome) == {"1", "local-2"}
+    assert all(isinstance(e, ValueError) for e in outcome.values())
+    assert transport.gmail.failures == 2
@@ -0,0 +1,29 @@
+from notify import ChangeFilter, report_fingerprint
+
+REPORT = {
+    "subjects":  [{"name": "Maths", "percent": "80%", "count": "8/10", "yesterday": "Present"}],
+    "attended":  8,
+    "delivered": 10,
+}
+
+
+def test_fingerprint_is_stable_and_sensitive():
+    changed = {**REPORT, "attended": 9}
+    assert report_fingerprint(REPORT) == report_fingerprint(dict(REPORT))
+    assert report_fingerprint(REPORT) != report_fingerprint(changed)
+
+
+def test_change_filter_outcomes():
+    fp     = report_fingerprint(REPORT)
+    filter = ChangeFilter()
+    assert filter.decide({"notify_mode": "always",  "report_fingerprint": fp}, fp) == "full"
+    assert filter.decide({"notify_mode": "changes", "report_fingerprint": fp}, fp) == "skip"
+    assert filter.decide({"notify_mode": "summary", "report_fingerprint": fp}, fp) == "summary"
+    assert filter.decide({"notify_mode": "changes", "report_fingerprint": "old"}, fp) == "full"
+    assert (filter.full, filter.skipped, filter.summaries) == (2, 1, 1)
+
+
+def test_change_filter_defaults_to_full_without_columns():
+    fp = report_fingerprint(REPORT)
+    assert ChangeFilter().decide({}, fp) == "full"
+    assert ChangeFilter().decide({"notify_mode": None, "report_fingerprint": fp}, fp) == "full"
@@ -0,0 +1,198 @@
+from outbox import Outbox, _retriable
+
+
+class FakeTransport:
+    name = "fake"
+
+    def __init__(self):
+        self.sent = []
+
+    def send_many(self, items):
+        self.sent.extend(items)
+        return {str(item["id"]): None for item in items}
+
+
+class FakeStore:
+    """Counts 'sent' rows like the table would, including other shards' sends."""
+
+    def __init__(self, others=0):
+        self.others = others
+        self.mine   = 0
+        self.next   = 0
+        self.down   = False
+
+    def insert(self, item):
+        self.next += 1
+        return self.next
+
+    def mark_sent(self, ids):
+        self.mine += len(ids)
+
+    def mark_retry(self, item, error, next_attempt_at):
+        pass
+
+    def mark_failed(self, item, error):
+        pass
+
+    def sent_since(self, since):
+        return None if self.down else self.others + self.mine
+
+
+def test_quota_is_re_read_before_every_batch():
+    store  = FakeStore()
+    outbox = Outbox(FakeTransport(), store, daily_limit=10)
+    assert outbox._quota_left() == 10
+    store.others = 7          # other shards sent meanwhile
+    assert outbox._quota_left() == 3
+    store.others = 12
+    assert outbox._quota_left() == 0
+
+
+def test_each_shard_takes_its_share_of_what_is_left():
+    outbox = Outbox(FakeTransport(), FakeStore(others=400), daily_limit=500)
+    outbox.configure(shards=4)
+    assert outbox._quota_left() == 25
+    outbox.configure(shards=200)
+    assert outbox._quota_left() == 1
+
+
+def test_unreadable_count_keeps_the_local_tally():
+    store  = FakeStore(others=8)
+    outbox = Outbox(FakeTransport(), store, daily_limit=10)
+    assert outbox._quota_left() == 2
+    store.down = True
+    assert outbox._quota_left() == 2
+
+
+def test_flush_stops_at_the_shared_daily_limit():
+    transport = FakeTransport()
+    store     = FakeStore(others=3)
+    outbox    = Outbox(transport, store, batch_size=2, rate=1000, daily_limit=5)
+    for i in range(4):
+        outbox.add(f"u{i}@example.com", "subject", "<p>hi</p>")
+    assert outbox.flush() is False
+    assert len(transport.sent) == 2
+    assert outbox.deferred == 2
+
+
+def test_smtp_refusals_and_4xx_classification():
+    class SmtpError(Exception):
+        def __init__(self, code):
+            self.smtp_code = code
+
+    assert _retriable(SmtpError(421))
+    assert not _retriable(SmtpError(550))
+
+
+def test_refused_recipients_are_permanent():
+    import smtplib
+    refused = smtplib.SMTPRecipientsRefused({"nobody@example.com": (550, b"No such user")})
+    assert not _retriable(refused)
+    assert _retriable(smtplib.SMTPServerDisconnected("closed"))
+
+
+def test_add_reports_whether_the_message_is_durable():
+    class DownStore(FakeStore):
+        def insert(self, item):
+            return None
+
+    assert Outbox(FakeTransport(), FakeStore()).add("a@example.com", "s", "<p/>") is True
+    assert Outbox(FakeTransport(), DownStore()).add("a@example.com", "s", "<p/>") is False
+    assert Outbox(FakeTransport()).add("a@example.com", "s", "<p/>") is False
+
+
+def test_failed_drain_only_warns():
+    class BrokenStore(FakeStore):
+        def claim_pending(self, limit, college_id=None):
+            raise ValueError("bad token json")
+
+    outbox = Outbox(FakeTransport(), BrokenStore())
+    outbox.drain()
+    assert outbox.drained == 0
+
+
+def test_raising_transport_defers_the_chunk_instead_of_losing_it():
+    class RaisingTransport(FakeTransport):
+        def send_many(self, items):
+            raise RuntimeError("token refresh failed")
+
+    class RecordingStore(FakeStore):
+        def __init__(self):
+            super().__init__()
+            self.retries = []
+
+        def mark_retry(self, item, error, next_attempt_at):
+            self.retries.append(item["id"])
+
+    store  = RecordingStore()
+    outbox = Outbox(RaisingTransport(), store, batch_size=2, rate=1000, max_attempts=1)
+    outbox.add("a@example.com", "s", "<p/>")
+    outbox.add("b@example.com", "s", "<p/>")   # full batch: flushed inside add(), must not raise
+    assert outbox.flush() is True
+    assert sorted(store.retries) == [1, 2]
+    assert outbox.deferred == 2 and outbox.failed == 0
+
+
+class FakeOutboxTable:
+    """email_outbox rows behind just enough of the PostgREST builder for claim_pending."""
+
+    def __init__(self, rows):
+        self.rows = rows
+
+    def rpc(self, name, params):
+        raise Exception("Could not find the function public.claim_outbox")
+
+    def table(self, name):
+        return _Query(self)
+
+
+class _Query:
+    def __init__(self, db):
+        self.db, self.filters, self.changes = db, [], None
+
+    def select(self, columns):
+        return self
+
+    def or_(self, expression):
+        return self
+
+    def order(self, column):
+        return self
+
+    def limit(self, n):
+        return self
+
+    def update(self, changes):
+        self.changes = changes
+        return self
+
+    def eq(self, column, value):
+        self.filters.append(lambda r: r[column] == value)
+        return self
+
+    def is_(self, column, value):
+        self.filters.append(lambda r: r[column] is None)
+        return self
+
+    def execute(self):
+        matched = [r for r in self.db.rows if all(f(r) for f in self.filters)]
+        if self.changes:
+            for r in matched:
+                r.update(self.changes)
+        return type("Response", (), {"data": [dict(r) for r in matched]})()
+
+
+def test_two_shards_cannot_both_claim_a_stale_row():
+    from outbox import OutboxStore
+
+    row = {"id": 1, "college_id": "a", "target_email": "a@example.com", "subject": "s", "raw": "r",
+           "attempts": 1, "status": "sending", "claimed_at": "2026-03-10T06:00:00+00:00"}
+    db  = FakeOutboxTable([row])
+    first, second = OutboxStore(db), OutboxStore(db)
+
+    # Both shards read the row before either claims it
+    stale = [dict(row)]
+    first._try = second._try = lambda what, fn: fn() if what != "read" else type("R", (), {"data": stale})()
+
+    assert [r["id"] for r in first.claim_pending(10)] == [1]
+    assert second.claim_pending(10) == []
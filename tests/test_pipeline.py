@@ -0,0 +1,68 @@
+from pipeline import run_pipeline, run_bounded
+
+
+def _boom_on(bad):
+    def stage(item):
+        if item == bad:
+            raise RuntimeError(f"stage failed on {item}")
+        return item
+    return stage
+
+
+def test_items_flow_through_every_stage():
+    seen = []
+    run_pipeline(range(5), [
+        ("double", lambda x: x * 2, 2),
+        ("db",     seen.append,     1),
+    ])
+    assert sorted(seen) == [0, 2, 4, 6, 8]
+
+
+def test_stage_error_is_dropped_without_on_error():
+    seen  = []
+    stats = run_pipeline(range(4), [
+        ("scrape", _boom_on(2),  1),
+        ("db",     seen.append,  1),
+    ])
+    assert sorted(seen) == [0, 1, 3]
+    assert stats[1].errors == 1
+
+
+def test_stage_error_is_passed_downstream_by_on_error():
+    seen   = []
+    errors = []
+
+    def on_error(item, error):
+        errors.append((item, str(error)))
+        return ("failed", item)
+
+    run_pipeline(range(4), [
+        ("scrape", _boom_on(2),  2),
+        ("render", lambda x: x,  1),
+        ("db",     seen.append,  1),
+    ], on_error=on_error)
+
+    assert errors == [(2, "stage failed on 2")]
+    assert sorted(seen, key=str) == sorted([0, 1, ("failed", 2), 3], key=str)
+
+
+def test_on_error_in_a_later_stage_gets_that_stage_input():
+    seen = []
+    run_pipeline(["a", "b"], [
+        ("scrape", str.upper,          1),
+        ("render", _boom_on("B"),      1),
+        ("db",     seen.append,        1),
+    ], on_error=lambda item, error: item.lower() + "!")
+    assert sorted(seen) == ["A", "b!"]
+
+
+def test_run_bounded_survives_worker_errors():
+    done = []
+
+    def fn(item):
+        if item == 3:
+            raise ValueError("bad user")
+        done.append(item)
+
+    run_bounded(iter(range(10)), fn, workers=3)
+    assert sorted(done) == [0, 1, 2, 4, 5, 6, 7, 8, 9]
@@ -0,0 +1,86 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "api"))
+
+import index
+
+
+class _Call:
+    def __init__(self, client, kind, payload):
+        self.client, self.kind, self.payload = client, kind, payload
+
+    def upsert(self, data, on_conflict=None):
+        return _Call(self.client, "upsert", data)
+
+    def execute(self):
+        self.client.calls.append((self.kind, self.payload))
+        error = self.client.errors.pop(0) if self.client.errors else None
+        if error:
+            raise error
+        return type("Response", (), {"data": True})()
+
+
+class FakeSupabase:
+    def __init__(self, errors=()):
+        self.errors = list(errors)
+        self.calls  = []
+
+    def rpc(self, name, params):
+        return _Call(self, name, params)
+
+    def table(self, name):
+        return _Call(self, "table", name)
+
+
+DATA = {"college_id": "a@niet.co.in", "encrypted_pass": "x", "target_email": "a@example.com",
+        "is_active": True, "fail_count": 0, "notify_mode": "changes"}
+
+
+@pytest.fixture(autouse=True)
+def _reset_flags():
+    index._has_notify_mode  = True
+    index._has_register_rpc = True
+    yield
+    index._has_notify_mode  = True
+    index._has_register_rpc = True
+
+
+def test_rpc_registers_in_one_call():
+    client = FakeSupabase()
+    assert index.save_user(client, dict(DATA)) is True
+    assert [kind for kind, _ in client.calls] == ["register_user"]
+
+
+def test_upsert_retries_without_missing_notify_mode():
+    client = FakeSupabase([
+        Exception("Could not find the function public.register_user"),
+        Exception("Could not find the 'notify_mode' column of 'users' in the schema cache"),
+    ])
+    assert index.save_user(client, dict(DATA)) is None
+    upserts = [payload for kind, payload in client.calls if kind == "upsert"]
+    assert "notify_mode" in upserts[0] and "notify_mode" not in upserts[1]
+    assert index._has_notify_mode is False
+
+
+def test_unrelated_upsert_error_is_raised():
+    client = FakeSupabase([Exception("PGRST202"), Exception("connection reset")])
+    with pytest.raises(Exception, match="connection reset"):
+        index.save_user(client, dict(DATA))
+
+
+def test_rpc_network_error_is_not_retried_as_upsert():
+    client = FakeSupabase([ConnectionError("connection reset by peer")])
+    with pytest.raises(ConnectionError):
+        index.save_user(client, dict(DATA))
+    assert [kind for kind, _ in client.calls] == ["register_user"]
+    assert index._has_register_rpc is True
+
+
+def test_missing_rpc_is_remembered():
+    client = FakeSupabase([Exception("{'code': '42883', 'message': 'function register_user does not exist'}")])
+    assert index.save_user(client, dict(DATA)) is None
+    assert index.save_user(client, dict(DATA)) is None
+    assert [kind for kind, _ in client.calls] == ["register_user", "upsert", "upsert"]
@@ -0,0 +1,77 @@
+import os
+import re
+import hashlib
+
+import pytest
+
+from shards import SHARD_BUCKETS, bucket_range, shard_bucket
+
+
+MIGRATION = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "sql", "006_shard_bucket.sql")
+
+IDS = ["0231csiot122@niet.co.in", "0211cse001@niet.co.in", "bench-7@niet.co.in",
+       "ÄÖÜ@niet.co.in", "x" * 200] + [f"user{i}@niet.co.in" for i in range(200)]
+
+
+def formula_shard_bucket(college_id):
+    """
+    The formula of sql/006_shard_bucket.sql redone by hand in Python (no database):
+    ('x' || substr(md5(college_id), 1, 8))::bit(32)::bigint % 840
+    bit(32) -> bigint keeps all 32 bits, so the value is never negative.
+    """
+    hex_prefix = hashlib.md5(college_id.encode()).hexdigest()[:8]
+    bits       = "".join(f"{int(h, 16):04b}" for h in hex_prefix)
+    assert len(bits) == 32
+    return int(bits, 2) % 840
+
+
+def test_bucket_count_matches_the_generated_column():
+    assert SHARD_BUCKETS == 840
+
+
+def test_known_value():
+    # md5('') = d41d8cd98f00b204e9800998ecf8427e; 0xd41d8cd9 = 3558706393; 3558706393 % 840 = 193
+    assert shard_bucket("") == 193
+
+
+@pytest.mark.parametrize("college_id", IDS[:5])
+def test_python_twin_matches_the_formula(college_id):
+    assert shard_bucket(college_id) == formula_shard_bucket(college_id)
+    assert 0 <= shard_bucket(college_id) < SHARD_BUCKETS
+
+
+def test_high_bit_prefixes_stay_positive():
+    ids = [f"user{i}@niet.co.in" for i in range(2000)]
+    high = [c for c in ids if hashlib.md5(c.encode()).hexdigest()[0] in "89abcdef"]
+    assert high
+    assert all(shard_bucket(c) == formula_shard_bucket(c) for c in high)
+
+
+def test_python_twin_matches_postgres():
+    """
+    Evaluates the generated column's expression, taken from the migration
+    itself, on a real Postgres. Set TEST_DATABASE_URL (any scratch database;
+    nothing is written) and install psycopg to run it.
+    """
+    dsn = os.environ.get("TEST_DATABASE_URL")
+    if not dsn:
+        pytest.skip("TEST_DATABASE_URL not set")
+    psycopg = pytest.importorskip("psycopg")
+
+    with open(MIGRATION, encoding="utf-8") as f:
+        expression = re.search(r"generated always as \((.*)\) stored", f.read()).group(1)
+    with psycopg.connect(dsn) as conn:
+        rows = conn.execute(
+            f"select college_id, {expression} from unnest(%s::text[]) as t(college_id)", [IDS]
+        ).fetchall()
+    assert {c: b for c, b in rows} == {c: shard_bucket(c) for c in IDS}
+
+
+@pytest.mark.parametrize("total", list(range(1, 17)) + [840])
+def test_bucket_ranges_cover_every_bucket_once(total):
+    owners = [0] * SHARD_BUCKETS
+    for shard in range(total):
+        lo, hi = bucket_range(shard, total)
+        for b in range(lo, hi):
+            owners[b] += 1
+    assert owners == [1] * SHARD_BUCKETS
@@ -0,0 +1,42 @@
+from state_writes import StateBuffer
+
+
+class FakeSupabase:
+    def __init__(self):
+        self.calls = []
+
+    def rpc(self, name, params):
+        self.calls.append(params["changes"])
+        return self
+
+    def execute(self):
+        return self
+
+
+def _buffer(tmp_path):
+    return StateBuffer(FakeSupabase(), flush_every=10, flush_seconds=1e9,
+                       journal_path=str(tmp_path / "journal.jsonl"))
+
+
+def test_routine_changes_wait_for_the_batch(tmp_path):
+    buffer = _buffer(tmp_path)
+    buffer.put("a", {"fail_count": 0})
+    buffer.put("b", {"report_fingerprint": "x"})
+    assert buffer.supabase.calls == []
+    assert (tmp_path / "journal.jsonl").exists()
+
+
+def test_failure_strikes_flush_at_once(tmp_path):
+    buffer = _buffer(tmp_path)
+    buffer.put("a", {"report_fingerprint": "x"})
+    buffer.put("b", {"fail_count": 3, "is_active": False}, urgent=True)
+    assert buffer.supabase.calls == [[{"college_id": "a", "report_fingerprint": "x"},
+                                      {"college_id": "b", "fail_count": 3, "is_active": False}]]
+    assert not (tmp_path / "journal.jsonl").exists()
+
+
+def test_recover_replays_an_unflushed_journal(tmp_path):
+    _buffer(tmp_path).put("a", {"fail_count": 2})
+    buffer = _buffer(tmp_path)
+    assert buffer.recover() == 1
+    assert buffer._pending == {"a": {"fail_count": 2}}
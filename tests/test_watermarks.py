@@ -0,0 +1,46 @@
+from datetime import datetime
+
+from portal_http import incremental_day_status, tail_watermark, day_status
+
+
+def _row(day, status):
+    return ["1", day, "10:00", "Lecture", status]
+
+
+YESTERDAY     = datetime(2026, 3, 10)
+YESTERDAY_STR = "Mar 10,2026"
+
+ROWS = [
+    _row("Mar 08,2026", "P"),
+    _row("Mar 09,2026", "A"),
+    _row("Mar 10,2026", "P"),
+]
+
+
+def test_unchanged_table_reuses_the_watermark():
+    mark = tail_watermark(ROWS)
+    status, new_mark = incremental_day_status(ROWS, YESTERDAY_STR, YESTERDAY, mark)
+    assert status == "Present"
+    assert new_mark == mark
+
+
+def test_new_rows_are_parsed_past_the_watermark():
+    mark = tail_watermark(ROWS[:2])
+    status, new_mark = incremental_day_status(ROWS, YESTERDAY_STR, YESTERDAY, mark)
+    assert status == "Present"
+    assert new_mark == tail_watermark(ROWS)
+
+
+def test_in_place_correction_forces_a_rescan():
+    mark      = tail_watermark(ROWS)
+    corrected = ROWS[:2] + [_row("Mar 10,2026", "A")]
+    status, new_mark = incremental_day_status(corrected, YESTERDAY_STR, YESTERDAY, mark)
+    assert status == "Absent" == day_status(corrected, YESTERDAY_STR, YESTERDAY)
+    assert new_mark == tail_watermark(corrected)
+
+
+def test_watermark_without_tail_hash_gains_one():
+    mark = {k: v for k, v in tail_watermark(ROWS).items() if k != "tail_hash"}
+    status, new_mark = incremental_day_status(ROWS, YESTERDAY_STR, YESTERDAY, mark)
+    assert status == "Present"
+    assert new_mark["tail_hash"] == tail_watermark(ROWS)["tail_hash"]
@@ -0,0 +1,135 @@
+import time
+import threading
+from selenium.common.exceptions import TimeoutException, NoAlertPresentException
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+
+# ====================================================
+# ⏱️ READINESS WAITS + WAIT-TIME ACCOUNTING
+# ====================================================
+#
+# Every wait is an explicit condition (network idle, row count stable,
+# DOM marker present) instead of a fixed sleep, and every wait records
+# how long it actually blocked under a stage label.
+
+POLL_SECONDS = 0.1
+
+# Upper bound for best-effort settle() waits (network idle) before moving on anyway
+SETTLE_SECONDS = 5
+
+
+class WaitLog:
+    def __init__(self):
+        self.stages = {}   # stage -> [count, seconds, timeouts]
+        self._lock  = threading.Lock()
+
+    def record(self, stage, seconds, timed_out=False):
+        with self._lock:
+            entry = self.stages.setdefault(stage, [0, 0.0, 0])
+            entry[0] += 1
+            entry[1] += seconds
+            entry[2] += 1 if timed_out else 0
+
+    def merge(self, other):
+        with self._lock:
+            for stage, (count, seconds, timeouts) in other.stages.items():
+                entry = self.stages.setdefault(stage, [0, 0.0, 0])
+                entry[0] += count
+                entry[1] += seconds
+                entry[2] += timeouts
+
+    def total(self):
+        return sum(seconds for _, seconds, _ in self.stages.values())
+
+    def report(self, title="⏱️ Waits"):
+        print(f"{title}: {self.total():.1f}s blocked")
+        for stage, (count, seconds, timeouts) in sorted(self.stages.items(), key=lambda kv: -kv[1][1]):
+            suffix = f" ({timeouts} timed out)" if timeouts else ""
+            print(f"      {stage:<24} {seconds:6.2f}s over {count} wait(s){suffix}")
+
+
+# Aggregated over every user this worker processes
+SHARD_LOG = WaitLog()
+
+
+class RecordingWait(WebDriverWait):
+    """WebDriverWait that logs how long each until() blocked."""
+
+    def __init__(self, driver, timeout, log, poll_frequency=POLL_SECONDS):
+        super().__init__(driver, timeout, poll_frequency=poll_frequency)
+        self.log = log
+
+    def until(self, method, message="", stage="wait"):
+        started   = time.monotonic()
+        timed_out = False
+        try:
+            return super().until(method, message)
+        except TimeoutException:
+            timed_out = True
+            raise
+        finally:
+            self.log.record(stage, time.monotonic() - started, timed_out)
+
+    def settle(self, method, timeout=SETTLE_SECONDS, stage="settle"):
+        """
+        Best-effort wait: gives method up to `timeout` seconds and carries on
+        either way (a page that keeps polling never goes idle). A stall is
+        recorded as a timeout under `stage`. Returns the condition's value or False.
+        """
+        started   = time.monotonic()
+        timed_out = False
+        try:
+            return WebDriverWait(self._driver, timeout, poll_frequency=self._poll).until(method)
+        except TimeoutException:
+            timed_out = True
+            return False
+        finally:
+            self.log.record(stage, time.monotonic() - started, timed_out)
+
+
+# ====================================================
+# ✅ CONDITIONS
+# ====================================================
+
+_NETWORK_IDLE_JS = """
+if (document.readyState !== 'complete') return false;
+if (window.jQuery && window.jQuery.active > 0) return false;
+const now = performance.now();
+return !performance.getEntriesByType('resource').some(
+    e => e.responseEnd === 0 || now - e.responseEnd < arguments[0]
+);
+"""
+
+
+def network_idle(quiet_ms=500):
+    """Document loaded, no jQuery AJAX in flight and no resource finished in the last quiet_ms."""
+    def _predicate(driver):
+        return driver.execute_script(_NETWORK_IDLE_JS, quiet_ms)
+    return _predicate
+
+
+def row_count_stable(xpath, settle_polls=3):
+    """Rows matching xpath exist and their count held steady for settle_polls polls. Returns the count."""
+    state = {"last": -1, "same": 0}
+
+    def _predicate(driver):
+        count = len(driver.find_elements(By.XPATH, xpath))
+        if count and count == state["last"]:
+            state["same"] += 1
+        else:
+            state["same"] = 0
+        state["last"] = count
+        return count if state["same"] >= settle_polls - 1 else False
+    return _predicate
+
+
+def alert_or_url(fragment):
+    """Resolves as soon as either a JS alert opens ('alert') or the URL contains fragment ('url')."""
+    def _predicate(driver):
+        try:
+            driver.switch_to.alert
+            return "alert"
+        except NoAlertPresentException:
+            pass
+        return "url" if fragment in driver.current_url else False
+    return _predicate
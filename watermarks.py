@@ -0,0 +1,93 @@
+import threading
+
+# ====================================================
+# 🔖 PER-SUBJECT DETAIL WATERMARKS
+# ====================================================
+#
+# For every (college_id, subject) we remember how many detail rows the
+# last run saw, the newest lecture date and the statuses recorded on it
+# (Supabase `subject_watermarks`, see sql/002_subject_watermarks.sql).
+# portal_http.incremental_day_status then parses only rows added since,
+# and an unchanged row count answers "nothing new" without parsing at all.
+# A hash of the newest rows (tail_hash, sql/012_watermark_tail_hash.sql)
+# turns a status the portal corrected in place into a full rescan.
+
+BASE_COLUMNS = "subject, row_count, last_date, last_statuses"
+
+class WatermarkStore:
+    def __init__(self, supabase, table="subject_watermarks"):
+        self.supabase = supabase
+        self.table    = table
+        self._loaded  = {}   # college_id -> {subject: mark} as read from the DB
+        self._lock    = threading.Lock()
+        self._hashes  = True   # False once tail_hash turns out not to exist yet
+
+        self.unchanged = 0   # subjects answered from the row count alone
+        self.new_rows  = 0   # rows parsed past a watermark
+        self.rescans   = 0   # first sightings / shrunk tables
+
+    def load(self, college_id):
+        """Returns {subject: mark}. Pass it to the scrapers, then hand it back to save()."""
+        marks = {}
+        try:
+            rows = self._read(college_id)
+            for r in rows:
+                marks[r["subject"]] = {
+                    "row_count":     r["row_count"],
+                    "last_date":     r["last_date"],
+                    "last_statuses": r["last_statuses"] or [],
+                }
+                if r.get("tail_hash"):
+                    marks[r["subject"]]["tail_hash"] = r["tail_hash"]
+        except Exception as e:
+            print(f"   ⚠️ Watermark read failed: {e}")
+        with self._lock:
+            self._loaded[college_id] = dict(marks)
+        return marks
+
+    def _read(self, college_id):
+        if self._hashes:
+            try:
+                return self.supabase.table(self.table).select(BASE_COLUMNS + ", tail_hash") \
+                    .eq("college_id", college_id).execute().data
+            except Exception as e:
+                # Migration 012 not applied yet — plain row-count watermarks for the rest of the run
+                print(f"   ⚠️ Watermark tail_hash unavailable ({e}), using row counts only")
+                self._hashes = False
+        return self.supabase.table(self.table).select(BASE_COLUMNS) \
+            .eq("college_id", college_id).execute().data
+
+    def save(self, college_id, marks):
+        """Upserts only the subjects whose watermark moved."""
+        with self._lock:
+            before = self._loaded.pop(college_id, {})
+
+        changed = []
+        for subject, mark in marks.items():
+            old = before.get(subject)
+            if mark == old:
+                with self._lock:
+                    self.unchanged += 1
+                continue
+            with self._lock:
+                if old is None or mark["row_count"] < old["row_count"]:
+                    self.rescans += 1
+                else:
+                    self.new_rows += mark["row_count"] - old["row_count"]
+            row = {"college_id": college_id, "subject": subject, **mark}
+            if self._hashes:
+                row.setdefault("tail_hash", None)   # one column set for the bulk upsert
+            else:
+                row.pop("tail_hash", None)
+            changed.append(row)
+
+        if not changed:
+            return
+        try:
+            self.supabase.table(self.table).upsert(changed, on_conflict="college_id,subject").execute()
+        except Exception as e:
+            print(f"   ⚠️ Watermark write failed: {e}")
+
+    def report(self):
+        print(f"🔖 Watermarks: {self.unchanged} subjects unchanged | {self.new_rows} new rows parsed | "
+              f"{self.rescans} full scans")